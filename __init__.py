@@ -30,6 +30,7 @@ from . import addon_updater_ops
 
 import os
 from bpy_extras.io_utils import ImportHelper
+from . sweep import SWEEP_ENV
 from . functions import *
 from . operators import *
 from . properties import *
@@ -48,6 +49,72 @@ class WORKFLOW_Preferences(bpy.types.AddonPreferences):
         name="Asset Library Path",
         subtype= "FILE_PATH",
     )
+    scan_workers: bpy.props.IntProperty(
+        name="Scan Threads",
+        description = "Number of asset files checked in parallel when a file is opened",
+        default=8,
+        min=1,
+        max=64,
+    )
+    scan_timeout: bpy.props.FloatProperty(
+        name="Scan Timeout",
+        description = "Seconds before an unreachable asset file is skipped",
+        default=5.0,
+        min=0.1,
+        subtype='TIME',
+        unit='TIME',
+    )
+    status_ttl: bpy.props.FloatProperty(
+        name="Status Cache",
+        description = "Seconds before the asset panel checks a file again",
+        default=30.0,
+        min=1.0,
+        subtype='TIME',
+        unit='TIME',
+    )
+    watch_interval: bpy.props.FloatProperty(
+        name="Watch Interval",
+        description = "Seconds between checks of asset directories for changes, 0 to disable",
+        default=10.0,
+        min=0.0,
+        subtype='TIME',
+        unit='TIME',
+        update=lambda self, context: set_watch_interval(self.watch_interval),
+    )
+    mirror_directory: bpy.props.StringProperty(
+        name="Local Mirror",
+        description = "Local directory where asset libraries are copied before being read, empty to read the share directly",
+        subtype= "DIR_PATH",
+    )
+    mirror_size: bpy.props.FloatProperty(
+        name="Mirror Size (GB)",
+        description = "Maximum size of the local mirror, least recently used files are removed first",
+        default=20.0,
+        min=0.1,
+    )
+    prefetch_workers: bpy.props.IntProperty(
+        name="Prefetch Threads",
+        description = "New asset versions copied to the local mirror at the same time",
+        default=2,
+        min=1,
+        max=16,
+    )
+    prefetch_bandwidth: bpy.props.FloatProperty(
+        name="Prefetch Bandwidth (MB/s)",
+        description = "Maximum read speed of the prefetch on the asset share, 0 for no limit",
+        default=0.0,
+        min=0.0,
+    )
+    progress_channel: bpy.props.StringProperty(
+        name="Render Progress",
+        description = "Where render progress events are written: stdout, stderr, file:<path>, pipe:<path> or tcp:<host>:<port>",
+        default="stdout",
+    )
+    ffmpeg_path: bpy.props.StringProperty(
+        name="FFmpeg",
+        description = "ffmpeg executable used to encode the preview while rendering, empty to search the PATH",
+        subtype= "FILE_PATH",
+    )
     #ADDON UPDATER PREFERENCES
     auto_check_update : bpy.props.BoolProperty(
     name = "Auto-check for Update",
@@ -88,16 +155,42 @@ class WORKFLOW_Preferences(bpy.types.AddonPreferences):
         column = layout.column()
         column.prop(self, 'production_settings_file', expand=True)
         column.prop(self, 'asset_path', expand=True)
+        row = column.row()
+        row.prop(self, 'scan_workers')
+        row.prop(self, 'scan_timeout')
+        row = column.row()
+        row.prop(self, 'status_ttl')
+        row.prop(self, 'watch_interval')
+        row = column.row()
+        row.prop(self, 'mirror_directory')
+        row.prop(self, 'mirror_size')
+        row.operator("workflow.clear_mirror", text="", icon="TRASH")
+        row = column.row()
+        row.prop(self, 'prefetch_workers')
+        row.prop(self, 'prefetch_bandwidth')
+        column.prop(self, 'progress_channel')
+        column.prop(self, 'ffmpeg_path')
         addon_updater_ops.update_settings_ui(self,context)
 
 @persistent
 def update_handler(dummy):
     resolution_from_camera()
 
+@persistent
+def undo_handler(dummy):
+    invalidate_relink_index()
+
 @persistent
 def load_handler(dummy):
-    auto = bpy.context.scene.auto_update_assets
-    check_updates(auto = auto)
+    build_relink_index()
+    invalidate_file_status()
+    set_watch_interval(bpy.context.preferences.addons[__package__].preferences.watch_interval)
+    #Locked shots are only updated with Update Lock
+    locked = bool(bpy.data.filepath) and read_asset_lock(bpy.data.filepath) is not None
+    auto = bpy.context.scene.auto_update_assets and not locked
+    #sweep.py relinks the file itself
+    if not os.environ.get(SWEEP_ENV):
+        check_updates_async(auto = auto)
     """
     try:
         state, file = check_anim()
@@ -109,6 +202,11 @@ def load_handler(dummy):
     """
     update_cam_link()
 
+@persistent
+def save_handler(dummy):
+    if bpy.data.filepath and not is_copy_save(dummy):
+        write_asset_manifest(bpy.data.filepath)
+
 #REGISTER UNREGISTER
 classes = (
     WORKFLOW_Preferences,
@@ -130,9 +228,12 @@ classes = (
     WORKFLOW_OT_render_material,
     WORKFLOW_OT_projection_node,
     WORKFLOW_OT_publish_preview,
+    WORKFLOW_OT_freeze_settings,
     WORKFLOW_OT_custom_preview,
     WORKFLOW_OT_sync_visibility,
     WORKFLOW_OT_load_asset,
+    WORKFLOW_OT_search_asset,
+    WORKFLOW_OT_rescan_catalog,
     WORKFLOW_OT_export_keyframes,
     WORKFLOW_OT_export_dummy,
     WORKFLOW_OT_import_keyframes,
@@ -153,7 +254,11 @@ classes = (
     WORKFLOW_OT_update_cam_link,
     WORKFLOW_OT_render,
     WORKFLOW_OT_batch_render,
+    WORKFLOW_OT_render_report,
     WORKFLOW_OT_update_all_assets,
+    WORKFLOW_OT_refresh_asset_status,
+    WORKFLOW_OT_update_lock,
+    WORKFLOW_OT_clear_mirror,
     WORKFLOW_OT_delete_link,
     WORKFLOW_OT_update_animation,
     )
@@ -162,6 +267,7 @@ relink_types = ["Object", "Collection", "Material", "Image", "Action", "NodeTree
 
 def register():
     addon_updater_ops.register(bl_info)
+    init_digest_cache()
 
     from bpy.utils import register_class
     for cls in classes:
@@ -184,6 +290,10 @@ def register():
 
     if not hasattr( bpy.types.Scene, 'auto_update_assets'):
         bpy.types.Scene.auto_update_assets = bpy.props.BoolProperty(name="Auto Update Assets", default=False)
+
+    if not hasattr( bpy.types.Scene, 'differential_relink'):
+        bpy.types.Scene.differential_relink = bpy.props.BoolProperty(name="Differential Update", 
+            description="Only replace the datablocks that changed in the asset library", default=False)
     
     if not hasattr( bpy.types.ShaderNodeGroup, 'override'):
         bpy.types.ShaderNodeGroup.override = bpy.props.BoolProperty(name="Override", default=False)
@@ -198,8 +308,13 @@ def register():
 
     bpy.app.handlers.depsgraph_update_post.append(update_handler)
     bpy.app.handlers.load_post.append(load_handler)
+    bpy.app.handlers.save_post.append(save_handler)
+    bpy.app.handlers.undo_post.append(undo_handler)
+    bpy.app.handlers.redo_post.append(undo_handler)
 
 def unregister():
+    cancel_scans()
+    cancel_prefetch()
     from bpy.utils import unregister_class
     for cls in reversed(classes):
         unregister_class(cls)
@@ -209,6 +324,7 @@ def unregister():
     del bpy.types.Scene.previous_camera
     del bpy.types.Scene.animation_filepath
     del bpy.types.Scene.auto_update_assets
+    del bpy.types.Scene.differential_relink
     del bpy.types.Scene.relink
     del bpy.types.ShaderNodeGroup.override_colors
     del bpy.types.ShaderNodeGroup.override
@@ -218,4 +334,7 @@ def unregister():
     
 
     bpy.app.handlers.depsgraph_update_post.remove(update_handler)
-    bpy.app.handlers.load_post.remove(load_handler)
\ No newline at end of file
+    bpy.app.handlers.load_post.remove(load_handler)
+    bpy.app.handlers.save_post.remove(save_handler)
+    bpy.app.handlers.undo_post.remove(undo_handler)
+    bpy.app.handlers.redo_post.remove(undo_handler)
\ No newline at end of file
@@ -0,0 +1,218 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTIBILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+#
+# type: ignore
+
+import os
+import mmap
+import gzip
+import struct
+
+#BLEND FILE READER
+#List datablock names of a .blend by walking its block headers, nothing is loaded in bpy.data
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+ID_CODES = {
+    b'AC': "actions", b'AR': "armatures", b'BR': "brushes", b'CA': "cameras",
+    b'CF': "cache_files", b'CU': "curves", b'CV': "hair_curves", b'GD': "grease_pencils",
+    b'GR': "collections", b'IM': "images", b'KE': "shape_keys", b'LA': "lights",
+    b'LP': "lightprobes", b'LS': "linestyles", b'LT': "lattices", b'MA': "materials",
+    b'MB': "metaballs", b'MC': "movieclips", b'ME': "meshes", b'MS': "masks",
+    b'NT': "node_groups", b'OB': "objects", b'PA': "particles", b'PC': "paint_curves",
+    b'PL': "palettes", b'PT': "pointclouds", b'SC': "scenes", b'SO': "sounds",
+    b'SP': "speakers", b'TE': "textures", b'TX': "texts", b'VF': "fonts",
+    b'VO': "volumes", b'WO': "worlds", b'WS': "workspaces",
+    }
+
+_listings = {}
+
+class BlendFileError(Exception):
+    pass
+
+def open_blend(filepath):
+    #Returns a buffer: memory map for plain files, decompressed bytes otherwise
+    with open(filepath, 'rb') as infile:
+        magic = infile.read(4)
+        if magic[:2] == GZIP_MAGIC:
+            infile.seek(0)
+            with gzip.GzipFile(fileobj=infile) as stream:
+                return stream.read()
+        if magic == ZSTD_MAGIC:
+            infile.seek(0)
+            return read_zstd(infile)
+        #An empty file can not be mapped, a file being written can be truncated
+        if len(magic) < 4:
+            raise BlendFileError("Empty or truncated file {}".format(filepath))
+        try:
+            return mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError as ex:
+            raise BlendFileError("{}: {}".format(filepath, ex))
+
+def read_zstd(infile):
+    try:
+        import zstandard
+    except ImportError:
+        try:
+            from compression import zstd
+        except ImportError:
+            raise BlendFileError("zstd compressed file, install the zstandard module to read it")
+        return zstd.decompress(infile.read())
+    reader = zstandard.ZstdDecompressor().stream_reader(infile, read_across_frames=True)
+    return reader.read()
+
+def read_header(data):
+    if data[:7] != b'BLENDER':
+        raise BlendFileError("Not a blend file")
+    if data[7:8] in (b'_', b'-'):
+        #BLENDER-v291
+        pointer_size = 8 if data[7:8] == b'-' else 4
+        endian = '<' if data[8:9] == b'v' else '>'
+        return {"pointer_size": pointer_size, "endian": endian, "header_size": 12, "large_bhead": False}
+    #BLENDER17-01v0500
+    header_size = int(data[7:9])
+    if data[9:10] != b'-' or data[10:12] != b'01':
+        raise BlendFileError("Unsupported blend file header")
+    endian = '<' if data[12:13] == b'v' else '>'
+    return {"pointer_size": 8, "endian": endian, "header_size": header_size, "large_bhead": True}
+
+def iter_blocks(data, header):
+    #Yields (code, offset of block data, length, SDNA index)
+    endian = header["endian"]
+    pointer = 'Q' if header["pointer_size"] == 8 else 'I'
+    if header["large_bhead"]:
+        bhead = struct.Struct(endian + 'ii' + pointer + 'qq')
+    else:
+        bhead = struct.Struct(endian + '4si' + pointer + 'ii')
+    offset = header["header_size"]
+    total = len(data)
+
+    while offset + bhead.size <= total:
+        if header["large_bhead"]:
+            code = data[offset:offset + 4]
+            _code, sdna, old, length, nr = bhead.unpack_from(data, offset)
+        else:
+            code, length, old, sdna, nr = bhead.unpack_from(data, offset)
+        offset += bhead.size
+        if code == b'ENDB':
+            return
+        yield code, offset, length, sdna
+        offset += length
+
+def align4(offset, base):
+    #Sections are aligned from the start of the DNA block
+    return base + ((offset - base + 3) & ~3)
+
+def read_strings(data, offset, count):
+    strings = []
+    for i in range(count):
+        end = data.find(b'\0', offset)
+        strings.append(data[offset:end].decode('utf-8', 'replace'))
+        offset = end + 1
+    return strings, offset
+
+def id_name_offset(data, offset, header):
+    #Parse the DNA1 block and return the offset and size of ID.name
+    endian = header["endian"]
+    base = offset
+    if data[offset:offset + 8] != b'SDNANAME':
+        raise BlendFileError("Invalid DNA block")
+    count = struct.unpack_from(endian + 'i', data, offset + 8)[0]
+    names, offset = read_strings(data, offset + 12, count)
+
+    offset = align4(offset, base)
+    count = struct.unpack_from(endian + 'i', data, offset + 4)[0]
+    types, offset = read_strings(data, offset + 8, count)
+
+    offset = align4(offset, base)
+    lengths = struct.unpack_from(endian + '{}h'.format(len(types)), data, offset + 4)
+    offset = align4(offset + 4 + 2 * len(types), base)
+
+    count = struct.unpack_from(endian + 'i', data, offset + 4)[0]
+    offset += 8
+    for i in range(count):
+        type_index, field_count = struct.unpack_from(endian + 'hh', data, offset)
+        offset += 4
+        fields = struct.unpack_from(endian + '{}h'.format(2 * field_count), data, offset)
+        offset += 4 * field_count
+        if types[type_index] != "ID":
+            continue
+
+        field_offset = 0
+        for j in range(field_count):
+            field_type, field_name = fields[2 * j], names[fields[2 * j + 1]]
+            size = field_size(field_name, lengths[field_type], header["pointer_size"])
+            if field_name.split('[')[0] == "name":
+                return field_offset, size
+            field_offset += size
+    raise BlendFileError("ID struct not found")
+
+def field_size(name, type_length, pointer_size):
+    if name.startswith('*') or name.startswith('(*'):
+        size = pointer_size
+    else:
+        size = type_length
+    for dimension in name.split('[')[1:]:
+        size *= int(dimension.rstrip(']'))
+    return size
+
+def read_datablocks(filepath):
+    #Returns {bpy.data attribute: [names]}
+    data = open_blend(filepath)
+    try:
+        return parse_datablocks(data)
+    except (struct.error, ValueError, IndexError) as ex:
+        raise BlendFileError("Corrupted blend file: {}".format(ex))
+    finally:
+        if isinstance(data, mmap.mmap):
+            data.close()
+
+def parse_datablocks(data):
+    header = read_header(data)
+    ids = []
+    name_offset = None
+    for code, offset, length, sdna in iter_blocks(data, header):
+        if code == b'DNA1':
+            name_offset = id_name_offset(data, offset, header)
+        elif code[2:] == b'\0\0' and code[:2] in ID_CODES:
+            ids.append((code[:2], offset))
+
+    #DNA1 is stored after the datablocks
+    if name_offset is None:
+        raise BlendFileError("No DNA block")
+    start, size = name_offset
+    datablocks = {}
+    for code, offset in ids:
+        raw = data[offset + start:offset + start + size]
+        name = raw.split(b'\0', 1)[0][2:].decode('utf-8', 'replace')
+        datablocks.setdefault(ID_CODES[code], []).append(name)
+    for names in datablocks.values():
+        names.sort()
+    return datablocks
+
+def list_datablocks(filepath):
+    #Cached by stat signature
+    stat = os.stat(filepath)
+    key = os.path.normcase(os.path.abspath(filepath))
+    cached = _listings.get(key)
+    if cached is not None and cached[0] == (stat.st_size, stat.st_mtime_ns):
+        return cached[1]
+    datablocks = read_datablocks(filepath)
+    _listings[key] = ((stat.st_size, stat.st_mtime_ns), datablocks)
+    return datablocks
+
+def has_datablock(filepath, data_type, name):
+    return name in list_datablocks(filepath).get(data_type, ())
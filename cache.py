@@ -0,0 +1,150 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTIBILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+#
+# type: ignore
+
+import os
+import json
+import time
+import hashlib
+import threading
+
+#DIGEST CACHE
+#Content digests keyed by (path, size, mtime_ns), files are only hashed when their stat changes
+
+DIGEST_CHUNK = 1024 * 1024
+
+_digests = {}
+_digest_lock = threading.RLock()
+_digest_state = {"file": None, "loaded": False, "dirty": False}
+
+def set_digest_cache_file(filepath):
+    with _digest_lock:
+        if filepath != _digest_state["file"]:
+            _digest_state["file"] = filepath
+            _digest_state["loaded"] = False
+
+def load_digest_cache():
+    with _digest_lock:
+        if _digest_state["loaded"]:
+            return
+        _digest_state["loaded"] = True
+        filepath = _digest_state["file"]
+        if filepath is None or not os.path.isfile(filepath):
+            return
+        try:
+            with open(filepath) as infile:
+                _digests.update(json.load(infile))
+        except (OSError, ValueError):
+            pass
+
+def save_digest_cache():
+    with _digest_lock:
+        filepath = _digest_state["file"]
+        if filepath is None or not _digest_state["dirty"]:
+            return
+        tmp_path = "{}.{}.tmp".format(filepath, os.getpid())
+        try:
+            with open(tmp_path, 'w') as outfile:
+                json.dump(_digests, outfile)
+            os.replace(tmp_path, filepath)
+            _digest_state["dirty"] = False
+        except OSError:
+            pass
+
+def normalize_path(path):
+    return os.path.normcase(os.path.normpath(os.path.abspath(path)))
+
+def file_signature(path):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+def hash_file(path):
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as infile:
+        for chunk in iter(lambda: infile.read(DIGEST_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def cached_digest(path, signature):
+    #Memory lookup only, None if the file must be hashed
+    load_digest_cache()
+    with _digest_lock:
+        entry = _digests.get(normalize_path(path))
+    if entry is not None and (entry[0], entry[1]) == tuple(signature):
+        return entry[2]
+    return None
+
+def file_digest(path, signature = None):
+    if signature is None:
+        signature = file_signature(path)
+    digest = cached_digest(path, signature)
+    if digest is not None:
+        return digest
+
+    digest = hash_file(path)
+    with _digest_lock:
+        _digests[normalize_path(path)] = [signature[0], signature[1], digest]
+        _digest_state["dirty"] = True
+    return digest
+
+#FILE STATUS CACHE
+#Last known stat and digest per asset file, read by panels and polls without touching the disk
+
+_file_status = {}
+_status_lock = threading.RLock()
+
+def read_file_status(path):
+    #Worker side: stat and digest, None when the file is missing
+    try:
+        signature = file_signature(path)
+    except OSError:
+        return None
+    try:
+        digest = file_digest(path, signature)
+    except OSError:
+        digest = None
+    return {"signature": signature, "mtime": signature[1] / 1e9, "digest": digest}
+
+def store_file_status(path, status):
+    with _status_lock:
+        _file_status[normalize_path(path)] = (time.monotonic(), status)
+
+def cached_file_status(path, ttl):
+    #Returns (known, expired, status)
+    with _status_lock:
+        entry = _file_status.get(normalize_path(path))
+    if entry is None:
+        return False, True, None
+    stamp, status = entry
+    return True, time.monotonic() - stamp > ttl, status
+
+def invalidate_file_status(path = None):
+    #Keep the last status for display, it is refreshed on next access
+    with _status_lock:
+        for key, (stamp, status) in list(_file_status.items()):
+            if path is None or key == normalize_path(path):
+                _file_status[key] = (float('-inf'), status)
+
+def invalidate_directory_status(directory):
+    directory = normalize_path(directory)
+    with _status_lock:
+        for key, (stamp, status) in list(_file_status.items()):
+            if os.path.dirname(key) == directory:
+                _file_status[key] = (float('-inf'), status)
+
+def cached_status_directories():
+    with _status_lock:
+        return set(os.path.dirname(path) for path in _file_status.keys())
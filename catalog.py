@@ -0,0 +1,181 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTIBILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+#
+# type: ignore
+
+import os
+import json
+import hashlib
+import configparser
+from . blendfile import list_datablocks, BlendFileError
+
+#ASSET CATALOG
+#Index of the .ini shortcuts of the asset library, only directories whose mtime changed are read again
+#Target libraries are stated once per scan, a shortcut edited in place is read by an explicit rescan
+
+CATALOG_VERSION = 3
+THUMBNAIL_EXTENSIONS = (".png", ".jpg", ".jpeg")
+
+_catalogs = {}
+_shortcuts = {}
+
+def catalog_file(cache_dir, root):
+    key = hashlib.blake2b(os.path.normcase(os.path.normpath(root)).encode(), digest_size=8).hexdigest()
+    return os.path.join(cache_dir, "catalog_{}.json".format(key))
+
+def target_signature(target, stats):
+    #[size, mtime_ns], None when missing, each library is stated once per scan
+    signatures = stats["targets"]
+    if target not in signatures:
+        try:
+            stat = os.stat(target)
+            signatures[target] = [stat.st_size, stat.st_mtime_ns]
+        except OSError:
+            signatures[target] = None
+    return signatures[target]
+
+def read_shortcut(filepath):
+    config = configparser.ConfigParser()
+    config.read(filepath)
+    return {
+        "name": config.get('ASSET', 'name'),
+        "data_type": config.get('ASSET', 'data_type'),
+        "relative_path": config.get('ASSET', 'relative_path'),
+        }
+
+def check_target(directory, entry, stats):
+    #Check the shortcut still points to an existing datablock
+    target = os.path.normpath(os.path.join(directory, entry["relative_path"]))
+    entry["target_signature"] = target_signature(target, stats)
+    entry["missing"] = False
+    if entry["target_signature"] is None:
+        entry["missing"] = True
+    else:
+        try:
+            datablocks = list_datablocks(target)
+            entry["missing"] = entry["name"] not in datablocks.get(entry["data_type"], ())
+        except (OSError, BlendFileError):
+            pass
+
+def scan_entry(directory, filename, names, stats):
+    entry = {"file": filename}
+    try:
+        entry.update(read_shortcut(os.path.join(directory, filename)))
+    except (configparser.Error, OSError) as ex:
+        entry["error"] = str(ex)
+        return entry
+    check_target(directory, entry, stats)
+
+    base = os.path.splitext(filename)[0]
+    entry["thumbnail"] = None
+    for extension in THUMBNAIL_EXTENSIONS:
+        if base + extension in names:
+            entry["thumbnail"] = base + extension
+            break
+    return entry
+
+def scan_directory(root, relative, previous, directories, stats):
+    directory = os.path.join(root, relative) if relative else root
+    try:
+        mtime = os.stat(directory).st_mtime_ns
+    except OSError:
+        return
+
+    cached = previous.get(relative)
+    if cached is not None and cached["mtime_ns"] == mtime:
+        #Same shortcuts, only the ones whose library was saved are checked again
+        for entry in cached["entries"]:
+            if entry.get("error"):
+                continue
+            target = os.path.normpath(os.path.join(directory, entry["relative_path"]))
+            if target_signature(target, stats) != entry.get("target_signature"):
+                check_target(directory, entry, stats)
+                stats["entries"] += 1
+        directories[relative] = cached
+    else:
+        stats["scanned"] += 1
+        entries = []
+        subdirs = []
+        with os.scandir(directory) as it:
+            items = list(it)
+        names = set(item.name for item in items)
+        for item in items:
+            if item.is_dir():
+                subdirs.append(item.name)
+            elif item.name.lower().endswith(".ini"):
+                entries.append(scan_entry(directory, item.name, names, stats))
+        directories[relative] = {"mtime_ns": mtime, "subdirs": sorted(subdirs), "entries": entries}
+
+    for subdir in directories[relative]["subdirs"]:
+        scan_directory(root, os.path.join(relative, subdir) if relative else subdir, previous, directories, stats)
+
+def load_catalog(cache_dir, root):
+    catalog = _catalogs.get(root)
+    if catalog is not None:
+        return catalog
+    catalog = {"version": CATALOG_VERSION, "root": root, "directories": {}}
+    filepath = catalog_file(cache_dir, root)
+    if os.path.isfile(filepath):
+        try:
+            with open(filepath) as infile:
+                data = json.load(infile)
+            if data.get("version") == CATALOG_VERSION:
+                catalog = data
+        except (OSError, ValueError):
+            pass
+    _catalogs[root] = catalog
+    return catalog
+
+def save_catalog(cache_dir, catalog):
+    filepath = catalog_file(cache_dir, catalog["root"])
+    tmp_path = "{}.{}.tmp".format(filepath, os.getpid())
+    with open(tmp_path, 'w') as outfile:
+        json.dump(catalog, outfile, separators=(',', ':'))
+    os.replace(tmp_path, filepath)
+
+def scan_catalog(cache_dir, root, full = False):
+    #Returns the catalog and the number of directories read again
+    #full: every shortcut is read again, for shortcuts edited in place
+    catalog = load_catalog(cache_dir, root)
+    directories = {}
+    stats = {"scanned": 0, "entries": 0, "targets": {}}
+    scan_directory(root, "", {} if full else catalog["directories"], directories, stats)
+    catalog["directories"] = directories
+    index_catalog(catalog)
+    if stats["scanned"] or stats["entries"] or not os.path.isfile(catalog_file(cache_dir, root)):
+        save_catalog(cache_dir, catalog)
+    return catalog, stats["scanned"]
+
+def catalog_entries(catalog, text = "", data_type = ""):
+    #Yields (shortcut path, entry), filtered by name and data type
+    text = text.lower()
+    root = catalog["root"]
+    for relative, directory in sorted(catalog["directories"].items()):
+        for entry in directory["entries"]:
+            if entry.get("error"):
+                continue
+            if data_type and entry["data_type"] != data_type:
+                continue
+            if text and text not in entry["name"].lower() and text not in relative.lower():
+                continue
+            yield os.path.join(root, relative, entry["file"]), entry
+
+def index_catalog(catalog):
+    for filepath, entry in catalog_entries(catalog):
+        _shortcuts[os.path.normcase(os.path.normpath(filepath))] = entry
+
+def find_catalog_entry(filepath):
+    #In-memory lookup of a shortcut, None if it was not scanned
+    return _shortcuts.get(os.path.normcase(os.path.normpath(filepath)))
@@ -0,0 +1,101 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTIBILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+#
+# type: ignore
+
+import sys
+import json
+from array import array
+
+#CONSTRAINT MANIFEST
+#Constraint names of the asset version, one string per object instead of one per pose bone
+#Names are stored once, bones point to them through offsets in a flat index array
+#Version 1 is the old {"constraints": [...]} written on the object and on every bone
+
+CONSTRAINT_MANIFEST_VERSION = 2
+
+class ConstraintManifest:
+
+    def __init__(self, names, object_constraints, bones, offsets, indices):
+        self.names = names
+        self.object_indices = object_constraints
+        self.bones = bones
+        self.offsets = offsets
+        self.indices = indices
+
+    @property
+    def object(self):
+        return frozenset(self.names[i] for i in self.object_indices)
+
+    def bone(self, name):
+        #Constraint names of a pose bone, empty when the bone had none
+        i = self.bones.get(name)
+        if i is None:
+            return frozenset()
+        return frozenset(self.names[j] for j in self.indices[self.offsets[i]:self.offsets[i + 1]])
+
+    def __len__(self):
+        return len(self.bones)
+
+def pack_constraints(object_constraints, bone_constraints):
+    #bone_constraints: iterable of (bone name, constraint names), bones without constraints are left out
+    names = []
+    table = {}
+
+    def intern(name):
+        i = table.get(name)
+        if i is None:
+            i = table[name] = len(names)
+            names.append(name)
+        return i
+
+    data = {
+        "version": CONSTRAINT_MANIFEST_VERSION,
+        "object": [intern(name) for name in object_constraints],
+        "bones": [],
+        "offsets": [0],
+        "constraints": [],
+        }
+    for bone, constraints in bone_constraints:
+        if not constraints:
+            continue
+        data["bones"].append(intern(bone))
+        data["constraints"].extend(intern(name) for name in constraints)
+        data["offsets"].append(len(data["constraints"]))
+    data["names"] = names
+    return json.dumps(data, separators=(',', ':'))
+
+def unpack_constraints(text):
+    #Returns (version, manifest), bones of a version 1 manifest are read from each bone
+    if not text:
+        return None, None
+    data = json.loads(text)
+    version = data.get("version", 1)
+    if version == 1:
+        names = [sys.intern(name) for name in data["constraints"]]
+        return 1, ConstraintManifest(names, array('I', range(len(names))), {}, array('I', [0]), array('I'))
+    if version != CONSTRAINT_MANIFEST_VERSION:
+        raise ValueError("Unsupported constraint manifest version {}".format(version))
+
+    names = [sys.intern(name) for name in data["names"]]
+    bones = {names[i]: n for n, i in enumerate(data["bones"])}
+    return version, ConstraintManifest(names, array('I', data["object"]), bones,
+        array('I', data["offsets"]), array('I', data["constraints"]))
+
+def legacy_constraints(object_text, bone_texts):
+    #Version 1: the object string and a (bone name, string) per pose bone, packed in one pass
+    object_constraints = json.loads(object_text)["constraints"] if object_text else []
+    bone_constraints = [(bone, json.loads(text)["constraints"]) for bone, text in bone_texts if text]
+    return unpack_constraints(pack_constraints(object_constraints, bone_constraints))[1]
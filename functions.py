@@ -25,9 +25,27 @@ import time
 import json
 import zipfile
 import uuid
+import threading
 from pathlib import Path
-from re import findall
+from re import findall, sub
 import platform
+import hashlib
+from . cache import *
+from . scanner import *
+from . catalog import *
+from . blendfile import *
+from . relink_profile import *
+from . snapshot import *
+from . constraints import *
+from . settings import *
+from . purge import *
+from . mirror import *
+from . prefetch import *
+from . progress import *
+from . render_chunks import render_chunks, default_threads, write_render_report, format_render_report, format_frames
+from . render_manifest import *
+from . preview_encoder import *
+from . telemetry import *
 
 def color_fill(mask, mask_list):
     white = mathutils.Vector((1, 1, 1, 1))
@@ -79,9 +97,7 @@ def delete_scenes():
         if scene is not current_scene:
             bpy.data.scenes.remove(scene)
 
-    #FIX trouver une solution avec un while
-    for i in range(10):
-        bpy.ops.outliner.orphans_purge()
+    return purge_orphans()
 
 def resolution_from_camera():
     #FIX trouver une solution pour éviter d'updater à chaque changement
@@ -209,18 +225,68 @@ def render_material(shader_node_tree, render_camera, isolate, engine):
     
     return material_name
 
-def load_settings(setting):
-    production_settings_file = bpy.context.preferences.addons['WorkFlow'].preferences.production_settings_file
-    
+SETTINGS_TEXT = "workflow_settings.json"
+
+_embedded_settings = {"text": None, "data": None}
+
+def current_filename():
     filename =  bpy.path.basename(bpy.context.blend_data.filepath)
-    filename = filename.rsplit(".", 1)[0]
-    
-    #CONFIG PARSER
-    config = configparser.ConfigParser()
-    config.read(production_settings_file)
+    return filename.rsplit(".", 1)[0]
+
+def embedded_settings():
+    #Frozen settings of the .blend, None if the file has none
+    text = bpy.data.texts.get(SETTINGS_TEXT)
+    if text is None:
+        return None
+    content = text.as_string()
+    if content != _embedded_settings["text"]:
+        #Text edited by hand
+        try:
+            data = json.loads(content)
+        except ValueError as ex:
+            raise SettingsError("Embedded settings {} unreadable: {}".format(SETTINGS_TEXT, ex))
+        if not isinstance(data, dict):
+            raise SettingsError("Embedded settings {} unreadable".format(SETTINGS_TEXT))
+        _embedded_settings["data"] = data
+        _embedded_settings["text"] = content
+    return _embedded_settings["data"]
+
+def has_production_settings():
+    if bpy.data.texts.get(SETTINGS_TEXT) is not None:
+        return True
+    return bool(bpy.context.preferences.addons['WorkFlow'].preferences.production_settings_file)
+
+def production_settings():
+    #Embedded snapshot first, then the file from the preferences
+    filename = current_filename()
+    data = embedded_settings()
+    if data is not None:
+        return snapshot_settings(data, filename = filename)
+
+    production_settings_file = bpy.context.preferences.addons['WorkFlow'].preferences.production_settings_file
+    if not production_settings_file:
+        raise SettingsError("No production settings, embedded or in preferences")
+    return load_production_settings(bpy.path.abspath(production_settings_file)).bind(filename = filename)
+
+def freeze_settings():
+    #Store the resolved preferences file in the .blend
+    production_settings_file = bpy.context.preferences.addons['WorkFlow'].preferences.production_settings_file
+    settings = load_production_settings(bpy.path.abspath(production_settings_file))
+    data = settings.freeze(filename = current_filename())
 
-    #GET SETTINGS
-    return eval(config.get('SETTINGS', setting))
+    text = bpy.data.texts.get(SETTINGS_TEXT)
+    if text is None:
+        text = bpy.data.texts.new(SETTINGS_TEXT)
+    text.from_string(json.dumps(data, indent=2))
+    return data["source"]
+
+def remove_frozen_settings():
+    text = bpy.data.texts.get(SETTINGS_TEXT)
+    if text is not None:
+        bpy.data.texts.remove(text)
+
+def load_settings(setting):
+    return getattr(production_settings(), setting)
 
 
 def preview(filepath, publish = False):
@@ -400,15 +466,54 @@ def sync_visibility():
 
 
 
+def asset_library_root():
+    asset_path = bpy.context.preferences.addons['WorkFlow'].preferences.asset_path
+    if not asset_path:
+        return None
+    root = bpy.path.abspath(asset_path)
+    if os.path.isfile(root):
+        root = os.path.dirname(root)
+    return os.path.normpath(root)
+
+_catalog_scanned = set()
+
+def asset_catalog(rescan = False):
+    #Catalog of the asset library, scanned once per session unless rescan is asked
+    root = asset_library_root()
+    if root is None:
+        return None, 0
+    if rescan or root not in _catalog_scanned:
+        _catalog_scanned.add(root)
+        return scan_catalog(user_cache_dir(), root, full = rescan)
+    return load_catalog(user_cache_dir(), root), 0
+
+_enum_catalog_assets = []
+
+def enum_catalog_assets(self, context):
+    _enum_catalog_assets.clear()
+    catalog, scanned = asset_catalog()
+    if catalog is not None:
+        for i, (filepath, entry) in enumerate(catalog_entries(catalog, data_type = "" if self.data_type == 'ALL' else self.data_type)):
+            description = "{} - {}".format(entry["data_type"], entry["relative_path"])
+            if entry.get("missing"):
+                description = "Missing in library - " + description
+            _enum_catalog_assets.append((filepath, entry["name"], description, i))
+    return _enum_catalog_assets
+
 def get_asset(library_path, asset):
     
+    entry = find_catalog_entry(asset)
+    if entry is not None:
+        shortcut_path = entry["relative_path"]
+        data_type = entry["data_type"]
+        name = entry["name"]
+    else:
+        config = configparser.ConfigParser()
+        config.read(asset)
 
-    config = configparser.ConfigParser()
-    config.read(asset)
-
-    shortcut_path = config.get('ASSET', 'relative_path')
-    data_type = config.get('ASSET', 'data_type')
-    name = config.get('ASSET', 'name')
+        shortcut_path = config.get('ASSET', 'relative_path')
+        data_type = config.get('ASSET', 'data_type')
+        name = config.get('ASSET', 'name')
 
     #Make path
 
@@ -708,6 +813,108 @@ def resync():
                         bpy.ops.outliner.id_operation (override, type = 'OVERRIDE_LIBRARY_RESYNC_HIERARCHY')                 
 
 
+def user_cache_dir():
+    return bpy.utils.user_resource('CONFIG', path="workflow", create=True)
+
+def init_digest_cache():
+    set_digest_cache_file(os.path.join(user_cache_dir(), "digests.json"))
+
+def asset_abspath(path):
+    if platform.system() == "Linux":
+        path = path.replace('\\', os.path.sep).replace('/', os.path.sep)
+    return bpy.path.abspath(path)
+
+def asset_date(path):
+    mod_time = os.path.getmtime(path)
+    return time.strftime('%d-%m-%Y %H:%M:%S', time.localtime(mod_time))
+
+#RELINK INDEX
+RELINK_DATABLOCKS = ["objects", "collections", "materials", "node_groups", "images", "actions", "particles"]
+
+_relink_index = {}
+_relink_items = {}
+_relink_index_state = {"dirty": True, "signature": None}
+
+def relink_index_signature():
+    return tuple(len(getattr(bpy.data, datablock)) for datablock in RELINK_DATABLOCKS)
+
+def build_relink_index():
+    _relink_index.clear()
+    _relink_items.clear()
+    for datablock in RELINK_DATABLOCKS:
+        for data in getattr(bpy.data, datablock):
+            uid = data.relink.uid
+            if uid != "":
+                index_datablock(uid, datablock, data)
+    _relink_index_state["dirty"] = False
+    _relink_index_state["signature"] = relink_index_signature()
+
+def invalidate_relink_index():
+    _relink_index_state["dirty"] = True
+    _relink_items.clear()
+
+def ensure_relink_index():
+    #Datablocks created outside the addon (duplicate, delete, undo) change the counts
+    if _relink_index_state["dirty"] or _relink_index_state["signature"] != relink_index_signature():
+        build_relink_index()
+
+def sync_relink_index():
+    _relink_index_state["signature"] = relink_index_signature()
+
+def index_datablock(uid, datablock, data):
+    entry = _relink_index.setdefault(uid, {})
+    entry.setdefault(datablock, set()).add(data.name)
+
+def unindex_uid(uid):
+    _relink_index.pop(uid, None)
+
+def remove_relink_datablock(uid, datablock, data):
+    _relink_index.get(uid, {}).get(datablock, set()).discard(data.name)
+    getattr(bpy.data, datablock).remove(data)
+    sync_relink_index()
+
+def get_relink_datablocks(uid, datablock, retry = True):
+    ensure_relink_index()
+    datas = getattr(bpy.data, datablock)
+    found = []
+    for name in _relink_index.get(uid, {}).get(datablock, ()):
+        data = datas.get(name)
+        if data is None or data.relink.uid != uid:
+            #Renamed or removed behind our back
+            if retry:
+                build_relink_index()
+                return get_relink_datablocks(uid, datablock, retry = False)
+            continue
+        found.append(data)
+    return found
+
+def get_relink_uids():
+    ensure_relink_index()
+    return list(_relink_index.keys())
+
+def find_relink_item(uid, scene = None):
+    if scene is None:
+        scene = bpy.context.scene
+    items = scene.relink
+    index = _relink_items.get((scene.name, uid))
+    if index is not None and index < len(items) and items[index].uid == uid:
+        return items[index]
+    for index, item in enumerate(items):
+        _relink_items[(scene.name, item.uid)] = index
+    index = _relink_items.get((scene.name, uid))
+    if index is not None:
+        return items[index]
+    return None
+
+def remove_relink_item(uid, scene = None):
+    if scene is None:
+        scene = bpy.context.scene
+    for index, item in enumerate(scene.relink):
+        if item.uid == uid:
+            scene.relink.remove(index)
+            break
+    _relink_items.clear()
+
 def link_asset(name, data_type, path, active):
 
     with bpy.data.libraries.load(path, link=True) as (data_from, data_to):
@@ -742,309 +949,1067 @@ def link_asset(name, data_type, path, active):
     return asset[0].name
               
 
-def append_asset(name, data_type, path, active):
+#LOCAL MIRROR
+#Asset libraries are read from a local copy, see mirror.py
+
+#Datablocks with an external file, their paths point to the mirror after an append
+#Libraries linked by the appended library too, they are reloaded from the source directory
+FILE_DATABLOCKS = ["images", "sounds", "movieclips", "fonts", "cache_files", "volumes", "libraries"]
+
+def asset_mirror():
+    preferences = bpy.context.preferences.addons['WorkFlow'].preferences
+    if not preferences.mirror_directory:
+        return None
+    directory = bpy.path.abspath(preferences.mirror_directory)
+    return AssetMirror(directory, int(preferences.mirror_size * 1024 ** 3))
+
+def mirrored_library(path):
+    mirror = asset_mirror()
+    if mirror is None:
+        return path
+    return mirror.fetch(path)
+
+def file_datablocks():
+    return set(data.as_pointer() for attr in FILE_DATABLOCKS for data in getattr(bpy.data, attr, ()))
+
+def rebase_file_paths(existing, local_path, source_path):
+    #Paths relative to the mirror copy are moved back next to the source library
+    local_dir = os.path.dirname(local_path)
+    source_dir = os.path.dirname(source_path)
+    for attr in FILE_DATABLOCKS:
+        for data in getattr(bpy.data, attr, ()):
+            if data.as_pointer() in existing or data.library is not None:
+                continue
+            if getattr(data, "packed_file", None) is not None or not data.filepath:
+                continue
+            #Nested libraries are relative to their parent
+            filepath = os.path.normpath(bpy.path.abspath(data.filepath, library=getattr(data, "parent", None)))
+            if attr == "libraries" and filepath == os.path.normpath(local_path):
+                #The mirror copy itself, nothing is linked from it
+                continue
+            try:
+                if os.path.commonpath([filepath, local_dir]) != local_dir:
+                    continue
+            except ValueError:
+                #Different drive
+                continue
+            filepath = os.path.join(source_dir, os.path.relpath(filepath, local_dir))
+            if data.filepath.startswith("//") and bpy.data.filepath:
+                try:
+                    filepath = bpy.path.relpath(filepath)
+                except ValueError:
+                    pass
+            data.filepath = filepath
+            if attr == "libraries":
+                data.reload()
+
+#Temporary suffix of the local objects during an append
+APPEND_ASIDE = ".workflow_aside"
+
+def append_library_assets(path, requests):
+    #Append several assets from one library, each datablock name is loaded once per pass
+    #requests: list of (data_type, name), returns a list of (data, original_objects)
+    results = [None] * len(requests)
+    pending = list(enumerate(requests))
+    load_path = mirrored_library(path)
+
+    while pending:
+        #Split duplicates into successive passes
+        current = []
+        seen = set()
+        remaining = []
+        for index, request in pending:
+            if request in seen:
+                remaining.append((index, request))
+            else:
+                seen.add(request)
+                current.append((index, request))
+        pending = remaining
+
+        names = {}
+        for index, (data_type, name) in current:
+            names.setdefault(data_type, []).append(name)
+
+        #Append, the library is opened once
+        #Local objects named like objects of the library are moved aside, the appended ones keep their original name
+        aside = {}
+        existing = file_datablocks() if load_path != path else None
+        with bpy.data.libraries.load(load_path, link=False) as (data_from, data_to):
+            for data_type, data_names in names.items():
+                available = set(getattr(data_from, data_type))
+                names[data_type] = [n for n in data_names if n in available]
+                setattr(data_to, data_type, names[data_type])
+            if names.get("collections"):
+                for obj_name in data_from.objects:
+                    obj = bpy.data.objects.get(obj_name)
+                    if obj is not None and obj.library is None:
+                        aside[obj_name] = obj
+                        obj.name = obj_name + APPEND_ASIDE
+        if existing is not None:
+            rebase_file_paths(existing, load_path, path)
+
+        loaded = {}
+        for data_type, data_names in names.items():
+            for data_name, data in zip(data_names, getattr(data_to, data_type)):
+                loaded[(data_type, data_name)] = data
+
+        original_objects = {}
+        for data_name in names.get("collections", ()):
+            collection = loaded.get(("collections", data_name))
+            if collection is not None:
+                original_objects[data_name] = [obj.name for obj in collection.all_objects]
+
+        #Local objects take their name back, the appended ones get the suffix as with a plain append
+        for obj_name, obj in aside.items():
+            new_obj = bpy.data.objects.get(obj_name)
+            if new_obj is not None and new_obj.library is None:
+                new_obj.name = obj_name + APPEND_ASIDE + "_new"
+                obj.name = obj_name
+                new_obj.name = obj_name
+            else:
+                obj.name = obj_name
+
+        for index, request in current:
+            data = loaded.get(request)
+            if data is not None:
+                results[index] = (data, original_objects.get(request[1], []))
+
+    return results
+
+def tag_shared_datablocks(uid, obj):
+    #Materials, node groups, images, actions and particles of an object
+    for slot in obj.material_slots:
+        if slot.material is not None:
+            mat = slot.material
+            mat.relink.uid = uid
+            index_datablock(uid, "materials", mat)
+            for node_tree in traverse_node_tree(mat.node_tree):
+                node_tree.relink.uid = uid
+                if node_tree is not mat.node_tree:
+                    index_datablock(uid, "node_groups", node_tree)
+                for node in node_tree.nodes:
+                    if node.bl_idname=="ShaderNodeTexImage":
+                        if node.image is not None:
+                            node.image.relink.uid = uid
+                            index_datablock(uid, "images", node.image)
+
+    if obj.animation_data is not None:
+        if obj.animation_data.action is not None:
+            obj.animation_data.action.relink.uid = uid
+            index_datablock(uid, "actions", obj.animation_data.action)
+
+    for particles in obj.particle_systems:
+        particles.settings.relink.uid = uid
+        index_datablock(uid, "particles", particles.settings)
+
+def write_constraint_manifest(obj):
+    #Constraint names of the appended version, see ConstraintManifest
+    bones = ()
+    if obj.type == "ARMATURE":
+        bones = ((bone.name, [constraint.name for constraint in bone.constraints]) for bone in obj.pose.bones)
+    obj.relink.metadata = pack_constraints([constraint.name for constraint in obj.constraints], bones)
+
+def read_constraint_manifest(obj):
+    #None when the object was registered without constraint names
+    version, manifest = unpack_constraints(obj.relink.metadata)
+    if version == 1 and obj.type == "ARMATURE":
+        manifest = legacy_constraints(obj.relink.metadata,
+            ((bone.name, bone.relink.metadata) for bone in obj.pose.bones))
+    return manifest
+
+def register_asset(loaded, name, data_type, path, collection, instance_of = ""):
+    #Link appended data, tag every datablock with a new uid and add the scene entry
+    #Instances only own their collections and objects, shared datablocks keep the uid of the source
+    data, original_object = loaded
     uid = uuid.uuid1()
-    #Récupération des nom originaux grâce à un link, puis suppression de ce link
-    if data_type in 'collections':
-        with bpy.data.libraries.load(path, link=True) as (data_link_from, data_link_to):
-            data_link_to.collections = [c for c in data_link_from.collections if c == name]   
-    
-        for collection in data_link_to.collections:
-            if collection is not None:           
-                original_object = []
-                for obj in collection.all_objects:
-                    original_object.append(obj.name)            
-                bpy.data.libraries.remove(collection.library) 
-    
-    #Append/link
-    with bpy.data.libraries.load(path, link=False) as (data_from, data_to):
 
-        asset = [a for a in getattr(data_from, data_type) if a == name]
-        setattr(data_to, data_type, asset)
-    
     #Process collection
     if data_type in 'collections':
-        for collection in data_to.collections:
-            
-            if active:
-                bpy.context.collection.children.link(collection)
-            else:
-                bpy.context.scene.collection.children.link(collection)
-            
-            #Set uid
-            collection.relink.master = True
-            for child_collection in traverse_tree(collection):
-                child_collection.relink.uid = str(uid)                    
-            for i, obj in enumerate(collection.all_objects):
-                obj.relink.uid = str(uid)
-                obj.relink.original_name = original_object[i]
-                for slot in obj.material_slots:
-                    if slot.material is not None:
-                        mat = slot.material
-                        mat.relink.uid = str(uid)
-                        for node_tree in traverse_node_tree(mat.node_tree):
-                            node_tree.relink.uid = str(uid)
-                            for node in node_tree.nodes:
-                                if node.bl_idname=="ShaderNodeTexImage":
-                                    if node.image is not None:
-                                        node.image.relink.uid = str(uid)                            
+        collection.children.link(data)
+        collection = data
 
-                if obj.animation_data is not None:
-                    if obj.animation_data.action is not None:
-                        obj.animation_data.action.relink.uid = str(uid)
-
-                for particles in obj.particle_systems:
-                    particles.settings.relink.uid = str(uid)
-
-                #Tag constraints
-                if obj.type == "ARMATURE":
-                    for bone in obj.pose.bones:
-                        metadata = {}
-                        c_names = []
-                        for constraint in bone.constraints:
-                            c_names.append(constraint.name)
-                        metadata["constraints"] = c_names
-                        bone.relink.metadata = json.dumps(metadata)
-                metadata = {}
-                c_names = []
-                for constraint in obj.constraints:
-                    c_names.append(constraint.name)
-                metadata["constraints"] = c_names
-                obj.relink.metadata = json.dumps(metadata)
+        #Set uid
+        collection.relink.master = True
+        for child_collection in traverse_tree(collection):
+            child_collection.relink.uid = str(uid)
+            index_datablock(str(uid), "collections", child_collection)
+        for i, obj in enumerate(collection.all_objects):
+            obj.relink.uid = str(uid)
+            obj.relink.original_name = original_object[i]
+            index_datablock(str(uid), "objects", obj)
+            if not instance_of:
+                tag_shared_datablocks(str(uid), obj)
+
+            #Tag constraints
+            write_constraint_manifest(obj)
 
     #Process object
     if data_type in 'objects':
-        for obj in data_to.objects:
-            if active:
-                bpy.context.collection.objects.link(obj)
-            else:
-                bpy.context.scene.collection.objects.link(obj)
-
+        collection.objects.link(data)
 
     #Set Scene uid
     scene = bpy.context.scene
     new_item = scene.relink.add()
     new_item.uid = str(uid)
+    new_item.instance_of = instance_of
     if bpy.data.is_saved:
         filename_resolved = str(Path(bpy.context.blend_data.filepath).resolve())
         path_resolved = str(Path(path).resolve())
         new_item.path = bpy.path.relpath(path_resolved, start=os.path.dirname(filename_resolved))
     else:
         new_item.path = path
-    mod_time = os.path.getmtime(path)
-    date = time.strftime('%d-%m-%Y %H:%M:%S', time.localtime(mod_time))
-    new_item.version = date
+    store_source_version(new_item, path)
+    invalidate_file_status(path)
     new_item.data_type = data_type
     new_item.data_name = name
+    sync_relink_index()
+    save_digest_cache()
+
+    return uid
+
+#INSTANCING
+#Repeated appends of the same library version copy collections and objects only
+
+def find_instance_source(name, data_type, path):
+    #Full append of this asset and version still in the file, None otherwise
+    if data_type != "collections":
+        return None
+    path = os.path.normcase(os.path.normpath(path))
+    digest = file_digest(path)
+    for item in bpy.context.scene.relink:
+        if item.instance_of or item.data_name != name or item.data_type != data_type or item.digest != digest:
+            continue
+        if os.path.normcase(os.path.normpath(asset_abspath(item.path))) != path:
+            continue
+        if master_collection(item.uid) is not None:
+            return item
+    return None
+
+def master_collection(uid):
+    for collection in get_relink_datablocks(uid, "collections"):
+        if collection.relink.master:
+            return collection
+    return None
+
+def remap_object_pointers(struct, copies):
+    #Object pointers of constraints and modifiers to the copied objects
+    for prop in struct.bl_rna.properties:
+        if prop.type == 'POINTER' and not prop.is_readonly:
+            value = getattr(struct, prop.identifier)
+            if isinstance(value, bpy.types.Object) and value in copies:
+                setattr(struct, prop.identifier, copies[value])
+
+def instance_loaded(uid):
+    #Copy the collections and objects of an asset, returns the same (data, original_objects) as an append
+    source = master_collection(uid)
+    copies = {}
+    for obj in source.all_objects:
+        copies[obj] = obj.copy()
+
+    def copy_tree(collection):
+        new_collection = bpy.data.collections.new(collection.name)
+        for obj in collection.objects:
+            new_collection.objects.link(copies[obj])
+        for child in collection.children:
+            new_collection.children.link(copy_tree(child))
+        return new_collection
+    data = copy_tree(source)
+
+    for original, obj in copies.items():
+        if obj.parent in copies:
+            obj.parent = copies[obj.parent]
+        for constraint in obj.constraints:
+            remap_object_pointers(constraint, copies)
+        for modifier in obj.modifiers:
+            remap_object_pointers(modifier, copies)
+        if obj.type == "ARMATURE":
+            for bone in obj.pose.bones:
+                for constraint in bone.constraints:
+                    remap_object_pointers(constraint, copies)
+
+    originals = dict((obj, original) for original, obj in copies.items())
+    original_objects = [originals[obj].relink.original_name for obj in data.all_objects]
+    data.relink.master = False
+    return data, original_objects
+
+def instance_group(uid):
+    #uids sharing datablocks with this asset, source first
+    item = find_relink_item(uid)
+    if item is None:
+        return [uid]
+    source = item.instance_of if item.instance_of and find_relink_item(item.instance_of) is not None else uid
+    group = [source]
+    for scene in bpy.data.scenes:
+        for other in scene.relink:
+            if other.instance_of == source and other.uid not in group:
+                group.append(other.uid)
+    return group
+
+def asset_in_scene(uid):
+    #False when the user deleted the objects of the asset but its scene entry is left
+    return any(obj.users_scene for obj in get_relink_datablocks(uid, "objects") if obj.relink.uid == uid)
+
+def expand_instance_groups(uids, promote = True):
+    #A source deleted from the scene is not appended again, its first instance takes over
+    #Without promote (dry run) the deleted source is only left out
+    expanded = []
+    for uid in uids:
+        group = instance_group(uid)
+        if group[0] != uid and not asset_in_scene(group[0]):
+            if promote:
+                promote_instance(group[0])
+                group = instance_group(uid)
+            else:
+                group = group[1:]
+        for member in group:
+            if member not in expanded:
+                expanded.append(member)
+    return expanded
+
+def promote_instance(uid):
+    #Before the source of instances is deleted, the first instance takes over the shared datablocks
+    group = instance_group(uid)
+    if group[0] != uid or len(group) < 2:
+        return
+    new_source = group[1]
+    for datablock in ["materials", "node_groups", "images", "actions", "particles"]:
+        for data in get_relink_datablocks(uid, datablock):
+            data.relink.uid = new_source
+            index_datablock(new_source, datablock, data)
+    for member in group[1:]:
+        find_relink_item(member).instance_of = "" if member == new_source else new_source
+    sync_relink_index()
+
+def append_asset(name, data_type, path, active, instance = False):
+    ensure_relink_index()
+
+    #Share the datablocks of an unchanged copy already in the file
+    source = find_instance_source(name, data_type, path) if instance else None
+
+    #Append/link
+    if source is not None:
+        loaded = instance_loaded(source.uid)
+    else:
+        loaded = append_library_assets(path, [(data_type, name)])[0]
+
+    if active:
+        collection = bpy.context.collection
+    else:
+        collection = bpy.context.scene.collection
+    uid = register_asset(loaded, name, data_type, path, collection,
+        instance_of = source.uid if source is not None else "")
 
     update_cam_link()
 
-    return asset[0].name, uid
+    return loaded[0].name, uid
+
+def snapshot_material_settings(materials):
+    #Overridden node group inputs, see NodeSnapshot
+    return NodeSnapshot().capture(materials)
+
+def restore_material_settings(materials, materials_settings):
+    return materials_settings.restore(materials)
+
+#FINGERPRINTS
+#Structural hashes used to compare the in-scene copy of an asset with a fresh append
+
+FINGERPRINT_SKIP = {"rna_type", "name", "location", "width", "height", "dimensions", "select",
+    "hide", "mute", "show_options", "show_preview", "show_texture", "show_expanded",
+    "show_viewport", "show_render", "show_in_editmode", "show_on_cage", "is_active",
+    "override", "override_colors"}
+
+def strip_suffix(name):
+    return sub(r"\.\d{3}$", "", name)
+
+def id_key(data):
+    #Name of an ID without the suffix added when the same asset is appended twice
+    relink_data = getattr(data, "relink", None)
+    if relink_data is not None and getattr(relink_data, "original_name", ""):
+        return relink_data.original_name
+    return strip_suffix(data.name)
+
+def fingerprint_value(value):
+    if isinstance(value, bpy.types.ID):
+        return id_key(value)
+    if isinstance(value, (bool, int, float, str)) or value is None:
+        return value
+    try:
+        return tuple(value)
+    except TypeError:
+        return None
+
+def rna_fingerprint(struct):
+    values = []
+    for prop in struct.bl_rna.properties:
+        identifier = prop.identifier
+        if identifier in FINGERPRINT_SKIP:
+            continue
+        if prop.type == 'POINTER':
+            if not isinstance(getattr(struct, identifier, None), bpy.types.ID):
+                continue
+        elif prop.type == 'COLLECTION' or prop.is_readonly:
+            continue
+        try:
+            values.append((identifier, fingerprint_value(getattr(struct, identifier))))
+        except AttributeError:
+            pass
+    return hashlib.blake2b(repr(values).encode(), digest_size=16).hexdigest()
+
+def array_fingerprint(digest, collection, attribute, size, dtype = np.float32):
+    array = np.empty(len(collection) * size, dtype=dtype)
+    collection.foreach_get(attribute, array)
+    digest.update(array.tobytes())
+
+def mesh_fingerprint(mesh):
+    digest = hashlib.blake2b(digest_size=16)
+    counts = (len(mesh.vertices), len(mesh.edges), len(mesh.polygons), len(mesh.loops))
+    digest.update(repr(counts).encode())
+    array_fingerprint(digest, mesh.vertices, "co", 3)
+    array_fingerprint(digest, mesh.loops, "vertex_index", 1, np.int32)
+    #Same loops split into other faces
+    array_fingerprint(digest, mesh.polygons, "loop_total", 1, np.int32)
+    array_fingerprint(digest, mesh.polygons, "material_index", 1, np.int32)
+    for layer in mesh.uv_layers:
+        digest.update(layer.name.encode())
+        array_fingerprint(digest, layer.data, "uv", 2)
+    for layer in mesh.vertex_colors:
+        digest.update(layer.name.encode())
+        array_fingerprint(digest, layer.data, "color", 4)
+    digest.update(repr([id_key(m) for m in mesh.materials if m is not None]).encode())
+    return digest.hexdigest()
+
+def armature_fingerprint(armature):
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr([(b.name, b.parent.name if b.parent else "") for b in armature.bones]).encode())
+    array_fingerprint(digest, armature.bones, "head_local", 3)
+    array_fingerprint(digest, armature.bones, "tail_local", 3)
+    return digest.hexdigest()
+
+def data_fingerprint(data):
+    #None when the data type has no cheap fingerprint, it is always replaced
+    if isinstance(data, bpy.types.Mesh):
+        return mesh_fingerprint(data)
+    if isinstance(data, bpy.types.Armature):
+        return armature_fingerprint(data)
+    return None
+
+def override_sockets(node_tree):
+    #{node name: socket identifiers} the shot overrides, see NodeSnapshot
+    #Their values are set again after the swap, the source values are lost in the shot copy
+    sockets = {}
+    for node in node_tree.nodes:
+        if node.bl_idname in OVERRIDE_NODES and node.override:
+            sockets[node.name] = set(input.identifier for input in node.inputs if socket_value(node, input) is not None)
+    return sockets
+
+def node_tree_fingerprint(node_tree, skip = None):
+    #Topology and values of one tree, nested groups are compared separately
+    #skip: sockets left out, see override_sockets
+    skip = skip or {}
+    nodes = []
+    for node in sorted(node_tree.nodes, key=lambda n: n.name):
+        inputs = []
+        skipped = skip.get(node.name, ())
+        for input in node.inputs:
+            if input.identifier in skipped:
+                inputs.append((input.identifier, None))
+            elif hasattr(input, "default_value"):
+                inputs.append((input.identifier, fingerprint_value(input.default_value)))
+            else:
+                inputs.append((input.identifier, None))
+        nodes.append((node.bl_idname, node.name, rna_fingerprint(node), inputs))
+    links = sorted((l.from_node.name, l.from_socket.identifier, l.to_node.name, l.to_socket.identifier)
+        for l in node_tree.links)
+    return hashlib.blake2b(repr((nodes, links)).encode(), digest_size=16).hexdigest()
+
+def material_fingerprint(material, skip = None):
+    tree = node_tree_fingerprint(material.node_tree, skip) if material.node_tree is not None else None
+    return rna_fingerprint(material), tree
+
+def image_fingerprint(image):
+    packed = image.packed_file.size if image.packed_file is not None else 0
+    return image.filepath, image.source, packed, image.colorspace_settings.name, image.alpha_mode
+
+def object_structure(obj):
+    return (
+        obj.type,
+        id_key(obj.parent) if obj.parent is not None else "",
+        obj.parent_type,
+        obj.parent_bone,
+        [(m.name, m.type, rna_fingerprint(m)) for m in obj.modifiers],
+        [vg.name for vg in obj.vertex_groups],
+        [slot.link for slot in obj.material_slots],
+        )
+
+#DIFFERENTIAL RELINK
+
+def appended_ids(collection):
+    #Every datablock brought in by an appended collection
+    ids = []
+    def add(data):
+        if data is not None and data not in ids:
+            ids.append(data)
+    for child_collection in traverse_tree(collection):
+        add(child_collection)
+    for obj in collection.all_objects:
+        add(obj)
+        add(obj.data)
+        if obj.animation_data is not None:
+            add(obj.animation_data.action)
+        for particles in obj.particle_systems:
+            add(particles.settings)
+        for slot in obj.material_slots:
+            material = slot.material
+            if material is None or material in ids:
+                continue
+            add(material)
+            if material.node_tree is not None:
+                for node_tree in traverse_node_tree(material.node_tree):
+                    if node_tree is not material.node_tree:
+                        add(node_tree)
+                    for node in node_tree.nodes:
+                        if node.bl_idname == "ShaderNodeTexImage":
+                            add(node.image)
+    return ids
+
+def pair_node_trees(old_tree, new_tree, pairs):
+    #Pair nested groups and images by node name
+    for node in old_tree.nodes:
+        new_node = new_tree.nodes.get(node.name)
+        if new_node is None or new_node.bl_idname != node.bl_idname:
+            continue
+        if node.bl_idname == "ShaderNodeTexImage":
+            if node.image is not None and new_node.image is not None:
+                pairs.append(("images", node.image, new_node.image))
+        elif node.bl_idname == "ShaderNodeGroup":
+            if node.node_tree is not None and new_node.node_tree is not None:
+                pairs.append(("node_groups", node.node_tree, new_node.node_tree))
+                pair_node_trees(node.node_tree, new_node.node_tree, pairs)
+
+def differential_pairs(uid, loaded):
+    #Match old and new datablocks, None when the asset structure changed
+    collection, original_object = loaded
+    if not isinstance(collection, bpy.types.Collection):
+        return None
+
+    old_objects = {obj.relink.original_name: obj for obj in get_relink_datablocks(uid, "objects")}
+    new_objects = {}
+    for i, obj in enumerate(collection.all_objects):
+        new_objects[original_object[i]] = obj
+    if set(old_objects.keys()) != set(new_objects.keys()):
+        return None
+
+    old_masters = [c for c in get_relink_datablocks(uid, "collections") if c.relink.master]
+    if len(old_masters) != 1:
+        return None
+    old_tree = [(strip_suffix(c.name), sorted(o.relink.original_name for o in c.objects)) for c in traverse_tree(old_masters[0])]
+    names = dict(zip(collection.all_objects, original_object))
+    new_tree = [(strip_suffix(c.name), sorted(names[o] for o in c.objects)) for c in traverse_tree(collection)]
+    if old_tree != new_tree:
+        return None
+
+    pairs = []
+    for name, old_obj in old_objects.items():
+        new_obj = new_objects[name]
+        if old_obj.particle_systems or new_obj.particle_systems:
+            return None
+        new_structure = object_structure(new_obj)
+        #Parent of a new object is a new object, compare original names
+        if new_obj.parent is not None:
+            new_structure = new_structure[:1] + (names.get(new_obj.parent, ""),) + new_structure[2:]
+        if object_structure(old_obj) != new_structure:
+            return None
+        manifest = read_constraint_manifest(old_obj)
+        if manifest is None or manifest.object != frozenset(c.name for c in new_obj.constraints):
+            return None
+
+        if old_obj.data is not None and new_obj.data is not None:
+            pairs.append(("data", old_obj.data, new_obj.data))
+        for old_slot, new_slot in zip(old_obj.material_slots, new_obj.material_slots):
+            if old_slot.material is not None and new_slot.material is not None:
+                pairs.append(("materials", old_slot.material, new_slot.material))
+                if old_slot.material.node_tree is not None and new_slot.material.node_tree is not None:
+                    pair_node_trees(old_slot.material.node_tree, new_slot.material.node_tree, pairs)
+
+    #Shared datablocks are paired once
+    unique = []
+    seen = set()
+    for datablock, old, new in pairs:
+        if old.as_pointer() in seen or new.as_pointer() in seen:
+            continue
+        seen.add(old.as_pointer())
+        seen.add(new.as_pointer())
+        unique.append((datablock, old, new))
+    return unique
+
+def same_datablock(datablock, old, new):
+    if datablock == "data":
+        fingerprint = data_fingerprint(old)
+        return fingerprint is not None and fingerprint == data_fingerprint(new)
+    #Overrides of the shot copy are compared on both sides as if they were not set
+    if datablock == "materials":
+        skip = override_sockets(old.node_tree) if old.node_tree is not None else None
+        return material_fingerprint(old, skip) == material_fingerprint(new, skip)
+    if datablock == "node_groups":
+        skip = override_sockets(old)
+        return node_tree_fingerprint(old, skip) == node_tree_fingerprint(new, skip)
+    if datablock == "images":
+        return image_fingerprint(old) == image_fingerprint(new)
+    return False
+
+def differential_update(uid, loaded, path):
+    #Swap only the datablocks that changed, returns the number of swapped datablocks or None
+    pairs = differential_pairs(uid, loaded)
+    collection = loaded[0]
+    new_ids = appended_ids(collection) if isinstance(collection, bpy.types.Collection) else []
+    if pairs is None:
+        bpy.data.batch_remove(new_ids)
+        return None
+
+    changed = [(d, old, new) for d, old, new in pairs if not same_datablock(d, old, new)]
+    unchanged = [(d, old, new) for d, old, new in pairs if (d, old, new) not in changed]
+    materials_settings = snapshot_material_settings([old for d, old, new in changed if d == "materials"])
+
+    #Keep the in-scene copy
+    for datablock, old, new in unchanged:
+        new.user_remap(old)
+
+    #Replace with the new version
+    kept = []
+    remove = []
+    for datablock, old, new in changed:
+        name = old.name
+        old.user_remap(new)
+        remove.append(old)
+        kept.append((datablock, new, name))
+        if datablock in RELINK_DATABLOCKS:
+            _relink_index.get(uid, {}).get(datablock, set()).discard(name)
+    bpy.data.batch_remove(remove)
+
+    for datablock, new, name in kept:
+        new.name = name
+        if datablock in RELINK_DATABLOCKS:
+            new.relink.uid = uid
+            index_datablock(uid, datablock, new)
+    restore_material_settings([new for d, new, name in kept if d == "materials"], materials_settings)
+
+    #Drop the rest of the fresh append
+    kept_ids = set(new.as_pointer() for d, new, name in kept)
+    bpy.data.batch_remove([data for data in new_ids if data.as_pointer() not in kept_ids])
+    sync_relink_index()
+
+    item = find_relink_item(uid)
+    store_source_version(item, path)
+    invalidate_file_status(path)
+    save_digest_cache()
+
+    return len(kept)
+
+def missing_item_info(uid):
+    return ("warning", "Asset {} is no longer in the scene".format(uid))
+
+def prepare_relink(uid, profile):
+    #Keep everything needed to rebuild the asset, then remove the old datablocks
+    #None when the scene entry is gone, nothing is removed
+    state = {"uid": uid, "info": ("", "")}
 
-def relink(uid):
-    info = ("", "")
     #Get asset metadata    
-    for item in bpy.context.scene.relink:
-        if item.uid == uid:
-            name = item.data_name
-            data_type = item.data_type
-            path = item.path
-            if platform.system() == "Linux":
-                path = path.replace('\\', os.path.sep).replace('/', os.path.sep)
-            path = bpy.path.abspath(path)
+    item = find_relink_item(uid)
+    if item is None:
+        return None
+    state["name"] = item.data_name
+    state["data_type"] = item.data_type
+    state["path"] = asset_abspath(item.path)
+    state["instance_of"] = item.instance_of
 
     actions = {}
     old_objects = {}    
-    for obj in bpy.data.objects:
-        if obj.relink.uid == uid:
-            #Keep actions
-            if obj.animation_data is not None:
-                if obj.animation_data.action is not None:
-                    actions[obj.relink.original_name] = obj.animation_data.action
-            #Keep objects
-            obj.name = obj.name + str(uid)
-            if obj.data:
-                obj.data.name = obj.data.name + str(uid)
-            old_objects[obj.relink.original_name] = obj
+    #Names freed by the old version, the new one takes them back
+    names = {"collections": set(), "objects": set(), "data": set(), "materials": set(), "node_groups": set(), "images": set()}
+    state["names"] = names
+    with profile.phase("gather objects"):
+        for obj in get_relink_datablocks(uid, "objects"):
+            if obj.relink.uid == uid:
+                #Keep actions
+                if obj.animation_data is not None:
+                    if obj.animation_data.action is not None:
+                        actions[obj.relink.original_name] = obj.animation_data.action
+                #Keep objects
+                names["objects"].add(obj.name)
+                obj.name = obj.name + str(uid)
+                if obj.data:
+                    names["data"].add(obj.data.name)
+                    obj.data.name = obj.data.name + str(uid)
+                old_objects[obj.relink.original_name] = obj
+                profile.count()
+    state["actions"] = actions
+    state["old_objects"] = old_objects
+
     #Keep Shader parameters
-    materials_settings = {}    
-    for material in bpy.data.materials:
-        if material.relink.uid == uid:
-            if material.node_tree is not None:
-                for node_tree in traverse_node_tree(material.node_tree):
-                    node_tree_action = None
-                    if node_tree.animation_data is not None:
-                        if node_tree.animation_data.action is not None:                            
-                            node_tree_action = node_tree.animation_data.action
-                    for node in node_tree.nodes:
-                        if node.bl_idname in ('ShaderNodeGroup', 'ILLU_2DShade'):
-                            if node.override:
-                                parameters = {}
-                                for input in node.inputs:
-                                    if input.bl_idname == "NodeSocketColor" :
-                                        if node.override_colors or input.name == "Tons Clairs" or input.name == "Tons Fonçés":
-                                            value = input.default_value[:]
-                                        #if input.name == "Tons Clairs":
-                                            #value = input.default_value[:]
-              
-                                        else:
-                                            value = None 
-                                    elif input.bl_idname == "NodeSocketObject":
-                                        if input.default_value:                                      
-                                            value = input.default_value.name
-                                        else:
-                                            value = None
-                                    else:
-                                        value = input.default_value                                                      
-                                    parameters[input.name] = value
-                                    parameters["action"] = node_tree_action
-                                materials_settings[material.name] = {node.node_tree.name : parameters}
+    with profile.phase("snapshot materials"):
+        materials = get_relink_datablocks(uid, "materials")
+        materials_settings = snapshot_material_settings(materials)
+        profile.count(len(materials))
+    state["materials_settings"] = materials_settings
 
     #Remove collections
     coll_scene = bpy.context.scene.collection
-    coll_parents = parent_lookup(coll_scene)
+    with profile.phase("delete collections"):
+        coll_parents = parent_lookup(coll_scene)
 
+        collection_delete = []
+        coll_parent = None
+        for collection in get_relink_datablocks(uid, "collections"):        
+            if collection.relink.uid == uid and collection.relink.master:
+                coll_parent = coll_parents.get(collection.name) 
+                for child_collection in traverse_tree(collection):
+                    collection_delete.append(child_collection)
+
+        for collection in reversed(collection_delete):
+            names["collections"].add(collection.name)
+            remove_relink_datablock(uid, "collections", collection)
+        profile.count(len(collection_delete))
+
+    #Parent collection of the new version
+    parent = bpy.data.collections.get(coll_parent) if coll_parent else None
+    if parent is None:
+        for obj in old_objects.values():
+            if obj.users_collection:
+                parent = obj.users_collection[0]
+                break
+    if parent is None:
+        parent = coll_scene
+    state["parent"] = parent
     
-    collection_delete = []
-    for collection in bpy.data.collections:        
-        if collection.relink.uid == uid and collection.relink.master:
-            coll_parent = coll_parents.get(collection.name) 
-            for child_collection in traverse_tree(collection):
-                collection_delete.append(child_collection)
-
-    for collection in reversed(collection_delete):
-        bpy.data.collections.remove(collection)
-    
-    
-    #Remove datablocks
-    datablocks = ["collections", "materials", "node_groups", "images"]
-    for datablock in datablocks:
-        datas = getattr(bpy.data, datablock)
-        for data in datas:
-            if data.relink.uid == uid:
-                datas.remove(data)
-
-    #Rename particle system
-    for particle in bpy.data.particles:
-        particle.name = particle.name + str(uid)                
+    with profile.phase("remove datablocks"):
+        #Remove datablocks
+        datablocks = ["collections", "materials", "node_groups", "images"]
+        for datablock in datablocks:
+            for data in get_relink_datablocks(uid, datablock):
+                names[datablock].add(data.name)
+                remove_relink_datablock(uid, datablock, data)
+                profile.count()
+
+        #Rename particle system
+        for particle in get_relink_datablocks(uid, "particles"):
+            particle.name = particle.name + str(uid)                
    
-    #Remove actions:
-    for action in bpy.data.actions:
-        if action.relink.uid == uid and action not in actions.values():
-            bpy.data.actions.remove(action)
+        #Remove actions:
+        for action in get_relink_datablocks(uid, "actions"):
+            if action not in actions.values():
+                remove_relink_datablock(uid, "actions", action)
+                profile.count()
 
     #Remove scene uid
-    for index, item in enumerate(bpy.context.scene.relink):
-        if item.uid == uid:
-            bpy.context.scene.relink.remove(index)
-    
-    #Reload 
-    layer_collection = bpy.context.view_layer.layer_collection
-    layerColl = recurLayerCollection(layer_collection, coll_parent)
-    bpy.context.view_layer.active_layer_collection = layerColl
-    
-    result, new_uid = append_asset(name, data_type, path, True)
-    
-    for obj in bpy.data.objects:
-        if obj.relink.uid == str(new_uid):
-            #Remap actions
-            if obj.relink.original_name in actions.keys():
-                if obj.animation_data is None:
-                    obj.animation_data_create()
-                obj.animation_data.action = actions[obj.relink.original_name]  
-
-            #Remap constraints
-            if old_objects.get(obj.relink.original_name) is not None:      
-                old_obj = old_objects[obj.relink.original_name] #Risque de bug s'il y a plusieurs objets qui viennent du même asset
-                old_obj.user_remap(obj)
-                metadata = json.loads(old_obj.relink.metadata)
-                original_constraints = metadata["constraints"]
-                for constraint in old_obj.constraints:
-                    if constraint.name not in original_constraints:
-                        try:
-                            obj.constraints.copy(constraint)
-                        except:
-                            info =  ("warning", "Constraint update failed, hierarchy mismatch") #Pourquoi ?
-                            pass
+    remove_relink_item(uid)
+    unindex_uid(uid)
 
-                if obj.type == "ARMATURE":
-                    for bone in old_obj.pose.bones:                    
-                        metadata = json.loads(bone.relink.metadata)
-                        original_constraints = metadata["constraints"]
-                        for constraint in bone.constraints:
-                            if constraint.name not in original_constraints:
-                                try:
-                                    obj.pose.bones[bone.name].constraints.copy(constraint)
-                                except:
-                                    info =  ("warning", "Constraint update failed, hierarchy mismatch")
-                                    pass
+    return state
+
+def finish_relink(state, loaded, profile, instance_of = ""):
+    #Register the new version and remap local changes from the old one
+    info = state["info"]
+    actions = state["actions"]
+    old_objects = state["old_objects"]
+    materials_settings = state["materials_settings"]
+
+    with profile.phase("register"):
+        new_uid = register_asset(loaded, state["name"], state["data_type"], state["path"], state["parent"],
+            instance_of = instance_of)
+    
+    with profile.phase("remap"):
+        for obj in get_relink_datablocks(str(new_uid), "objects"):
+            if obj.relink.uid == str(new_uid):
+                profile.count()
+                #Remap actions
+                if obj.relink.original_name in actions.keys():
+                    if obj.animation_data is None:
+                        obj.animation_data_create()
+                    obj.animation_data.action = actions[obj.relink.original_name]  
+
+                #Remap constraints
+                if old_objects.get(obj.relink.original_name) is not None:      
+                    old_obj = old_objects[obj.relink.original_name] #Risque de bug s'il y a plusieurs objets qui viennent du même asset
+                    old_obj.user_remap(obj)
+                    manifest = read_constraint_manifest(old_obj)
+                    #Without manifest the added constraints are unknown, none is copied
+                    if manifest is not None:
+                        original_constraints = manifest.object
+                    else:
+                        original_constraints = frozenset(c.name for c in old_obj.constraints)
+                    for constraint in old_obj.constraints:
+                        if constraint.name not in original_constraints:
+                            try:
+                                obj.constraints.copy(constraint)
+                            except:
+                                info =  ("warning", "Constraint update failed, hierarchy mismatch") #Pourquoi ?
+                                pass
+
+                    if obj.type == "ARMATURE" and manifest is not None:
+                        for bone in old_obj.pose.bones:                    
+                            original_constraints = manifest.bone(bone.name)
+                            for constraint in bone.constraints:
+                                if constraint.name not in original_constraints:
+                                    try:
+                                        obj.pose.bones[bone.name].constraints.copy(constraint)
+                                    except:
+                                        info =  ("warning", "Constraint update failed, hierarchy mismatch")
+                                        pass
                                 
-                #Update transform for static objects
-                if obj.animation_data is not None:
-                    if obj.animation_data.action is not None:
-                        action = obj.animation_data.action
-                        if action.fcurves.find("location") is None:
+                    #Update transform for static objects
+                    if obj.animation_data is not None:
+                        if obj.animation_data.action is not None:
+                            action = obj.animation_data.action
+                            if action.fcurves.find("location") is None:
+                                obj.location = old_obj.location
+                            if action.fcurves.find("rotation_euler") is None:
+                                obj.rotation_euler = old_obj.rotation_euler
+                            if action.fcurves.find("rotation_quaternion") is None:
+                                obj.rotation_quaternion = old_obj.rotation_quaternion
+                            if action.fcurves.find("scale") is None:
+                                obj.scale = old_obj.scale
+                        else:
                             obj.location = old_obj.location
-                        if action.fcurves.find("rotation_euler") is None:
-                            obj.rotation_euler = old_obj.rotation_euler
-                        if action.fcurves.find("rotation_quaternion") is None:
-                            obj.rotation_quaternion = old_obj.rotation_quaternion
-                        if action.fcurves.find("scale") is None:
+                            obj.rotation_euler = old_obj.rotation_euler       
+                            obj.rotation_quaternion = old_obj.rotation_quaternion      
                             obj.scale = old_obj.scale
                     else:
                         obj.location = old_obj.location
                         obj.rotation_euler = old_obj.rotation_euler       
                         obj.rotation_quaternion = old_obj.rotation_quaternion      
                         obj.scale = old_obj.scale
-                else:
-                    obj.location = old_obj.location
-                    obj.rotation_euler = old_obj.rotation_euler       
-                    obj.rotation_quaternion = old_obj.rotation_quaternion      
-                    obj.scale = old_obj.scale
                     
-                #Update illu
-                if hasattr(obj, "illu"):
-                    obj.illu.cast_shadow = old_obj.illu.cast_shadow
+                    #Update illu
+                    if hasattr(obj, "illu"):
+                        obj.illu.cast_shadow = old_obj.illu.cast_shadow
 
     #Update material settings
-    
-    for material in bpy.data.materials:
-        if material.relink.uid == str(new_uid):
-            if material.node_tree is not None:
-                for node_tree in traverse_node_tree(material.node_tree):
-                    for node in node_tree.nodes:
-                        if node.bl_idname in ('ShaderNodeGroup', 'ILLU_2DShade'):
-                            if materials_settings.get(material.name) is not None:
-                                node_settings = materials_settings.get(material.name).get(node.node_tree.name)
-                                if node_settings:
-                                    for input in node.inputs:                                                                              
-                                        value = node_settings.get(input.name)
-                                        if value is not None:
-                                            if input.bl_idname == "NodeSocketObject":
-                                                input.default_value = bpy.data.objects[value]
-                                            else:
-                                                input.default_value = value
-                                
-                                    if node_settings["action"]:
-                                        node_tree.animation_data.action = node_settings["action"]
+    with profile.phase("restore materials"):
+        materials = get_relink_datablocks(str(new_uid), "materials")
+        restore_material_settings(materials, materials_settings)
+        profile.count(len(materials))
   
-    #Delete old objects
-    for old_obj in old_objects.values():    
-        #Delete object data
-        if old_obj.data is not None:
-            data_types = ["meshes", "armatures", "curves", "cameras", "grease_pencils", 
-                "lights", "lattices", "lightprobes", "metaballs", "volumes"]
-            for data in data_types:
-                try:
-                    eval("bpy.data.{}.remove(obj.data)".format(data))
-                except:
-                    pass 
+    with profile.phase("delete old objects"):
+        #Delete old objects
+        for old_obj in old_objects.values():    
+            old_data = old_obj.data
+            try:
+                bpy.data.objects.remove(old_obj) #Pas forcément utile
+                profile.count()
+            except:
+                pass
+            #Delete object data, instances may still use it
+            if old_data is not None and old_data.users == 0:
+                bpy.data.batch_remove([old_data])
+
+    with profile.phase("rename"):
+        restore_datablock_names(str(new_uid), state["names"])
+    sync_relink_index()
+
+    return info, new_uid
+
+def rename_datablock(data, names):
+    #Appended while the old version was still there, the datablock got a suffix
+    name = strip_suffix(data.name)
+    if data.library is None and name != data.name and name in names:
+        data.name = name
+
+def restore_datablock_names(uid, names):
+    #names: freed by the old version, see prepare_relink
+    for datablock in ["collections", "objects", "materials", "node_groups", "images"]:
+        for data in get_relink_datablocks(uid, datablock):
+            rename_datablock(data, names[datablock])
+            if datablock == "objects" and data.data is not None:
+                rename_datablock(data.data, names["data"])
+
+def group_by_library(entries):
+    #Group by resolved source path
+    libraries = {}
+    for entry in entries:
+        key = os.path.normcase(os.path.normpath(entry["path"]))
+        libraries.setdefault(key, []).append(entry)
+    return libraries.values()
+
+def relink_differential(uids, infos, profile):
+    #Returns the uids that need a full relink
+    remaining = []
+    entries = []
+    for uid in uids:
+        item = find_relink_item(uid)
+        if item.data_type != "collections" or len(instance_group(uid)) > 1:
+            remaining.append(uid)
+            continue
+        entries.append({"uid": uid, "name": item.data_name, "data_type": item.data_type,
+            "path": asset_abspath(item.path)})
+    if not entries:
+        return remaining
+
+    #The append can bring more than the asset: nested groups, textures, fake user datablocks
+    existing = id_pointers()
+    for library_entries in group_by_library(entries):
+        path = library_entries[0]["path"]
+        requests = [(entry["data_type"], entry["name"]) for entry in library_entries]
+        with profile.phase("append"):
+            results = append_library_assets(path, requests)
+            profile.count(len(requests))
+
+        for entry, loaded in zip(library_entries, results):
+            swapped = None
+            if loaded is not None:
+                with profile.phase("differential"):
+                    swapped = differential_update(entry["uid"], loaded, path)
+                    profile.count(swapped or 0)
+            if swapped is None:
+                remaining.append(entry["uid"])
+            else:
+                infos[entry["uid"]] = ("", "{} datablock(s) replaced".format(swapped))
+
+    with profile.phase("purge"):
+        profile.count(purge_new_orphans(existing))
+    return remaining
+
+def check_relink_sources(uids, infos):
+    #Read the library headers before anything is removed, returns the uids that can be relinked
+    valid = []
+    for uid in uids:
+        item = find_relink_item(uid)
+        if item is None:
+            infos[uid] = missing_item_info(uid)
+            continue
+        path = asset_abspath(item.path)
         try:
-            bpy.data.objects.remove(old_obj) #Pas forcément utile
-        except:
-            pass
+            found = has_datablock(path, item.data_type, item.data_name)
+        except (OSError, BlendFileError):
+            #Unreadable header, let libraries.load decide
+            found = True
+        if found:
+            valid.append(uid)
+        else:
+            infos[uid] = ("warning", "{} not found in {}".format(item.data_name, path))
+    return valid
+
+def relink_report_file():
+    return os.path.join(user_cache_dir(), "relink_report.json")
+
+def plan_relink(uids, infos, differential, profile):
+    #Dry run: list what a relink would remove, append and remap, nothing is changed
+    for uid in uids:
+        with profile.phase("plan"):
+            item = find_relink_item(uid)
+            objects = [obj for obj in get_relink_datablocks(uid, "objects") if obj.relink.uid == uid]
+            actions = {}
+            for obj in objects:
+                if obj.animation_data is not None and obj.animation_data.action is not None:
+                    actions[obj.relink.original_name] = obj.animation_data.action.name
+
+            remove = {}
+            for datablock in ["collections", "materials", "node_groups", "images", "actions"]:
+                names = [data.name for data in get_relink_datablocks(uid, datablock)]
+                if datablock == "actions":
+                    names = [name for name in names if name not in actions.values()]
+                if names:
+                    remove[datablock] = sorted(names)
+            removed = sum(len(names) for names in remove.values())
+            profile.count(removed + len(objects))
+
+            profile.asset(uid,
+                name = item.data_name,
+                append = {"data_type": item.data_type, "name": item.data_name, "path": asset_abspath(item.path)},
+                remove = remove,
+                remap = sorted(obj.relink.original_name for obj in objects),
+                overrides = len(snapshot_material_settings(get_relink_datablocks(uid, "materials"))),
+                actions = actions,
+                differential = differential and item.data_type == "collections",
+                )
+            infos[uid] = ("", "would remove {} datablock(s), append {} and remap {} object(s)".format(
+                removed, item.data_name, len(objects)))
+
+def relink_assets(uids, differential = False, dry_run = False, profile = None):
+    #Relink several assets, each source library is loaded once
+    #With a profile the caller keeps adding to it and saves the report
+    ensure_relink_index()
+    infos = {}
+    save_report = profile is None
+    if profile is None:
+        profile = RelinkProfile(dry_run = dry_run)
+
+    with profile.phase("check sources"):
+        uids = check_relink_sources(expand_instance_groups(uids, promote = not dry_run), infos)
+        profile.count(len(uids))
+
+    if dry_run:
+        plan_relink(uids, infos, differential, profile)
+    else:
+        if differential:
+            uids = relink_differential(uids, infos, profile)
+
+        #Instances are copied from the new version of their source
+        new_uids = {}
+        instances = [uid for uid in uids if find_relink_item(uid).instance_of in uids]
+        sources = []
+        for uid in uids:
+            if uid not in instances:
+                item = find_relink_item(uid)
+                sources.append({"uid": uid, "name": item.data_name, "data_type": item.data_type,
+                    "path": asset_abspath(item.path)})
+
+        #The new version is appended before the old one is removed, a failed load leaves the asset untouched
+        for library_entries in group_by_library(sources):
+            path = library_entries[0]["path"]
+            requests = [(entry["data_type"], entry["name"]) for entry in library_entries]
+            with profile.phase("append"):
+                results = append_library_assets(path, requests)
+                profile.count(len(requests))
+
+            for entry, loaded in zip(library_entries, results):
+                uid = entry["uid"]
+                if loaded is None:
+                    infos[uid] = ("warning", "{} not found in {}, asset left untouched".format(entry["name"], path))
+                    continue
+                start = time.perf_counter()
+                state = prepare_relink(uid, profile)
+                if state is None:
+                    infos[uid] = missing_item_info(uid)
+                    #Drop the fresh append
+                    data = loaded[0]
+                    bpy.data.batch_remove(appended_ids(data) if isinstance(data, bpy.types.Collection) else [data])
+                    continue
+                info, new_uid = finish_relink(state, loaded, profile)
+                profile.asset_time(uid, time.perf_counter() - start)
+                infos[uid] = info
+                new_uids[uid] = str(new_uid)
+                profile.asset(uid, new_uid = str(new_uid))
+
+        for uid in instances:
+            item = find_relink_item(uid)
+            source = new_uids.get(item.instance_of)
+            if source is None:
+                infos[uid] = ("warning", "Source of instance {} not relinked, instance left untouched".format(item.data_name))
+                continue
+            start = time.perf_counter()
+            state = prepare_relink(uid, profile)
+            if state is None:
+                infos[uid] = missing_item_info(uid)
+                continue
+            with profile.phase("instance"):
+                loaded = instance_loaded(source)
+            info, new_uid = finish_relink(state, loaded, profile, instance_of = source)
+            profile.asset_time(uid, time.perf_counter() - start)
+            infos[uid] = info
+            profile.asset(uid, new_uid = str(new_uid))
+
+        with profile.phase("update cameras"):
+            update_cam_link()
+
+    for uid, (status, message) in infos.items():
+        profile.asset(uid, status = status, message = message)
+    if save_report:
+        save_profile_report(relink_report_file(), profile.report())
 
-    return info
+    return infos
+
+def relink(uid, differential = False, dry_run = False):
+    return relink_assets([uid], differential = differential, dry_run = dry_run)[uid]
 
 
 def convert_asset():    
@@ -1112,12 +2077,7 @@ def convert_asset():
 
     #Clean
     bpy.ops.outliner.delete(hierarchy=True)
-    override = bpy.context.copy()
-    for area in bpy.context.screen.areas:
-        if area.type == 'VIEW_3D':
-            override['area'] = area
-    for i in range(10):
-        bpy.ops.outliner.orphans_purge(override)
+    purge_orphans()
 
     #Append
     for datas in collections:
@@ -1135,7 +2095,7 @@ def convert_asset():
         result, new_uid = append_asset(name, "collections", path, True)
         
         #Remap transforms
-        for obj in bpy.data.objects:
+        for obj in get_relink_datablocks(str(new_uid), "objects"):
             if obj.relink.uid == str(new_uid):
                 shortname = obj.name.split(".0")[0]
                 
@@ -1178,60 +2138,695 @@ def delete_hidden():
         for c in reversed(collection_to_delete):
             bpy.data.collections.remove(c)
 
-def check_asset(path, current_date):
-    if platform.system() == "Linux":
-        path = path.replace('\\', os.path.sep).replace('/', os.path.sep)
-    path = bpy.path.abspath(path)
-    
-    mod_time = os.path.getmtime(path)
-    date = time.strftime('%d-%m-%Y %H:%M:%S', time.localtime(mod_time))
-    if date != current_date:
+def check_asset(path, current_date, current_digest = ""):
+    path = asset_abspath(path)
+
+    if current_digest:
+        return file_digest(path) != current_digest
+
+    #Entries saved before content digests
+    if asset_date(path) != current_date:
         return True
 
-def check_updates(auto = False):
+def show_info(message):
+    if bpy.app.background:
+        print(message)
+        return
+    window = bpy.context.window
+    if window is None:
+        windows = bpy.context.window_manager.windows
+        if not windows:
+            return
+        window = windows[0]
+    override = {'window': window, 'screen': window.screen}
+    bpy.ops.workflow.info(override, 'INVOKE_DEFAULT', message = message)
+
+def collect_asset_jobs():
+    #Assets used by objects of the current scene
+    jobs = []
+    scene_objects = set(bpy.context.scene.objects.keys())
+
+    for item in bpy.context.scene.relink:
+        objects = get_relink_datablocks(item.uid, "objects")
+        if any(obj.name in scene_objects for obj in objects):
+            path = os.path.normpath(asset_abspath(item.path))
+            jobs.append((item.uid, path))
+    return jobs
+
+def stale_assets(results):
+    #Returns (names, uids) of the assets whose source changed
     update_list = []
-    objects_uid = []
     to_update = []
 
-    for obj in bpy.context.scene.objects:
-        if obj.relink.uid is not None:
-            objects_uid.append(obj.relink.uid)
-    objects_uid = list(set(objects_uid))
+    for uid, result in results.items():
+        item = find_relink_item(uid)
+        if item is None or result.get("error"):
+            continue
 
-    for item in bpy.context.scene.relink:
-        if item.uid in objects_uid:
-
-            #FIX PATH
-            path = os.path.normpath(bpy.path.abspath(item.path))
-            filename_resolved = str(Path(bpy.context.blend_data.filepath).resolve())
-            path_resolved = str(Path(path).resolve())
-            fix_path = bpy.path.relpath(path_resolved, start=os.path.dirname(filename_resolved))
-            item.path = fix_path
-          
-            update = check_asset(item.path, item.version)
-            if update:
-                update_list.append(item.data_name)
-                to_update.append(item.uid)
-    
+        #FIX PATH
+        if result.get("relpath"):
+            item.path = result["relpath"]
+
+        if item.digest:
+            update = result["digest"] != item.digest
+        else:
+            #Entries saved before content digests
+            date = time.strftime('%d-%m-%Y %H:%M:%S', time.localtime(result["mtime"]))
+            update = date != item.version
+            if not update:
+                item.digest = result["digest"]
+                item.signature = "{} {}".format(*result["signature"])
+        if update:
+            update_list.append(item.data_name)
+            to_update.append(item.uid)
+    return update_list, to_update
+
+def apply_asset_scan(results, auto = False, modal = False):
+    update_list, to_update = stale_assets(results)
     update_list = list(set(update_list))
+    save_digest_cache()
 
     if auto:
-        for item in to_update:
-            relink(item)
+        #Interactive sessions relink one asset at a time in the modal operator
+        if modal and to_update and start_asset_update(to_update):
+            return
+        relink_assets(to_update, differential = bpy.context.scene.differential_relink)
         if update_list:
             message = "Asset(s) " + ", ".join(update_list) + " updated"
-            bpy.ops.workflow.info('INVOKE_DEFAULT', message = message)
+            show_info(message)
         else:
-            bpy.ops.workflow.info('INVOKE_DEFAULT', message = "Nothing to update")
+            show_info("Nothing to update")
         return
 
-    
+    if to_update:
+        prefetch_stale_assets(to_update)
+
     if update_list:
         message = "New asset version for " + ", ".join(update_list)
-        bpy.ops.workflow.info('INVOKE_DEFAULT', message = message)
+        show_info(message)
     
     return update_list
 
+def find_stale_assets():
+    #Synchronous scan, returns (names, uids) of the assets with a new version
+    results = run_scan(collect_asset_jobs(), bpy.context.blend_data.filepath)
+    names, uids = stale_assets(results)
+    save_digest_cache()
+    return names, uids
+
+def relink_units(uids):
+    #Instances are relinked with their source, a unit is relinked in one step
+    #Assets of the same library share a unit, the library is loaded once
+    units = {}
+    queued = set()
+    for uid in uids:
+        if uid in queued:
+            continue
+        group = expand_instance_groups([uid])
+        queued.update(group)
+        item = find_relink_item(group[0])
+        key = os.path.normcase(os.path.normpath(asset_abspath(item.path))) if item is not None else group[0]
+        unit = units.setdefault(key, [])
+        unit.extend(member for member in group if member not in unit)
+    return list(units.values())
+
+def start_asset_update(uids):
+    #Returns False when no window can run the modal operator
+    if bpy.app.background:
+        return False
+    window = bpy.context.window
+    if window is None:
+        windows = bpy.context.window_manager.windows
+        if not windows:
+            return False
+        window = windows[0]
+    override = {'window': window, 'screen': window.screen}
+    bpy.ops.workflow.update_all_assets(override, 'INVOKE_DEFAULT', uids = ",".join(uids))
+    return True
+
+def prefetch_stale_assets(uids):
+    #Copy the new versions to the local mirror while the artist decides to update
+    mirror = asset_mirror()
+    if mirror is None:
+        return
+    preferences = bpy.context.preferences.addons['WorkFlow'].preferences
+    paths = [os.path.normpath(asset_abspath(find_relink_item(uid).path)) for uid in uids]
+    prefetch_assets(mirror, paths,
+        workers = preferences.prefetch_workers,
+        bandwidth = preferences.prefetch_bandwidth * 1024 ** 2,
+        )
+
+def asset_file_status(path):
+    #Memory only, unknown or expired entries are refreshed in the background
+    path = os.path.normpath(asset_abspath(path))
+    ttl = bpy.context.preferences.addons['WorkFlow'].preferences.status_ttl
+    known, expired, status = cached_file_status(path, ttl)
+    if expired:
+        request_file_status(path)
+    return known, status
+
+def check_asset_cached(item):
+    #None while the file status is unknown
+    known, status = asset_file_status(item.path)
+    if not known or status is None or status["digest"] is None:
+        return None
+    if item.digest:
+        return status["digest"] != item.digest
+    date = time.strftime('%d-%m-%Y %H:%M:%S', time.localtime(status["mtime"]))
+    return date != item.version
+
+def check_updates(auto = False):
+    blend_filepath = bpy.context.blend_data.filepath
+    results = run_scan(collect_asset_jobs(), blend_filepath)
+    return apply_asset_scan(results, auto = auto)
+
+def check_updates_async(auto = False):
+    #Stat the asset share in worker threads, popup or relink once results arrive
+    if bpy.app.background:
+        return check_updates(auto = auto)
+
+    preferences = bpy.context.preferences.addons['WorkFlow'].preferences
+    blend_filepath = bpy.context.blend_data.filepath
+
+    def callback(results):
+        if bpy.context.blend_data.filepath != blend_filepath:
+            return
+        apply_asset_scan(results, auto = auto, modal = True)
+
+    jobs = collect_asset_jobs()
+    if not jobs and not auto:
+        return
+    AssetScan(jobs, callback,
+        max_workers = preferences.scan_workers,
+        timeout = preferences.scan_timeout,
+        blend_filepath = blend_filepath,
+        ).start()
+
+def render_progress(frame_start, frame_end, **job):
+    #Progress events of a render on the channel chosen in the preferences
+    target = bpy.context.preferences.addons['WorkFlow'].preferences.progress_channel
+    return RenderProgress(frame_start, frame_end, target = target, file = bpy.data.filepath, **job)
+
+def render_output_path(scene):
+    #File written by render.render(write_still=True)
+    return bpy.path.abspath(scene.render.filepath) + scene.render.file_extension
+
+#BATCH RENDER
+
+def setup_batch_render():
+    #Shared by Batch Render and its chunk workers, returns the output path
+    set_render_settings()
+    bpy.context.scene.render.image_settings.use_preview = True
+    for screen in bpy.data.screens:
+        for area in screen.areas:
+            if area.type == 'VIEW_3D':
+                for space in area.spaces:
+                    if space.type == 'VIEW_3D':
+                        space.overlay.show_overlays = False    
+                        space.shading.type = 'SOLID'
+    return load_settings('render_output')
+
+def frame_outputs(path, frame):
+    #Files a rendered frame leaves behind, encode_preview reads the JPEG
+    scene = bpy.context.scene
+    output = bpy.path.abspath(path + f'{frame:03}')
+    outputs = [output + scene.render.file_extension]
+    if scene.render.image_settings.use_preview:
+        outputs.append(output + ".jpg")
+    return outputs
+
+def render_state(path, unsaved = False):
+    #Digest of what a frame depends on: the saved shot, the asset versions and the render settings
+    scene = bpy.context.scene
+    render = scene.render
+    #Unsaved changes are rendered but not in the saved file, such frames are never valid for a resume
+    if unsaved:
+        shot = "unsaved " + uuid.uuid4().hex
+    else:
+        try:
+            shot = file_digest(bpy.data.filepath)
+        except OSError:
+            shot = ""
+    assets = sorted((item.uid, item.digest or item.version) for item in scene.relink)
+    settings = (path, render.engine, render.resolution_x, render.resolution_y, render.resolution_percentage,
+        render.image_settings.file_format, render.image_settings.color_depth,
+        scene.cycles.samples if render.engine == "CYCLES" else 0,
+        scene.camera.name if scene.camera else "")
+    return hashlib.blake2b(json.dumps([shot, assets, settings]).encode(), digest_size=16).hexdigest()
+
+def render_frames(path, frames, progress, on_frame = None):
+    #on_frame(frame, seconds) is called once the frame is written
+    scene = bpy.context.scene
+    start_render_telemetry(bpy.path.abspath(os.path.dirname(path)))
+    try:
+        for frame in frames:
+            progress.start_frame(frame)
+            number = f'{frame:03}'
+            scene.render.filepath = path + number
+            scene.frame_set(frame)
+            bpy.ops.render.render(write_still=True)
+            seconds = progress.end_frame(frame, output = render_output_path(scene))
+            if on_frame is not None:
+                on_frame(frame, seconds)
+    finally:
+        stop_render_telemetry()
+
+def render_parallel(path, frames, workers, threads, progress, on_frame = None):
+    #Chunks rendered by background Blender, returns the chunk reports
+    #Workers open a copy next to the shot, relative paths stay valid and unsaved changes are rendered
+    filepath = bpy.data.filepath
+    copy = os.path.join(os.path.dirname(filepath), ".{}.{}.render.blend".format(
+        os.path.splitext(os.path.basename(filepath))[0], os.getpid()))
+    save_copy(copy)
+    lock = threading.Lock()
+
+    def on_event(chunk, event):
+        if event["event"] == "frame_end":
+            with lock:
+                progress.done += 1
+                if event.get("duration") is not None:
+                    progress.durations.append(event["duration"])
+                event.update(event = "frame_end", chunk = chunk, done = progress.done, eta = progress.eta())
+                progress.channel.emit(**event)
+            if on_frame is not None:
+                on_frame(event["frame"], event.get("duration"))
+
+    try:
+        return render_chunks(bpy.app.binary_path, copy, frames, path, workers, threads, on_event)
+    finally:
+        for leftover in (copy, copy + "1"):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+
+#RENDER TELEMETRY
+
+_telemetry = {"writer": None}
+
+def scene_render_stats(scene, depsgraph = None):
+    #Object and triangle counts of the evaluated scene, instances included
+    stats = {"engine": scene.render.engine,
+        "samples": scene.cycles.samples if scene.render.engine == "CYCLES" else scene.eevee.taa_render_samples,
+        "resolution_x": scene.render.resolution_x * scene.render.resolution_percentage // 100,
+        "resolution_y": scene.render.resolution_y * scene.render.resolution_percentage // 100}
+    #Render depsgraph when the handler gets one, the viewport one evaluates modifiers at viewport levels
+    if depsgraph is not None and getattr(depsgraph, "mode", "") == 'RENDER':
+        stats["counts"] = "render"
+    else:
+        try:
+            depsgraph = bpy.context.evaluated_depsgraph_get()
+        except (AttributeError, RuntimeError):
+            return stats
+        stats["counts"] = "viewport"
+    objects = 0
+    triangles = 0
+    meshes = {}
+    for instance in depsgraph.object_instances:
+        obj = instance.object
+        if obj.hide_render:
+            continue
+        objects += 1
+        if obj.type != 'MESH':
+            continue
+        key = obj.data.as_pointer()
+        if key not in meshes:
+            loop_total = np.empty(len(obj.data.polygons), dtype=np.int32)
+            obj.data.polygons.foreach_get("loop_total", loop_total)
+            meshes[key] = int((loop_total - 2).sum())
+        triangles += meshes[key]
+    stats["objects"] = objects
+    stats["triangles"] = triangles
+    return stats
+
+def telemetry_pre(scene, depsgraph = None):
+    if _telemetry["writer"] is not None:
+        _telemetry["writer"].start(scene.frame_current, **scene_render_stats(scene, depsgraph))
+
+def telemetry_post(scene, depsgraph = None):
+    if _telemetry["writer"] is not None:
+        _telemetry["writer"].end(scene.frame_current)
+
+def start_render_telemetry(directory):
+    if _telemetry["writer"] is None:
+        bpy.app.handlers.render_pre.append(telemetry_pre)
+        bpy.app.handlers.render_post.append(telemetry_post)
+    _telemetry["writer"] = TelemetryWriter(directory)
+
+def stop_render_telemetry():
+    if _telemetry["writer"] is None:
+        return
+    _telemetry["writer"] = None
+    if telemetry_pre in bpy.app.handlers.render_pre:
+        bpy.app.handlers.render_pre.remove(telemetry_pre)
+    if telemetry_post in bpy.app.handlers.render_post:
+        bpy.app.handlers.render_post.remove(telemetry_post)
+
+def render_telemetry_report(directory):
+    #Returns (summary, report file), summary is None without telemetry
+    summary = summarize_telemetry(read_telemetry(directory))
+    if summary is None:
+        return None, None
+    return summary, write_telemetry_report(directory, summary)
+
+def preview_movie_path(frame_start, frame_end):
+    #Same name as the VSE encode: frame range added where the # are, or at the end
+    path = bpy.path.abspath(load_settings('preview_output'))
+    if path.lower().endswith(".mov"):
+        return path
+    directory, name = os.path.split(path)
+    if "#" not in name:
+        name += "####"
+    hashes = findall(r"#+", name)[-1]
+    start = name.rindex(hashes)
+    frames = "{0:0{2}d}-{1:0{2}d}".format(frame_start, frame_end, len(hashes))
+    return os.path.join(directory, name[:start] + frames + name[start + len(hashes):] + ".mov")
+
+def start_preview_encoder(frames):
+    #None without JPEG previews or ffmpeg, encode_preview is used instead
+    scene = bpy.context.scene
+    if not scene.render.image_settings.use_preview:
+        return None
+    ffmpeg = find_ffmpeg(bpy.context.preferences.addons['WorkFlow'].preferences.ffmpeg_path)
+    if ffmpeg is None:
+        return None
+    output = preview_movie_path(frames[0], frames[-1])
+    try:
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+        return PreviewEncoder(ffmpeg, output, frames, scene.render.fps / scene.render.fps_base)
+    except OSError:
+        return None
+
+def preview_audio(frame_start, frame_end, directory):
+    #Mixdown of the scene sound strips, None without sound
+    scene = bpy.context.scene
+    if scene.sequence_editor is None:
+        return None
+    if not any(sequence.type == 'SOUND' for sequence in scene.sequence_editor.sequences_all):
+        return None
+    filepath = os.path.join(directory, ".preview_audio.{}.wav".format(os.getpid()))
+    bake_start = scene.frame_start
+    bake_end = scene.frame_end
+    scene.frame_start = frame_start
+    scene.frame_end = frame_end
+    try:
+        bpy.ops.sound.mixdown(filepath=filepath, container='WAV', codec='PCM')
+    except RuntimeError:
+        return None
+    finally:
+        scene.frame_start = bake_start
+        scene.frame_end = bake_end
+    return filepath if os.path.isfile(filepath) else None
+
+def finish_preview_encoder(encoder, frame_start, frame_end, images):
+    #Returns False when the movie could not be written, the JPEG are then left for encode_preview
+    audio = preview_audio(frame_start, frame_end, os.path.dirname(encoder.output))
+    try:
+        ok = encoder.finish(audio)
+    finally:
+        if audio is not None and os.path.exists(audio):
+            os.remove(audio)
+    if not ok:
+        print("Streaming preview encode failed:\n" + "\n".join(encoder.errors))
+        return False
+    for image in images:
+        if os.path.exists(image):
+            os.remove(image)
+    return True
+
+def batch_render(workers = 1, threads = 0, resume = True):
+    #Returns (ok, message), frames are verified before the preview is encoded
+    scene = bpy.context.scene
+    #Read before the render setup changes the file
+    unsaved = bpy.data.is_dirty
+    path = setup_batch_render()
+    frame_start = scene.frame_start
+    frame_end = scene.frame_end
+    frames = list(range(frame_start, frame_end + 1))
+    images_path = bpy.path.abspath(os.path.dirname(path))
+    os.makedirs(images_path, exist_ok=True)
+
+    #Frames still valid from an interrupted render are kept, not when the shot has unsaved changes
+    manifest = RenderManifest(images_path, render_state(path, unsaved))
+    pending = manifest.pending(frames) if resume and not unsaved else frames
+    #Worker threads must not call bpy, outputs are resolved here
+    outputs = {frame: frame_outputs(path, frame) for frame in pending}
+
+    #The preview movie is encoded while the frames render
+    encoder = start_preview_encoder(frames)
+    previews = {frame: frame_outputs(path, frame)[-1] for frame in frames}
+    if encoder is not None:
+        for frame in frames:
+            if frame not in outputs:
+                encoder.add(frame, previews[frame])
+
+    def on_frame(frame, seconds):
+        if manifest.record(frame, outputs[frame], seconds) and encoder is not None:
+            encoder.add(frame, previews[frame])
+
+    progress = render_progress(frame_start, frame_end, operator = "batch_render", workers = workers,
+        total = len(pending), skipped = len(frames) - len(pending))
+    start = time.perf_counter()
+
+    report = {"date": time.strftime("%Y-%m-%d %H:%M:%S"), "workers": workers, "frames": len(pending),
+        "skipped": len(frames) - len(pending)}
+    failed = []
+    if workers > 1 and pending:
+        threads = threads or default_threads(workers)
+        chunks = render_parallel(path, pending, workers, threads, progress, on_frame)
+        failed = [chunk for chunk in chunks if chunk["returncode"] != 0]
+        report["chunks"] = [{key: chunk[key] for key in ("frames", "returncode", "wall_time")} for chunk in chunks]
+    else:
+        threads = threads or scene.render.threads
+        render_frames(path, pending, progress, on_frame)
+    report["time"] = time.perf_counter() - start
+    report["threads"] = threads
+    report["parallelism"] = sum(progress.durations) / report["time"] if report["time"] else None
+
+    missing = manifest.pending(frames)
+    if pending:
+        write_render_report(images_path, report)
+    else:
+        report["speed_up"] = None
+    if failed or missing:
+        message = "Render incomplete, missing frame(s) {}".format(format_frames(missing))
+        for chunk in failed:
+            print("Chunk {} failed:\n{}".format(chunk["frames"], chunk["message"]))
+        progress.finish("error", missing = missing)
+        if encoder is not None:
+            encoder.abort()
+        return False, message
+
+    if encoder is None or not finish_preview_encoder(encoder, frame_start, frame_end, previews.values()):
+        encode_preview(images_path, frame_start, frame_end)
+    progress.finish(speed_up = report["speed_up"])
+    message = format_render_report(report)
+    if report["skipped"]:
+        message += ", {} frame(s) kept from the last render".format(report["skipped"])
+    elif resume and unsaved:
+        message += ", unsaved changes: no frame kept from the last render"
+    return True, message
+
+#ASSET MANIFEST
+#Written next to the .blend on save, lets a sweep skip up to date files without opening them
+
+MANIFEST_SUFFIX = ".assets.json"
+MANIFEST_VERSION = 1
+
+def manifest_path(filepath):
+    return filepath + MANIFEST_SUFFIX
+
+_copy_save = {"active": False}
+
+def save_copy(filepath):
+    #save_handler skips it, the manifest belongs to the shot
+    _copy_save["active"] = True
+    try:
+        bpy.ops.wm.save_as_mainfile(filepath=filepath, copy=True)
+    finally:
+        _copy_save["active"] = False
+
+def is_copy_save(filepath = None):
+    #filepath: given to save handlers by recent versions
+    if _copy_save["active"]:
+        return True
+    if isinstance(filepath, str) and filepath and bpy.data.filepath:
+        return os.path.normcase(os.path.abspath(filepath)) != os.path.normcase(os.path.abspath(bpy.data.filepath))
+    return False
+
+def store_source_version(item, path):
+    #Signature and digest of the version being loaded, the manifest is written from them
+    signature = file_signature(path)
+    item.version = asset_date(path)
+    item.digest = file_digest(path, signature)
+    item.signature = "{} {}".format(*signature)
+
+def item_signature(item):
+    #None for entries loaded before signatures were stored
+    try:
+        size, mtime = item.signature.split()
+        return [int(size), int(mtime)]
+    except ValueError:
+        return None
+
+def write_asset_manifest(filepath):
+    #Only what was stored when the assets were loaded, no access to the asset share
+    assets = []
+    for scene in bpy.data.scenes:
+        for item in scene.relink:
+            path = os.path.normpath(asset_abspath(item.path))
+            assets.append({"uid": item.uid, "name": item.data_name, "path": path,
+                "digest": item.digest, "signature": item_signature(item) if item.digest else None})
+
+    stat = os.stat(filepath)
+    manifest = {"version": MANIFEST_VERSION, "blend": [stat.st_size, stat.st_mtime_ns], "assets": assets}
+    tmp_path = "{}.{}.tmp".format(manifest_path(filepath), os.getpid())
+    try:
+        with open(tmp_path, 'w') as outfile:
+            json.dump(manifest, outfile, indent=2)
+        os.replace(tmp_path, manifest_path(filepath))
+    except OSError:
+        pass
+
+def sweep_current_file():
+    #Headless relink of the open file, returns the report of the file
+    start = time.perf_counter()
+    blend_filepath = bpy.context.blend_data.filepath
+    build_relink_index()
+    results = run_scan(collect_asset_jobs(), blend_filepath)
+    update_list, to_update = stale_assets(results)
+    save_digest_cache()
+
+    report = {"file": blend_filepath, "updated": sorted(set(update_list)), "assets": {}, "phases": []}
+    for uid, result in results.items():
+        if result.get("error"):
+            report["assets"][uid] = {"status": "error", "message": result["error"]}
+
+    if to_update:
+        names = {uid: find_relink_item(uid).data_name for uid in to_update}
+        infos = relink_assets(to_update, differential = bpy.context.scene.differential_relink)
+        profile = last_profile_report()
+        report["phases"] = profile["phases"]
+        for uid, (status, message) in infos.items():
+            asset = profile["assets"].get(uid, {})
+            report["assets"][uid] = {"name": names.get(uid, ""), "status": status or "updated",
+                "message": message, "time": asset.get("time", 0.0)}
+        bpy.ops.wm.save_mainfile()
+
+    report["time"] = time.perf_counter() - start
+    return report
+
+#ASSET LOCK
+#Pinned asset versions of a shot, renders verify them and never relink
+
+LOCK_SUFFIX = ".assets.lock"
+#Version 2 keeps the size and mtime of each library next to its digest
+LOCK_VERSION = 2
+
+def asset_lock_path(filepath):
+    return filepath + LOCK_SUFFIX
+
+def read_asset_lock(filepath):
+    #None when the shot is not locked
+    if not filepath:
+        return None
+    try:
+        with open(asset_lock_path(filepath)) as infile:
+            lock = json.load(infile)
+    except (OSError, ValueError):
+        return None
+    if lock.get("version") not in (1, LOCK_VERSION):
+        return None
+    return lock
+
+def write_asset_lock(filepath):
+    assets = {}
+    for scene in bpy.data.scenes:
+        for item in scene.relink:
+            path = os.path.normpath(asset_abspath(item.path))
+            digest = item.digest
+            if not digest:
+                try:
+                    digest = file_digest(path)
+                except OSError:
+                    digest = ""
+            assets[item.uid] = {"name": item.data_name, "path": path, "digest": digest}
+
+    #Linked data is read from the library at render time
+    libraries = {}
+    for library in bpy.data.libraries:
+        path = os.path.normpath(bpy.path.abspath(library.filepath))
+        try:
+            signature = file_signature(path)
+            libraries[path] = {"digest": file_digest(path, signature), "signature": list(signature)}
+        except OSError:
+            libraries[path] = {"digest": "", "signature": None}
+    save_digest_cache()
+
+    lock = {"version": LOCK_VERSION, "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "assets": assets, "libraries": libraries}
+    tmp_path = "{}.{}.tmp".format(asset_lock_path(filepath), os.getpid())
+    with open(tmp_path, 'w') as outfile:
+        json.dump(lock, outfile, indent=2)
+    os.replace(tmp_path, asset_lock_path(filepath))
+    store_file_status(asset_lock_path(filepath), {"lock": lock})
+    return lock
+
+def verify_asset_lock(lock):
+    #Returns the differences with the lock, an empty list when the file renders the pinned versions
+    problems = []
+    items = {}
+    for scene in bpy.data.scenes:
+        for item in scene.relink:
+            items[item.uid] = item
+
+    for uid, asset in lock["assets"].items():
+        item = items.get(uid)
+        if item is None:
+            problems.append("{} missing".format(asset["name"]))
+        elif item.digest and asset["digest"] and item.digest != asset["digest"]:
+            problems.append("{} is not the locked version".format(asset["name"]))
+    for uid, item in items.items():
+        if uid not in lock["assets"]:
+            problems.append("{} not in lock".format(item.data_name))
+
+    #Stat first, libraries are only hashed when their size or mtime changed
+    for path, library in lock["libraries"].items():
+        if not isinstance(library, dict):
+            #Version 1, digest only
+            library = {"digest": library, "signature": None}
+        try:
+            signature = file_signature(path)
+            if library["signature"] is not None and list(signature) == library["signature"]:
+                continue
+            if file_digest(path, signature) != library["digest"]:
+                problems.append("{} changed".format(os.path.basename(path)))
+        except OSError:
+            problems.append("{} missing".format(os.path.basename(path)))
+    save_digest_cache()
+    return problems
+
+def read_lock_status(lock_path):
+    #Worker side, no bpy access
+    return {"lock": read_asset_lock(lock_path[:-len(LOCK_SUFFIX)])}
+
+def asset_lock_state():
+    #"unlocked", "locked" or "outdated", for the asset panel
+    filepath = bpy.context.blend_data.filepath
+    if not filepath:
+        return "unlocked"
+    #Read in the background like the asset status, draw only reads the cache
+    lock_path = asset_lock_path(filepath)
+    ttl = bpy.context.preferences.addons['WorkFlow'].preferences.status_ttl
+    known, expired, status = cached_file_status(lock_path, ttl)
+    if expired:
+        request_file_status(lock_path, read_lock_status)
+    lock = status["lock"] if status is not None else None
+    if lock is None:
+        return "unlocked"
+    items = set(item.uid for scene in bpy.data.scenes for item in scene.relink)
+    if items != set(lock["assets"]):
+        return "outdated"
+    return "locked"
+
 def get_bpy_struct( obj_id, path):
     """ Gets a bpy_struct or property from an ID and an RNA path
         Returns None in case the path is invalid
@@ -1330,12 +2925,8 @@ def encode_preview(images_path, start, end):
 def delete_link():
     obj = bpy.context.active_object 
 
-    relink = bpy.context.scene.relink
-
-    for i, item in enumerate(relink):
-        if item.uid == obj.relink.uid:
-            relink.remove(i)
-            break
+    promote_instance(obj.relink.uid)
+    remove_relink_item(obj.relink.uid)
 
 
 def check_anim():
@@ -1381,7 +2972,7 @@ def update_anim(file):
         #Get link object by UID
         if obj.relink.uid != "":
             uid = obj.relink.uid
-            for link_obj in bpy.data.objects:
+            for link_obj in get_relink_datablocks(uid, "objects"):
                 if link_obj.relink.uid == uid:
                     if link_obj not in objects_to_update:
                         objects_to_update.append(link_obj)
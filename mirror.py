@@ -0,0 +1,239 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTIBILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+#
+# type: ignore
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+from . cache import file_signature, hash_file, normalize_path, DIGEST_CHUNK
+
+#LOCAL MIRROR
+#Copies of asset libraries on local disk, checked against the source size, mtime and digest
+#Several Blender can share the directory: copies are written under a lock file and renamed in place
+
+LOCK_TIMEOUT = 600.0
+LOCK_WAIT = 30.0
+LOCK_POLL = 0.2
+META_FILE = "entry.json"
+LOCK_FILE = "entry.lock"
+
+#Copies whose digest was checked by this process, with the size and mtime of the copy
+_verified = set()
+_verified_lock = threading.Lock()
+
+class MirrorError(Exception):
+    pass
+
+class Throttle:
+    #Bandwidth shared by every copy that uses it, in bytes per second, 0 for no limit
+
+    def __init__(self, rate = 0):
+        self.rate = rate
+        self.lock = threading.Lock()
+        self.next = time.monotonic()
+
+    def consume(self, size):
+        if self.rate <= 0:
+            return
+        with self.lock:
+            now = time.monotonic()
+            self.next = max(self.next, now) + size / self.rate
+            delay = self.next - now - size / self.rate
+        if delay > 0:
+            time.sleep(delay)
+
+class AssetMirror:
+
+    def __init__(self, directory, max_size):
+        self.directory = directory
+        self.max_size = max_size
+
+    def entry_dir(self, source):
+        key = hashlib.blake2b(normalize_path(source).encode(), digest_size=8).hexdigest()
+        return os.path.join(self.directory, key)
+
+    def local_path(self, source):
+        return os.path.join(self.entry_dir(source), os.path.basename(source))
+
+    def read_meta(self, entry_dir):
+        try:
+            with open(os.path.join(entry_dir, META_FILE)) as infile:
+                return json.load(infile)
+        except (OSError, ValueError):
+            return None
+
+    def valid(self, source, signature):
+        #A copy is valid when it was made from this exact source version and was not truncated
+        #The digest is checked the first time the copy is used
+        entry_dir = self.entry_dir(source)
+        meta = self.read_meta(entry_dir)
+        if meta is None or meta["signature"] != list(signature):
+            return False
+        local = self.local_path(source)
+        try:
+            local_signature = file_signature(local)
+            if local_signature[0] != signature[0]:
+                return False
+            key = (normalize_path(local), tuple(local_signature))
+            with _verified_lock:
+                if key in _verified:
+                    return True
+            if hash_file(local) != meta.get("digest"):
+                return False
+        except OSError:
+            return False
+        with _verified_lock:
+            _verified.add(key)
+        return True
+
+    def touch(self, source):
+        #The meta file mtime is the last access, used for eviction
+        try:
+            os.utime(os.path.join(self.entry_dir(source), META_FILE))
+        except OSError:
+            pass
+
+    def fetch(self, source, progress = None, throttle = None):
+        #Returns the local copy, the source itself when it can not be mirrored
+        try:
+            signature = file_signature(source)
+        except OSError:
+            return source
+        if signature[0] > self.max_size:
+            return source
+        if self.valid(source, signature):
+            self.touch(source)
+            return self.local_path(source)
+
+        try:
+            os.makedirs(self.entry_dir(source), exist_ok=True)
+            if self.lock(source):
+                try:
+                    self.copy(source, signature, progress, throttle)
+                finally:
+                    self.unlock(source)
+                self.evict(keep = self.entry_dir(source))
+            elif not self.wait(source, signature):
+                return source
+        except (OSError, MirrorError):
+            return source
+        return self.local_path(source)
+
+    def copy(self, source, signature, progress = None, throttle = None):
+        entry_dir = self.entry_dir(source)
+        local = self.local_path(source)
+        tmp_path = "{}.{}.tmp".format(local, os.getpid())
+        try:
+            #Hash while copying, the share is read once
+            hasher = hashlib.blake2b(digest_size=20)
+            with open(source, 'rb') as infile, open(tmp_path, 'wb') as outfile:
+                for chunk in iter(lambda: infile.read(DIGEST_CHUNK), b''):
+                    if throttle is not None:
+                        throttle.consume(len(chunk))
+                    hasher.update(chunk)
+                    outfile.write(chunk)
+                    if progress is not None:
+                        progress(len(chunk))
+            digest = hasher.hexdigest()
+            if os.path.getsize(tmp_path) != signature[0] or hash_file(tmp_path) != digest:
+                raise MirrorError("Incomplete copy of {}".format(source))
+            #The source must not have changed during the copy
+            if tuple(file_signature(source)) != tuple(signature):
+                raise MirrorError("{} changed during the copy".format(source))
+            os.replace(tmp_path, local)
+            with _verified_lock:
+                _verified.add((normalize_path(local), tuple(file_signature(local))))
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        meta = {"source": source, "signature": list(signature), "digest": digest}
+        tmp_meta = "{}.{}.tmp".format(os.path.join(entry_dir, META_FILE), os.getpid())
+        with open(tmp_meta, 'w') as outfile:
+            json.dump(meta, outfile)
+        os.replace(tmp_meta, os.path.join(entry_dir, META_FILE))
+
+    def lock(self, source):
+        lock_path = os.path.join(self.entry_dir(source), LOCK_FILE)
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            #Left by a crashed process
+            try:
+                if time.time() - os.path.getmtime(lock_path) > LOCK_TIMEOUT:
+                    os.remove(lock_path)
+                    return self.lock(source)
+            except OSError:
+                pass
+            return False
+        with os.fdopen(fd, 'w') as outfile:
+            outfile.write(str(os.getpid()))
+        return True
+
+    def unlock(self, source):
+        try:
+            os.remove(os.path.join(self.entry_dir(source), LOCK_FILE))
+        except OSError:
+            pass
+
+    def wait(self, source, signature):
+        #Another process copies the same file
+        lock_path = os.path.join(self.entry_dir(source), LOCK_FILE)
+        deadline = time.monotonic() + LOCK_WAIT
+        while os.path.exists(lock_path) and time.monotonic() < deadline:
+            time.sleep(LOCK_POLL)
+        return self.valid(source, signature)
+
+    def entries(self):
+        #Yields (last access, size, entry directory)
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+        for name in names:
+            entry_dir = os.path.join(self.directory, name)
+            try:
+                last_access = os.path.getmtime(os.path.join(entry_dir, META_FILE))
+                size = sum(os.path.getsize(os.path.join(entry_dir, f)) for f in os.listdir(entry_dir))
+            except OSError:
+                continue
+            yield last_access, size, entry_dir
+
+    def evict(self, keep = None):
+        #Least recently used entries first, entries being written are skipped
+        entries = sorted(self.entries())
+        total = sum(size for last_access, size, entry_dir in entries)
+        removed = 0
+        for last_access, size, entry_dir in entries:
+            if total <= self.max_size:
+                break
+            if entry_dir == keep or os.path.exists(os.path.join(entry_dir, LOCK_FILE)):
+                continue
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total -= size
+            removed += 1
+        return removed
+
+    def clear(self):
+        for last_access, size, entry_dir in list(self.entries()):
+            if not os.path.exists(os.path.join(entry_dir, LOCK_FILE)):
+                shutil.rmtree(entry_dir, ignore_errors=True)
+
+    def usage(self):
+        return sum(size for last_access, size, entry_dir in self.entries())
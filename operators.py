@@ -15,7 +15,6 @@
 
 import bpy
 import os
-import sys
 from bpy_extras.io_utils import ImportHelper, ExportHelper
 from . functions import *
 from . operators import *
@@ -23,7 +22,7 @@ from . properties import *
 from . ui import *
 from . nodes import *
 import json
-import platform
+import time
 
 #OPERATORS
 
@@ -171,7 +170,7 @@ class WORKFLOW_OT_render_material(bpy.types.Operator):
 
 
     def invoke(self, context, event):
-        if context.preferences.addons['WorkFlow'].preferences.production_settings_file:
+        if has_production_settings():
             wm = context.window_manager
             return wm.invoke_props_dialog(self)
         else:
@@ -186,8 +185,14 @@ class WORKFLOW_OT_publish_preview(bpy.types.Operator):
     bl_description = "Export preview with publish settings"
 
     def execute(self, context):
-        if context.preferences.addons['WorkFlow'].preferences.production_settings_file:
-            filepath = load_settings('publish_output')
+        if has_production_settings():
+            try:
+                if context.preferences.addons['WorkFlow'].preferences.production_settings_file:
+                    freeze_settings()
+                filepath = load_settings('publish_output')
+            except (OSError, SettingsError) as ex:
+                self.report({'ERROR'}, str(ex))
+                return {'CANCELLED'}
             preview(filepath, publish = True)
             return {'FINISHED'}
         else:
@@ -197,6 +202,32 @@ class WORKFLOW_OT_publish_preview(bpy.types.Operator):
 
 
 
+class WORKFLOW_OT_freeze_settings(bpy.types.Operator):
+    
+    bl_idname = "workflow.freeze_settings"
+    bl_label = "Embed Settings"
+    bl_description = "Store the production settings in the file, renders no longer read the settings file"
+    bl_options = {"REGISTER", "UNDO"}
+
+    remove: bpy.props.BoolProperty(default=False, options={'HIDDEN'})
+
+    def execute(self, context):
+        if self.remove:
+            remove_frozen_settings()
+            self.report({'INFO'}, 'Embedded settings removed')
+            return {'FINISHED'}
+        if not context.preferences.addons['WorkFlow'].preferences.production_settings_file:
+            self.report({'ERROR'}, 'No settings file in preferences')
+            return {'CANCELLED'}
+        try:
+            source = freeze_settings()
+        except (OSError, SettingsError) as ex:
+            self.report({'ERROR'}, str(ex))
+            return {'CANCELLED'}
+        self.report({'INFO'}, 'Settings embedded from {}'.format(source))
+        return {'FINISHED'}
+
+
 class WORKFLOW_OT_render(bpy.types.Operator): #Old render to delete
     
     bl_idname = "workflow.render"
@@ -209,6 +240,7 @@ class WORKFLOW_OT_render(bpy.types.Operator): #Old render to delete
     path = None
     playback = False
     message = None
+    progress = None
 
 
     current_frame: bpy.props.IntProperty(
@@ -257,14 +289,20 @@ class WORKFLOW_OT_render(bpy.types.Operator): #Old render to delete
         bpy.app.handlers.render_post.remove(self.post)
         bpy.app.handlers.render_cancel.remove(self.cancelled)
         context.window_manager.event_timer_remove(self._timer)
+        stop_render_telemetry()
 
         #Restore Illu Playback
         if hasattr(bpy.context.scene, "illu_playback"):
             bpy.context.scene.illu_playback = self.playback
 
+    def finish_progress(self, status):
+        if self.progress is not None:
+            self.progress.finish(status)
+            self.progress = None
+
     def execute(self, context):
         if self.console:
-            if not context.preferences.addons['WorkFlow'].preferences.production_settings_file:
+            if not has_production_settings():
                 self.report({'ERROR'}, 'Load Settings before render')
                 return {'CANCELLED'}
             set_render_settings()
@@ -280,7 +318,15 @@ class WORKFLOW_OT_render(bpy.types.Operator): #Old render to delete
                                     space.overlay.show_overlays = False    
                                     space.shading.type = 'SOLID'
             
-            check_updates(auto = True)
+            #A locked shot renders the pinned versions, older shots keep the auto update
+            lock = read_asset_lock(bpy.data.filepath) if bpy.data.filepath else None
+            if lock is None:
+                check_updates(auto = True)
+            else:
+                problems = verify_asset_lock(lock)
+                if problems:
+                    self.report({'ERROR'}, 'Asset lock mismatch: {}'.format(", ".join(problems)))
+                    return {'CANCELLED'}
             sync_visibility()
 
         if self.preview:
@@ -291,6 +337,9 @@ class WORKFLOW_OT_render(bpy.types.Operator): #Old render to delete
         self.frame_start = self.current_frame
         self.stop = False
         self.rendering = False
+        if self.console:
+            self.progress = render_progress(self.frame_start, self.frame_end, operator = "render")
+        start_render_telemetry(bpy.path.abspath(os.path.dirname(self.path)))
         self.add_handlers(context)
         
         #Disable Illu Playback
@@ -314,6 +363,7 @@ class WORKFLOW_OT_render(bpy.types.Operator): #Old render to delete
         if event.type == 'TIMER': 
             if self.stop:
                 self.remove_handlers(context)
+                self.finish_progress("cancelled")
                 return {"CANCELLED"}
             if self.current_frame > self.frame_end:
                 self.remove_handlers(context)
@@ -321,25 +371,27 @@ class WORKFLOW_OT_render(bpy.types.Operator): #Old render to delete
                 if self.preview:
                     images_path = bpy.path.abspath(os.path.dirname(self.path))                 
                     encode_preview(images_path, self.frame_start, self.frame_end)
+                self.finish_progress("finished")
                 if self.console:
                     bpy.ops.wm.quit_blender()
                 return {"FINISHED"}            
             if self.rendering is False:
-                if self.console:
-                    total = (self.frame_end - self.frame_start + 1)
-                    data = {"current" : self.current_frame, "total" : total, "message": self.message}
-                    data =json.dumps(data)
-                    os.system('echo {}'.format(data))
+                frame = self.current_frame
+                if self.progress is not None:
+                    self.progress.start_frame(frame, message = self.message)
                                              
                 sc = context.scene
-                number = f'{self.current_frame:03}'
+                number = f'{frame:03}'
                 sc.render.filepath = self.path + number
-                sc.frame_set(self.current_frame)                
+                sc.frame_set(frame)                
                 bpy.ops.render.render(write_still=True)
+                if self.progress is not None and not self.stop:
+                    self.progress.end_frame(frame, output = render_output_path(sc))
 
             
         if event.type in {'ESC'}:
             self.remove_handlers(context)
+            self.finish_progress("cancelled")
             self.report({'INFO'}, "Render cancelled")
             return {'CANCELLED'}
 
@@ -347,10 +399,7 @@ class WORKFLOW_OT_render(bpy.types.Operator): #Old render to delete
         #return {'RUNNING_MODAL'}
     
     def invoke(self, context, event):
-        #DEBUG
-        filepath = "U:/02-ASSETS/ADDONS/yuku.ini"
-        bpy.context.preferences.addons['WorkFlow'].preferences.production_settings_file = filepath
-        if not context.preferences.addons['WorkFlow'].preferences.production_settings_file:
+        if not has_production_settings():
             self.report({'ERROR'}, 'Load Settings before render')
             return {'CANCELLED'}
         set_render_settings()
@@ -369,53 +418,78 @@ class WORKFLOW_OT_batch_render(bpy.types.Operator):
     bl_label = "Batch Render"
     bl_description = "Batch Render Scene"
 
+    workers: bpy.props.IntProperty(
+        name="Workers",
+        description="Background Blender rendering a part of the frame range each, 1 renders in this process",
+        default=1,
+        min=1,
+        )
+    threads: bpy.props.IntProperty(
+        name="Threads",
+        description="Render threads per worker, 0 to share the CPU between workers",
+        default=0,
+        min=0,
+        )
+    resume: bpy.props.BoolProperty(
+        name="Resume",
+        description="Keep the frames of an interrupted render, only missing or incomplete frames are rendered",
+        default=True,
+        )
     
     def execute(self, context):        
         #SETTINGS
-        if not context.preferences.addons['WorkFlow'].preferences.production_settings_file:
+        if not has_production_settings():
             self.report({'ERROR'}, 'Load Settings before render')
             return {'CANCELLED'}
         if hasattr(bpy.context.scene, "illu_playback"):
             playback = bpy.context.scene.illu_playback
             bpy.context.scene.illu_playback = False
-        set_render_settings()
-        bpy.context.scene.render.image_settings.use_preview = True
-        path = load_settings('render_output')
-        frame_start = context.scene.frame_start
-        frame_end = context.scene.frame_end
-
-        for screen in bpy.data.screens:
-            for area in screen.areas:
-                    if area.type == 'VIEW_3D':
-                        for space in area.spaces:
-                            if space.type == 'VIEW_3D':
-                                space.overlay.show_overlays = False    
-                                space.shading.type = 'SOLID'
 
         #RENDER LOOP        
-        total = (frame_end - frame_start + 1)
-        for frame in range (frame_start, frame_end + 1):
-            #ECHO
-            data = {"current" : frame, "total" : total}
-            data =json.dumps(data)
-            os.system('echo {}'.format(data))
-            sys.stdout.flush()
-
-            #RENDER
-            number = f'{frame:03}'
-            context.scene.render.filepath = path + number
-            context.scene.frame_set(frame)
-            bpy.ops.render.render(write_still=True)
-
-        images_path = bpy.path.abspath(os.path.dirname(path))                 
-        encode_preview(images_path, frame_start, frame_end)
+        ok, message = batch_render(workers = self.workers, threads = self.threads, resume = self.resume)
+        print(message)
 
         if hasattr(bpy.context.scene, "illu_playback"):
             bpy.context.scene.illu_playback = playback
 
         bpy.ops.wm.quit_blender()
 
-        return {"FINISHED"}
+        return {"FINISHED"} if ok else {"CANCELLED"}
+
+class WORKFLOW_OT_render_report(bpy.types.Operator):
+    
+    bl_idname = "workflow.render_report"
+    bl_label = "Render Report"
+    bl_description = "Summarize the frame telemetry of the last renders of this shot"
+
+    directory: bpy.props.StringProperty(
+        name="Directory",
+        description="Render output folder, the production render output when empty",
+        subtype="DIR_PATH",
+        )
+
+    def execute(self, context):
+        directory = self.directory
+        if not directory:
+            if not has_production_settings():
+                self.report({'ERROR'}, 'Load Settings or choose a render folder')
+                return {'CANCELLED'}
+            directory = os.path.dirname(load_settings('render_output'))
+        directory = bpy.path.abspath(directory)
+        summary, filepath = render_telemetry_report(directory)
+        if summary is None:
+            self.report({'WARNING'}, 'No render telemetry in {}'.format(directory))
+            return {'CANCELLED'}
+        lines = format_telemetry_report(summary)
+        print("\n".join(lines))
+        if filepath is not None:
+            print("Render report written to {}".format(filepath))
+        if not bpy.app.background:
+            def draw(menu, context):
+                for line in lines:
+                    menu.layout.label(text = line)
+            context.window_manager.popup_menu(draw, title = "Render Report", icon = "TIME")
+        return {'FINISHED'}
 
 class WORKFLOW_OT_custom_preview(bpy.types.Operator, ExportHelper):
     
@@ -459,6 +533,8 @@ class WORKFLOW_OT_sync_visibility(bpy.types.Operator):
         return {'FINISHED'}
 
 
+_enum_collections = []
+
 class WORKFLOW_OT_load_asset(bpy.types.Operator, ImportHelper):
     
     bl_idname = "workflow.load_asset"
@@ -467,8 +543,7 @@ class WORKFLOW_OT_load_asset(bpy.types.Operator, ImportHelper):
     bl_options = {"REGISTER", "UNDO"}
 
     filter_glob: bpy.props.StringProperty( 
-        default='*.ini',
-        #default='*.ini;*.blend',  
+        default='*.ini;*.blend',
         options={'HIDDEN'}
         )
     link: bpy.props.BoolProperty( 
@@ -481,6 +556,11 @@ class WORKFLOW_OT_load_asset(bpy.types.Operator, ImportHelper):
         description='Put new objects on the active collection', 
         default=True
         )
+    instance: bpy.props.BoolProperty( 
+        name='Instance', 
+        description='Share meshes, materials and images with a copy of this asset already in the file', 
+        default=False
+        )
 
     filepath: bpy.props.StringProperty(
         name="File Path", 
@@ -490,39 +570,46 @@ class WORKFLOW_OT_load_asset(bpy.types.Operator, ImportHelper):
 
     files: bpy.props.CollectionProperty(type=bpy.types.PropertyGroup)
 
-    """
     def get_collections(self, context):
-        l = []
-        if os.path.exists(self.filepath) and self.filepath.endswith('.blend'):
-            with bpy.data.libraries.load(self.filepath) as (data_from, data_to):
-                collections = data_from.collections
-                for collection in collections:
-                    l.append((collection,collection,collection))
-        if len(l) == 0:
-            l = [("None","None","None")];
-
-        return l;
+        _enum_collections.clear()
+        if os.path.isfile(self.filepath) and self.filepath.endswith('.blend'):
+            try:
+                collections = list_datablocks(self.filepath).get("collections", [])
+            except (OSError, BlendFileError):
+                collections = []
+            for collection in collections:
+                _enum_collections.append((collection, collection, collection))
+        if len(_enum_collections) == 0:
+            _enum_collections.append(("None", "None", "None"))
+
+        return _enum_collections
 
     collections: bpy.props.EnumProperty(       
         name = "Collections",
         description = "List of collections in the .blend file",
         items = get_collections
         )
-    """
 
     def execute(self, context):
 
         link = self.properties.link
         active = self.properties.active
+        instance = self.properties.instance
 
         folder = (os.path.dirname(self.filepath))
         for i in self.files:
             asset = (os.path.join(folder, i.name))
-            name, data_type, path = get_asset(folder, asset)
+            if asset.endswith('.blend'):
+                if self.collections == "None":
+                    self.report({'WARNING'}, 'No collection in {}'.format(i.name))
+                    continue
+                name, data_type, path = self.collections, "collections", asset
+            else:
+                name, data_type, path = get_asset(folder, asset)
             if link:
                 result = link_asset(name, data_type, path, active) 
             else:
-                result, uid = append_asset(name, data_type, path, active)     
+                result, uid = append_asset(name, data_type, path, active, instance = instance)
             self.report({'INFO'}, '{} successfully loaded'.format(result))
         return {'FINISHED'}
 
@@ -535,6 +622,77 @@ class WORKFLOW_OT_load_asset(bpy.types.Operator, ImportHelper):
         return {'RUNNING_MODAL'}
 
 
+class WORKFLOW_OT_search_asset(bpy.types.Operator):
+    
+    bl_idname = "workflow.search_asset"
+    bl_label = "Search Asset"
+    bl_description = "Search the asset library catalog"
+    bl_options = {"REGISTER", "UNDO"}
+    bl_property = "asset"
+
+    asset: bpy.props.EnumProperty(
+        name="Asset",
+        items = enum_catalog_assets,
+        )
+    data_type: bpy.props.EnumProperty(
+        name="Type",
+        items = [
+            ('ALL', "All", "", 0),
+            ('collections', "Collections", "", 1),
+            ('objects', "Objects", "", 2),
+            ]
+        )
+    link: bpy.props.BoolProperty( 
+        name='Link', 
+        description='Link the asset', 
+        default=False
+        )
+    active: bpy.props.BoolProperty( 
+        name='Active Collection', 
+        description='Put new objects on the active collection', 
+        default=True
+        )
+    instance: bpy.props.BoolProperty( 
+        name='Instance', 
+        description='Share meshes, materials and images with a copy of this asset already in the file', 
+        default=False
+        )
+
+    def execute(self, context):
+        if not self.asset:
+            self.report({'ERROR'}, 'No asset selected')
+            return {'CANCELLED'}
+        folder = os.path.dirname(self.asset)
+        name, data_type, path = get_asset(folder, self.asset)
+        if self.link:
+            result = link_asset(name, data_type, path, self.active)
+        else:
+            result, uid = append_asset(name, data_type, path, self.active, instance = self.instance)
+        self.report({'INFO'}, '{} successfully loaded'.format(result))
+        return {'FINISHED'}
+
+    def invoke(self, context, event):
+        if asset_library_root() is None:
+            self.report({'ERROR'}, 'Set the asset library path in the addon preferences')
+            return {'CANCELLED'}
+        context.window_manager.invoke_search_popup(self)
+        return {'RUNNING_MODAL'}
+
+class WORKFLOW_OT_rescan_catalog(bpy.types.Operator):
+    
+    bl_idname = "workflow.rescan_catalog"
+    bl_label = "Rescan Asset Library"
+    bl_description = "Update the asset catalog from the library folders"
+
+    def execute(self, context):
+        catalog, scanned = asset_catalog(rescan = True)
+        if catalog is None:
+            self.report({'ERROR'}, 'Set the asset library path in the addon preferences')
+            return {'CANCELLED'}
+        count = sum(len(directory["entries"]) for directory in catalog["directories"].values())
+        self.report({'INFO'}, '{} assets, {} folder(s) rescanned'.format(count, scanned))
+        return {'FINISHED'}
+
 class WORKFLOW_OT_export_keyframes(bpy.types.Operator, ExportHelper):
     
     bl_idname = "workflow.export_keyframes"
@@ -762,7 +920,7 @@ class WORKFLOW_OT_import_audio(bpy.types.Operator):
     bl_description = "Import audio and setup scene"
     
     def execute(self, context):
-        if context.preferences.addons['WorkFlow'].preferences.production_settings_file:
+        if has_production_settings():
             scene = bpy.context.scene
 
             if not scene.sequence_editor:
@@ -801,6 +959,11 @@ class WORKFLOW_OT_update_asset(bpy.types.Operator):
     bl_description = "Update Asset"
     bl_options = {"REGISTER", "UNDO"}
 
+    dry_run: bpy.props.BoolProperty( 
+        name='Dry Run', 
+        description='Report what would be removed, appended and remapped without changing anything', 
+        default=False
+        )
     
     @classmethod
     def poll(self, context):
@@ -808,22 +971,23 @@ class WORKFLOW_OT_update_asset(bpy.types.Operator):
         if obj is None: return False
         if obj.relink.uid == "": return False
         # Get corresponding item to check if path exists
-        for item in context.scene.relink:            
-            if item.uid == obj.relink.uid:
-                path = item.path
-                if platform.system() == "Linux":
-                    path = path.replace('\\', os.path.sep).replace('/', os.path.sep)
-                path = bpy.path.abspath(path)
-                if os.path.isfile(path): return True
+        item = find_relink_item(obj.relink.uid)
+        if item is not None:
+            known, status = asset_file_status(item.path)
+            if status is not None: return True
         return False
     
     
     def execute(self, context):
         uid = bpy.context.object.relink.uid        
-        status, message = relink(uid)
+        status, message = relink(uid, differential = context.scene.differential_relink, dry_run = self.dry_run)
 
-        if status == "warning":
+        if self.dry_run:
+            self.report({'INFO'}, 'Dry run, {}'.format(message))
+        elif status == "warning":
             self.report({'WARNING'}, message)
+        elif message:
+            self.report({'INFO'}, 'Asset updated, {}'.format(message))
         else:
             self.report({'INFO'}, 'Asset updated')
         return {'FINISHED'}
@@ -866,7 +1030,7 @@ class WORKFLOW_OT_load_image(bpy.types.Operator):
         return node.bl_idname == 'ShaderNodeTexImage'
     
     def execute(self, context):
-        if context.preferences.addons['WorkFlow'].preferences.production_settings_file:
+        if has_production_settings():
             material_name = bpy.context.active_object.active_material.name            
             filepath = load_settings('render_material_path') + material_name + '.png'   
             try:         
@@ -900,10 +1064,16 @@ class WORKFLOW_OT_clean_up(bpy.types.Operator):
     bl_label = "Clean Up"
     bl_description = "Clean up unused datablocks"
     bl_options = {"REGISTER", "UNDO"}
+
+    keep_fake_user: bpy.props.BoolProperty(
+        name='Keep Fake User',
+        description='Keep unused datablocks that have a fake user',
+        default=True
+        )
     
     def execute(self, context):
-        for i in range(10):
-            bpy.ops.outliner.orphans_purge()
+        stats = purge_orphans(keep_fake_user = self.keep_fake_user)
+        self.report({'INFO'}, format_purge_stats(stats))
         return {'FINISHED'}
 
 class WORKFLOW_OT_info(bpy.types.Operator):
@@ -984,13 +1154,160 @@ class WORKFLOW_OT_update_all_assets(bpy.types.Operator):
     
     bl_idname = "workflow.update_all_assets"
     bl_label = "Update All Assets"
-    bl_description = "Update All Assets"
+    bl_description = "Update All Assets, one library at a time (Esc to cancel)"
     bl_options = {"REGISTER", "UNDO"}
+
+    uids: bpy.props.StringProperty(
+        name="uids",
+        description="Assets to update, separated by commas. All stale assets when empty",
+        options={'HIDDEN', 'SKIP_SAVE'},
+        )
     
     def execute(self, context):
         check_updates(auto = True)      
         return {'FINISHED'}
 
+    def invoke(self, context, event):
+        if self.uids:
+            uids = [uid for uid in self.uids.split(",") if find_relink_item(uid) is not None]
+        else:
+            names, uids = find_stale_assets()
+        if not uids:
+            self.report({'INFO'}, "Nothing to update")
+            return {'CANCELLED'}
+
+        self.units = relink_units(uids)
+        self.current = 0
+        self.count = sum(len(unit) for unit in self.units)
+        self.done = 0
+        self.cancel = False
+        self.infos = {}
+        #Relinked assets get a new uid, names are read before
+        self.names = {}
+        for unit in self.units:
+            for uid in unit:
+                item = find_relink_item(uid)
+                self.names[uid] = item.data_name if item is not None else uid
+        self.profile = RelinkProfile()
+        self.differential = context.scene.differential_relink
+
+        self._timer = context.window_manager.event_timer_add(0.01, window=context.window)
+        context.window_manager.modal_handler_add(self)
+        self.status(context)
+        return {'RUNNING_MODAL'}
+
+    def status(self, context):
+        elapsed = time.perf_counter() - self.profile.started
+        text = "Updating assets {}/{}, {:.0f}s".format(self.done, self.count, elapsed)
+        if self.done:
+            text += ", about {:.0f}s left".format(elapsed / self.done * (self.count - self.done))
+        if self.current < len(self.units):
+            unit = self.units[self.current]
+            text += " - {}".format(self.names.get(unit[0], unit[0]))
+            if len(unit) > 1:
+                text += " and {} more".format(len(unit) - 1)
+        context.workspace.status_text_set(text + " (Esc to cancel)")
+
+    def modal(self, context, event):
+        if event.type == 'ESC':
+            #Stops between two assets, the scene is never left half relinked
+            self.cancel = True
+            return {'RUNNING_MODAL'}
+
+        if event.type == 'TIMER':
+            if self.cancel or self.current >= len(self.units):
+                return self.finish(context)
+
+            unit = self.units[self.current]
+            start = time.perf_counter()
+            self.infos.update(relink_assets(unit, differential = self.differential, profile = self.profile))
+            #The library load is shared by the assets of the unit
+            seconds = (time.perf_counter() - start) / len(unit)
+            for uid in unit:
+                self.profile.asset(uid, name = self.names[uid], time = seconds)
+            self.current += 1
+            self.done += len(unit)
+            self.status(context)
+            tag_redraw()
+
+        return {'PASS_THROUGH'}
+
+    def finish(self, context):
+        context.window_manager.event_timer_remove(self._timer)
+        context.workspace.status_text_set(None)
+
+        for uid, (status, message) in self.infos.items():
+            self.profile.asset(uid, status = status, message = message)
+        report = self.profile.report()
+        report["cancelled"] = self.cancel
+        save_profile_report(relink_report_file(), report)
+        print(asset_timing_table(report))
+        tag_redraw()
+
+        updated = [self.names.get(uid, uid) for uid, (status, message) in self.infos.items()
+            if status not in {"warning", "error"}]
+        failed = [self.names.get(uid, uid) for uid, (status, message) in self.infos.items()
+            if status in {"warning", "error"}]
+        if self.cancel:
+            self.report({'WARNING'}, "Update cancelled, {}/{} asset(s) updated".format(len(updated), self.count))
+            #Assets already updated get their undo step
+            return {'FINISHED'} if self.current else {'CANCELLED'}
+        message = "Asset(s) " + ", ".join(updated) + " updated" if updated else "No asset updated"
+        if failed:
+            message += ", failed: " + ", ".join(failed)
+        show_info(message)
+        return {'FINISHED'}
+
+class WORKFLOW_OT_update_lock(bpy.types.Operator):
+    
+    bl_idname = "workflow.update_lock"
+    bl_label = "Update Lock"
+    bl_description = "Pin the asset versions used by this shot, renders will not update them"
+    bl_options = {"REGISTER", "UNDO"}
+
+    update_assets: bpy.props.BoolProperty(
+        name='Update Assets',
+        description='Relink the new asset versions before writing the lock',
+        default=False
+        )
+
+    @classmethod
+    def poll(self, context):
+        return bool(context.blend_data.filepath)
+    
+    def execute(self, context):
+        if self.update_assets:
+            check_updates(auto = True)
+        lock = write_asset_lock(context.blend_data.filepath)
+        self.report({'INFO'}, '{} asset(s) locked'.format(len(lock["assets"])))
+        return {'FINISHED'}
+
+class WORKFLOW_OT_refresh_asset_status(bpy.types.Operator):
+    
+    bl_idname = "workflow.refresh_asset_status"
+    bl_label = "Refresh Asset Status"
+    bl_description = "Check asset files again"
+    
+    def execute(self, context):
+        invalidate_file_status()
+        tag_redraw()
+        return {'FINISHED'}
+
+class WORKFLOW_OT_clear_mirror(bpy.types.Operator):
+    
+    bl_idname = "workflow.clear_mirror"
+    bl_label = "Clear Mirror"
+    bl_description = "Remove the local copies of asset libraries"
+    
+    def execute(self, context):
+        mirror = asset_mirror()
+        if mirror is None:
+            self.report({'WARNING'}, 'No local mirror directory')
+            return {'CANCELLED'}
+        mirror.clear()
+        self.report({'INFO'}, 'Local mirror cleared')
+        return {'FINISHED'}
+
 class WORKFLOW_OT_delete_link(bpy.types.Operator):
     
     bl_idname = "workflow.delete_link"
@@ -0,0 +1,96 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTIBILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+#
+# type: ignore
+
+import bpy
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from . mirror import Throttle
+from . scanner import tag_redraw
+
+#PREFETCH
+#New asset versions are copied to the local mirror as soon as they are found, before the relink asks for them
+
+PREFETCH_INTERVAL = 0.5
+
+_prefetch = {"executor": None, "workers": 0, "jobs": {}, "throttle": Throttle()}
+_prefetch_lock = threading.Lock()
+
+def prefetch_worker(mirror, path):
+    job = _prefetch["jobs"][path]
+
+    def progress(size):
+        job["done"] += size
+
+    job["status"] = "copying"
+    local = mirror.fetch(path, progress = progress, throttle = _prefetch["throttle"])
+    #fetch falls back to the source path when the copy failed
+    job["status"] = "done" if local != path else "error"
+
+def prefetch_assets(mirror, paths, workers = 2, bandwidth = 0):
+    #bandwidth in bytes per second, 0 for no limit
+    if mirror is None:
+        return
+    _prefetch["throttle"].rate = bandwidth
+    with _prefetch_lock:
+        if _prefetch["executor"] is None or _prefetch["workers"] != workers:
+            if _prefetch["executor"] is not None:
+                _prefetch["executor"].shutdown(wait=False)
+            _prefetch["executor"] = ThreadPoolExecutor(max_workers=max(1, workers))
+            _prefetch["workers"] = workers
+
+        start_timer = not prefetch_active()
+        for path in set(paths):
+            job = _prefetch["jobs"].get(path)
+            if job is not None and job["status"] in {"queued", "copying"}:
+                continue
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                continue
+            _prefetch["jobs"][path] = {"size": size, "done": 0, "status": "queued"}
+            _prefetch["executor"].submit(prefetch_worker, mirror, path)
+
+    if start_timer and prefetch_active():
+        bpy.app.timers.register(poll_prefetch, first_interval=PREFETCH_INTERVAL)
+
+def prefetch_active():
+    return any(job["status"] in {"queued", "copying"} for job in _prefetch["jobs"].values())
+
+def prefetch_progress():
+    #Returns (copied bytes, total bytes, files left) of the running batch
+    jobs = list(_prefetch["jobs"].values())
+    done = sum(min(job["done"], job["size"]) if job["status"] != "done" else job["size"] for job in jobs)
+    total = sum(job["size"] for job in jobs)
+    left = sum(1 for job in jobs if job["status"] in {"queued", "copying"})
+    return done, total, left
+
+def poll_prefetch():
+    tag_redraw()
+    if prefetch_active():
+        return PREFETCH_INTERVAL
+    #Batch finished, the panel stops showing it
+    _prefetch["jobs"].clear()
+    return None
+
+def cancel_prefetch():
+    with _prefetch_lock:
+        if _prefetch["executor"] is not None:
+            _prefetch["executor"].shutdown(wait=False)
+            _prefetch["executor"] = None
+    if bpy.app.timers.is_registered(poll_prefetch):
+        bpy.app.timers.unregister(poll_prefetch)
@@ -0,0 +1,134 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTIBILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+#
+# type: ignore
+
+import os
+import shutil
+import threading
+import subprocess
+
+#STREAMING PREVIEW ENCODE
+#The JPEG previews are piped to an ffmpeg process as soon as they are written, in frame order
+#Frames that arrive early wait for the previous ones, the movie is finished right after the last frame
+
+#Same look as the VSE encode: H264 in a QuickTime container, CRF close to the HIGH preset
+VIDEO_ARGS = ["-c:v", "libx264", "-preset", "medium", "-crf", "20", "-pix_fmt", "yuv420p"]
+AUDIO_ARGS = ["-c:a", "libmp3lame", "-b:a", "192k"]
+ERROR_LINES = 20
+
+def find_ffmpeg(path = ""):
+    #Preference first, then the PATH
+    if path and os.path.isfile(path):
+        return path
+    return shutil.which("ffmpeg")
+
+class PreviewEncoder:
+
+    def __init__(self, ffmpeg, output, frames, fps):
+        self.ffmpeg = ffmpeg
+        self.output = output
+        self.frames = list(frames)
+        self.fps = fps
+        self.ready = {}
+        self.next = 0
+        self.failed = False
+        self.condition = threading.Condition()
+        self.video = "{}.{}.video.mov".format(os.path.splitext(output)[0], os.getpid())
+        self.process = subprocess.Popen(
+            [ffmpeg, "-y", "-loglevel", "error", "-f", "image2pipe", "-c:v", "mjpeg", "-framerate", str(fps),
+                "-i", "-"] + VIDEO_ARGS + [self.video],
+            stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        self.errors = []
+        self.stderr_thread = threading.Thread(target=self.read_errors, daemon=True)
+        self.stderr_thread.start()
+        self.thread = threading.Thread(target=self.feed, daemon=True)
+        self.thread.start()
+
+    def read_errors(self):
+        for line in self.process.stderr:
+            self.errors = (self.errors + [line.decode('utf-8', 'replace').rstrip()])[-ERROR_LINES:]
+
+    def add(self, frame, image):
+        #Called from any thread once the preview of the frame is on disk
+        with self.condition:
+            self.ready[frame] = image
+            self.condition.notify()
+
+    def feed(self):
+        while True:
+            with self.condition:
+                while self.next < len(self.frames) and self.frames[self.next] not in self.ready and not self.failed:
+                    self.condition.wait()
+                if self.failed or self.next >= len(self.frames):
+                    break
+                image = self.ready[self.frames[self.next]]
+            try:
+                with open(image, 'rb') as infile:
+                    shutil.copyfileobj(infile, self.process.stdin)
+            except OSError as ex:
+                #Broken pipe or unreadable image, the caller falls back to the VSE encode
+                self.errors.append(str(ex))
+                with self.condition:
+                    self.failed = True
+                break
+            with self.condition:
+                self.next += 1
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+
+    def abort(self):
+        with self.condition:
+            self.failed = True
+            self.condition.notify()
+        self.process.kill()
+        self.thread.join()
+        self.cleanup()
+
+    def cleanup(self):
+        if os.path.exists(self.video):
+            os.remove(self.video)
+
+    def finish(self, audio = None):
+        #Returns True when the movie is written, audio is muxed in when given
+        with self.condition:
+            if any(frame not in self.ready for frame in self.frames):
+                self.failed = True
+            self.condition.notify()
+        self.thread.join()
+        returncode = self.process.wait()
+        self.stderr_thread.join()
+        if self.failed or returncode != 0:
+            self.cleanup()
+            return False
+
+        try:
+            if audio is None:
+                os.replace(self.video, self.output)
+                return True
+            command = [self.ffmpeg, "-y", "-loglevel", "error", "-i", self.video, "-i", audio,
+                "-map", "0:v", "-map", "1:a", "-c:v", "copy"] + AUDIO_ARGS + ["-shortest", self.output]
+            result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            if result.returncode != 0:
+                self.errors.extend(result.stderr.decode('utf-8', 'replace').splitlines()[-ERROR_LINES:])
+                return False
+            return True
+        except OSError as ex:
+            self.errors.append(str(ex))
+            return False
+        finally:
+            self.cleanup()
@@ -0,0 +1,182 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTIBILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+#
+# type: ignore
+
+import os
+import sys
+import json
+import time
+import socket
+
+#RENDER PROGRESS
+#One JSON object per line, written straight to the channel:
+#   stdout (default), stderr, file:<path>, pipe:<named pipe>, tcp:<host>:<port>
+#The WORKFLOW_PROGRESS environment variable overrides the add-on preference
+
+PROGRESS_ENV = "WORKFLOW_PROGRESS"
+
+def windows_memory():
+    #PROCESS_MEMORY_COUNTERS of this process, None outside Windows
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [
+                ("cb", wintypes.DWORD),
+                ("PageFaultCount", wintypes.DWORD),
+                ("PeakWorkingSetSize", ctypes.c_size_t),
+                ("WorkingSetSize", ctypes.c_size_t),
+                ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                ("PagefileUsage", ctypes.c_size_t),
+                ("PeakPagefileUsage", ctypes.c_size_t),
+                ]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return counters
+    except (ImportError, AttributeError, OSError):
+        pass
+    return None
+
+def peak_memory():
+    #Peak resident memory of this process in bytes, None when unknown
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        #Kilobytes on Linux, bytes on macOS
+        return peak if sys.platform == "darwin" else peak * 1024
+    except ImportError:
+        pass
+    counters = windows_memory()
+    return counters.PeakWorkingSetSize if counters is not None else None
+
+def current_memory():
+    #Resident memory right now in bytes, None when unknown
+    try:
+        with open("/proc/self/statm") as infile:
+            return int(infile.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    counters = windows_memory()
+    return counters.WorkingSetSize if counters is not None else None
+
+class ProgressChannel:
+
+    def __init__(self, target = ""):
+        self.target = os.environ.get(PROGRESS_ENV) or target or "stdout"
+        self.stream = None
+        self.socket = None
+        try:
+            self.open()
+        except (OSError, ValueError) as ex:
+            print("Progress channel {} unavailable, using stdout: {}".format(self.target, ex))
+            self.target = "stdout"
+            self.stream = sys.stdout
+
+    def open(self):
+        kind, _, address = self.target.partition(":")
+        if kind == "stdout":
+            self.stream = sys.stdout
+        elif kind == "stderr":
+            self.stream = sys.stderr
+        elif kind == "file":
+            self.stream = open(address, 'a', encoding='utf-8')
+        elif kind == "pipe":
+            #Blocks until the reader opens the pipe
+            self.stream = open(address, 'w', encoding='utf-8')
+        elif kind == "tcp":
+            host, _, port = address.rpartition(":")
+            self.socket = socket.create_connection((host, int(port)), timeout=10.0)
+        else:
+            raise ValueError("unknown channel {}".format(kind))
+
+    def write(self, line):
+        try:
+            if self.socket is not None:
+                self.socket.sendall(line.encode('utf-8'))
+            else:
+                self.stream.write(line)
+                self.stream.flush()
+        except OSError:
+            #The reader went away, the render goes on
+            self.close()
+            self.socket = None
+            self.stream = sys.stdout
+
+    def emit(self, event, **values):
+        data = {"event": event, "time": time.time()}
+        data.update(values)
+        self.write(json.dumps(data) + "\n")
+
+    def close(self):
+        if self.socket is not None:
+            try:
+                self.socket.close()
+            except OSError:
+                pass
+        elif self.stream not in (None, sys.stdout, sys.stderr):
+            try:
+                self.stream.close()
+            except OSError:
+                pass
+
+class RenderProgress:
+    #Job and frame events of one render, durations and ETA are computed here
+
+    def __init__(self, frame_start, frame_end, target = "", total = None, **job):
+        #total: frames actually rendered, when some frames of the range are skipped
+        self.channel = ProgressChannel(target)
+        self.frame_start = frame_start
+        self.frame_end = frame_end
+        self.total = total if total is not None else frame_end - frame_start + 1
+        self.done = 0
+        self.durations = []
+        self.frame_started = None
+        self.started = time.perf_counter()
+        self.channel.emit("job_start", frame_start = frame_start, frame_end = frame_end, total = self.total,
+            pid = os.getpid(), **job)
+
+    def eta(self):
+        if not self.durations:
+            return None
+        return sum(self.durations) / len(self.durations) * (self.total - self.done)
+
+    def start_frame(self, frame, **values):
+        self.frame_started = time.perf_counter()
+        #current and total are what the echo used to print
+        self.channel.emit("frame_start", frame = frame, current = frame, total = self.total,
+            done = self.done, eta = self.eta(), **values)
+
+    def end_frame(self, frame, output = None, **values):
+        duration = time.perf_counter() - self.frame_started if self.frame_started is not None else None
+        self.frame_started = None
+        self.done += 1
+        if duration is not None:
+            self.durations.append(duration)
+        self.channel.emit("frame_end", frame = frame, done = self.done, total = self.total,
+            duration = duration, peak_memory = peak_memory(), output = output, eta = self.eta(), **values)
+        return duration
+
+    def finish(self, status = "finished", **values):
+        self.channel.emit("job_end", status = status, done = self.done, total = self.total,
+            elapsed = time.perf_counter() - self.started, peak_memory = peak_memory(), **values)
+        self.channel.close()
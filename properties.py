@@ -101,12 +101,23 @@ class RELINK_PROP_Scene(bpy.types.PropertyGroup):
     version: bpy.props.StringProperty(
         name="version",
         )
+    digest: bpy.props.StringProperty(
+        name="digest",
+        )
+    signature: bpy.props.StringProperty(
+        name="signature",
+        description="Size and mtime of the source when the digest was taken",
+        )
     data_type: bpy.props.StringProperty(
         name="data_type",
         )
     data_name: bpy.props.StringProperty(
         name="data_name",
         )    
+    instance_of: bpy.props.StringProperty(
+        name="instance_of",
+        description="uid of the asset whose object data, materials and images are shared",
+        )
 
 class RELINK_PROP_Data(bpy.types.PropertyGroup):
 
@@ -0,0 +1,102 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTIBILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+#
+# type: ignore
+
+import bpy
+
+#ORPHAN PURGE
+#Everything not reachable from a root is removed in one batch_remove, nested orphans included
+
+#Never removed, they are what the file is made of
+ROOT_COLLECTIONS = ("scenes", "window_managers", "screens", "workspaces", "texts", "libraries")
+
+#Rough per element sizes, only used for the statistics
+BYTES_PER_VERTEX = 48
+BYTES_PER_LOOP = 24
+BYTES_PER_POLYGON = 16
+BYTES_PER_KEYFRAME = 64
+BYTES_DEFAULT = 1024
+
+def estimate_size(data):
+    if isinstance(data, bpy.types.Mesh):
+        return (len(data.vertices) * BYTES_PER_VERTEX + len(data.loops) * BYTES_PER_LOOP
+            + len(data.polygons) * BYTES_PER_POLYGON)
+    if isinstance(data, bpy.types.Image):
+        if not data.has_data:
+            return BYTES_DEFAULT
+        depth = 4 if data.is_float else 1
+        return data.size[0] * data.size[1] * data.channels * depth
+    if isinstance(data, bpy.types.Action):
+        return sum(len(fcurve.keyframe_points) for fcurve in data.fcurves) * BYTES_PER_KEYFRAME
+    return BYTES_DEFAULT
+
+def find_orphans(keep_fake_user = True):
+    #IDs that no root reaches through user_map
+    user_map = bpy.data.user_map()
+
+    #user_map gives the users of each ID, walk it the other way
+    uses = {}
+    for data, users in user_map.items():
+        for user in users:
+            if user != data:
+                uses.setdefault(user, []).append(data)
+
+    roots = []
+    for attr in ROOT_COLLECTIONS:
+        roots.extend(getattr(bpy.data, attr, ()))
+    if keep_fake_user:
+        roots.extend(data for data in user_map if data.use_fake_user)
+
+    reachable = set()
+    stack = list(roots)
+    while stack:
+        data = stack.pop()
+        if data in reachable:
+            continue
+        reachable.add(data)
+        stack.extend(uses.get(data, ()))
+
+    return [data for data in user_map if data not in reachable]
+
+def purge_orphans(keep_fake_user = True, dry_run = False):
+    #Returns {"count": n, "bytes": n, "types": {type: {"count": n, "bytes": n}}}
+    orphans = find_orphans(keep_fake_user = keep_fake_user)
+    stats = {"count": len(orphans), "bytes": 0, "types": {}}
+    for data in orphans:
+        size = estimate_size(data)
+        entry = stats["types"].setdefault(data.bl_rna.identifier, {"count": 0, "bytes": 0})
+        entry["count"] += 1
+        entry["bytes"] += size
+        stats["bytes"] += size
+
+    if orphans and not dry_run:
+        bpy.data.batch_remove(orphans)
+    return stats
+
+def id_pointers():
+    #Every ID of the file, to find the ones added after
+    return set(data.as_pointer() for data in bpy.data.user_map())
+
+def purge_new_orphans(existing):
+    #Orphans added since id_pointers, fake users included. Returns the number of removed IDs
+    orphans = [data for data in find_orphans(keep_fake_user = False) if data.as_pointer() not in existing]
+    if orphans:
+        bpy.data.batch_remove(orphans)
+    return len(orphans)
+
+def format_purge_stats(stats):
+    types = ", ".join("{} {}".format(entry["count"], name) for name, entry in sorted(stats["types"].items()))
+    return "{} datablock(s) removed, about {:.1f} MB ({})".format(stats["count"], stats["bytes"] / 1048576, types or "nothing")
@@ -0,0 +1,107 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTIBILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+#
+# type: ignore
+
+import os
+import json
+import time
+from contextlib import contextmanager
+
+#RELINK PROFILE
+#Wall-clock time and datablock count per relink phase, the last report is kept for the asset panel
+
+_last_report = {"report": None}
+
+class RelinkProfile:
+
+    def __init__(self, dry_run = False):
+        self.dry_run = dry_run
+        self.phases = {}
+        self.order = []
+        self.current = []
+        self.assets = {}
+        self.started = time.perf_counter()
+
+    def entry(self, name):
+        if name not in self.phases:
+            self.phases[name] = {"time": 0.0, "count": 0, "calls": 0}
+            self.order.append(name)
+        return self.phases[name]
+
+    @contextmanager
+    def phase(self, name):
+        entry = self.entry(name)
+        entry["calls"] += 1
+        self.current.append(name)
+        start = time.perf_counter()
+        try:
+            yield entry
+        finally:
+            entry["time"] += time.perf_counter() - start
+            self.current.pop()
+
+    def count(self, number = 1):
+        #Datablocks touched by the running phase
+        if self.current:
+            self.phases[self.current[-1]]["count"] += number
+
+    def asset(self, uid, **values):
+        self.assets.setdefault(uid, {}).update(values)
+
+    def asset_time(self, uid, seconds):
+        asset = self.assets.setdefault(uid, {})
+        asset["time"] = asset.get("time", 0.0) + seconds
+
+    def report(self):
+        return {
+            "dry_run": self.dry_run,
+            "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "total": time.perf_counter() - self.started,
+            "phases": [dict(name = name, **self.phases[name]) for name in self.order],
+            "assets": self.assets,
+            }
+
+def save_profile_report(filepath, report):
+    _last_report["report"] = report
+    if filepath is None:
+        return
+    tmp_path = "{}.{}.tmp".format(filepath, os.getpid())
+    try:
+        with open(tmp_path, 'w') as outfile:
+            json.dump(report, outfile, indent=2)
+        os.replace(tmp_path, filepath)
+    except OSError:
+        pass
+
+def last_profile_report():
+    return _last_report["report"]
+
+def slowest_phases(report, count = 3):
+    return sorted(report["phases"], key = lambda phase: phase["time"], reverse = True)[:count]
+
+def slowest_assets(report, count = None):
+    assets = [dict(uid = uid, **values) for uid, values in report["assets"].items() if "time" in values]
+    assets.sort(key = lambda asset: asset["time"], reverse = True)
+    return assets[:count] if count else assets
+
+def asset_timing_table(report):
+    #Text table for the console, slowest first
+    lines = ["{:<32} {:>9}  {}".format("Asset", "Time (s)", "Status")]
+    for asset in slowest_assets(report):
+        lines.append("{:<32} {:>9.2f}  {}".format(asset.get("name", asset["uid"])[:32], asset["time"],
+            asset.get("status", "")))
+    lines.append("{:<32} {:>9.2f}".format("Total", report["total"]))
+    return "\n".join(lines)
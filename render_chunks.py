@@ -0,0 +1,178 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTIBILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+#
+# type: ignore
+
+#CHUNKED RENDER
+#Batch Render splits the frame range between background Blender workers:
+#   blender -b <copy of the shot> -t <threads> -P render_chunks.py -- --worker --frames 1-24 --output <path>
+#Workers write their progress as JSON lines on stdout, the coordinator forwards frame events
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from . sweep import SWEEP_ENV, addon_module, enable_addon, script_arguments
+    from . progress import PROGRESS_ENV
+except ImportError:
+    #-P runs this file outside of the add-on package
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    from sweep import SWEEP_ENV, addon_module, enable_addon, script_arguments
+    from progress import PROGRESS_ENV
+
+REPORT_FILE = "render_report.json"
+REPORT_HISTORY = 20
+#Last lines of a failed worker kept in the report
+ERROR_LINES = 20
+
+def split_frames(frames, chunks):
+    #Consecutive slices of nearly equal length
+    chunks = max(1, min(chunks, len(frames)))
+    slices = []
+    start = 0
+    for i in range(chunks):
+        length = len(frames) // chunks + (1 if i < len(frames) % chunks else 0)
+        slices.append(frames[start:start + length])
+        start += length
+    return slices
+
+def format_frames(frames):
+    #[1, 2, 3, 7] -> "1-3,7"
+    ranges = []
+    for frame in sorted(frames):
+        if ranges and frame == ranges[-1][1] + 1:
+            ranges[-1][1] = frame
+        else:
+            ranges.append([frame, frame])
+    return ",".join(str(start) if start == end else "{}-{}".format(start, end) for start, end in ranges)
+
+def parse_frames(text):
+    frames = []
+    for part in text.split(","):
+        start, _, end = part.partition("-")
+        frames.extend(range(int(start), int(end or start) + 1))
+    return frames
+
+def default_threads(workers):
+    return max(1, (os.cpu_count() or 1) // workers)
+
+def run_chunk(blender, filepath, frames, output, threads, on_event, timeout = None):
+    #Returns {"frames", "returncode", "durations": {frame: seconds}, "wall_time", "message"}
+    env = dict(os.environ)
+    env[PROGRESS_ENV] = "stdout"
+    #Workers render the versions of the coordinator, no asset update on load
+    env[SWEEP_ENV] = "1"
+    command = [blender, "-b", filepath, "-t", str(threads), "--python-exit-code", "1", "-P", os.path.abspath(__file__),
+        "--", "--worker", "--frames", format_frames(frames), "--output", output]
+    report = {"frames": format_frames(frames), "durations": {}, "returncode": None, "message": ""}
+    started = time.perf_counter()
+    process = subprocess.Popen(command, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    timer = None
+    if timeout:
+        timer = threading.Timer(timeout, process.kill)
+        timer.start()
+    output_lines = []
+    try:
+        for line in process.stdout:
+            line = line.decode('utf-8', 'replace').strip()
+            event = None
+            if line.startswith('{"event"'):
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    pass
+            if event is None:
+                output_lines = (output_lines + [line])[-ERROR_LINES:]
+                continue
+            if event["event"] == "frame_end":
+                report["durations"][event["frame"]] = event["duration"]
+            on_event(report["frames"], event)
+        report["returncode"] = process.wait()
+    finally:
+        if timer is not None:
+            timer.cancel()
+    report["wall_time"] = time.perf_counter() - started
+    if report["returncode"] != 0:
+        report["message"] = "\n".join(output_lines)
+    return report
+
+def render_chunks(blender, filepath, frames, output, workers, threads, on_event, chunks = None, timeout = None):
+    #Runs every chunk, at most workers at the same time, returns the chunk reports in frame order
+    threads = threads or default_threads(workers)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_chunk, blender, filepath, chunk, output, threads, on_event, timeout)
+            for chunk in split_frames(frames, chunks or workers)]
+        return [future.result() for future in futures]
+
+def speed_up(history, report):
+    #Compared to the last single process render of the same shot, per frame
+    for previous in reversed(history):
+        if previous.get("workers") == 1 and previous.get("frames"):
+            baseline = previous["time"] / previous["frames"]
+            return baseline * report["frames"] / report["time"] if report["time"] else None
+    return None
+
+def write_render_report(directory, report):
+    #Keeps the last renders of the shot, each with its speed-up when a baseline exists
+    filepath = os.path.join(directory, REPORT_FILE)
+    try:
+        with open(filepath) as infile:
+            history = json.load(infile)["renders"]
+    except (OSError, ValueError, KeyError):
+        history = []
+    report["speed_up"] = speed_up(history, report)
+    history = (history + [report])[-REPORT_HISTORY:]
+    tmp_path = "{}.{}.tmp".format(filepath, os.getpid())
+    try:
+        with open(tmp_path, 'w') as outfile:
+            json.dump({"renders": history}, outfile, indent=2)
+        os.replace(tmp_path, filepath)
+    except OSError:
+        pass
+    return report
+
+def format_render_report(report):
+    text = "{} frame(s) in {:.1f}s with {} worker(s) x {} thread(s)".format(
+        report["frames"], report["time"], report["workers"], report["threads"])
+    if report.get("parallelism"):
+        text += ", {:.1f} frames rendering on average".format(report["parallelism"])
+    if report.get("speed_up"):
+        text += ", speed-up x{:.2f} against one process".format(report["speed_up"])
+    return text
+
+def worker(frames, output):
+    enable_addon()
+    functions = addon_module("functions")
+    functions.setup_batch_render()
+    progress = functions.render_progress(min(frames), max(frames), operator = "render_chunk", total = len(frames))
+    functions.render_frames(output, frames, progress)
+    progress.finish()
+
+def main():
+    parser = argparse.ArgumentParser(prog="blender -b <file> -P render_chunks.py --")
+    parser.add_argument("--worker", action="store_true")
+    parser.add_argument("--frames", required=True, help="Frames to render, as 1-10,12")
+    parser.add_argument("--output", required=True, help="Render output path, without frame number")
+    args = parser.parse_args(script_arguments())
+    worker(parse_frames(args.frames), args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTIBILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+#
+# type: ignore
+
+import os
+import json
+import time
+import threading
+
+#RENDER MANIFEST
+#Finished frames of a render output folder, a restarted Batch Render skips the frames still valid
+#A frame is valid when it was rendered from the same scene state and its files are complete
+
+RENDER_MANIFEST_FILE = "render_manifest.json"
+RENDER_MANIFEST_VERSION = 1
+
+EXR_MAGIC = b'\x76\x2f\x31\x01'
+JPEG_START = b'\xff\xd8'
+JPEG_END = b'\xff\xd9'
+
+def image_complete(path, size):
+    #Size as recorded, and the format markers a crashed write would miss
+    try:
+        if os.path.getsize(path) != size:
+            return False
+        with open(path, 'rb') as infile:
+            head = infile.read(4)
+            if path.lower().endswith(".exr"):
+                return head == EXR_MAGIC
+            if path.lower().endswith((".jpg", ".jpeg")):
+                infile.seek(-2, os.SEEK_END)
+                return head[:2] == JPEG_START and infile.read(2) == JPEG_END
+    except OSError:
+        return False
+    return size > 0
+
+class RenderManifest:
+
+    def __init__(self, directory, state):
+        self.filepath = os.path.join(directory, RENDER_MANIFEST_FILE)
+        self.state = state
+        self.frames = {}
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.filepath) as infile:
+                data = json.load(infile)
+        except (OSError, ValueError):
+            return
+        if data.get("version") != RENDER_MANIFEST_VERSION:
+            return
+        #Frames of another scene state are kept until rendered again, they are never valid
+        self.frames = {int(frame): entry for frame, entry in data["frames"].items()}
+
+    def valid(self, frame):
+        entry = self.frames.get(frame)
+        if entry is None or entry["state"] != self.state:
+            return False
+        return all(image_complete(path, size) for path, size in entry["outputs"])
+
+    def pending(self, frames):
+        #Frames to render, in order
+        return [frame for frame in frames if not self.valid(frame)]
+
+    def record(self, frame, outputs, seconds):
+        #outputs: files of the frame, missing files are not recorded
+        try:
+            sizes = [[path, os.path.getsize(path)] for path in outputs]
+        except OSError:
+            return False
+        with self.lock:
+            self.frames[frame] = {
+                "state": self.state,
+                "outputs": sizes,
+                "time": seconds,
+                "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+                }
+            self.save()
+        return True
+
+    def save(self):
+        data = {
+            "version": RENDER_MANIFEST_VERSION,
+            "state": self.state,
+            "frames": {str(frame): entry for frame, entry in sorted(self.frames.items())},
+            }
+        tmp_path = "{}.{}.tmp".format(self.filepath, os.getpid())
+        try:
+            with open(tmp_path, 'w') as outfile:
+                json.dump(data, outfile, indent=1)
+            os.replace(tmp_path, self.filepath)
+        except OSError:
+            pass
@@ -0,0 +1,230 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTIBILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+#
+# type: ignore
+
+import bpy
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from . cache import *
+
+#ASSET SCANNER
+#Stat and hash asset files in worker threads, results come back on the main thread through a timer
+
+SCAN_INTERVAL = 0.1
+
+_scan_state = {"generation": 0, "scans": set()}
+
+def shutdown_executor(executor):
+    #Never wait for a worker blocked on a dead path, cancel_futures needs Python 3.9
+    try:
+        executor.shutdown(wait=False, cancel_futures=True)
+    except TypeError:
+        executor.shutdown(wait=False)
+
+def relative_path(path, start):
+    #Same result as bpy.path.relpath without touching bpy from a thread
+    try:
+        return "//" + os.path.relpath(path, start)
+    except ValueError:
+        #Different drive
+        return path
+
+def scan_path(path, blend_filepath, started, key):
+    #Worker thread: no bpy access here
+    #Only the stat is timed, a dead path blocks there, hashing a big file is not a timeout
+    started[key] = time.monotonic()
+    result = {"path": path}
+    try:
+        path_resolved = str(Path(path).resolve())
+        if blend_filepath:
+            filename_resolved = str(Path(blend_filepath).resolve())
+            result["relpath"] = relative_path(path_resolved, os.path.dirname(filename_resolved))
+        signature = file_signature(path_resolved)
+        started[key] = None
+        result["signature"] = signature
+        result["mtime"] = signature[1] / 1e9
+        result["digest"] = file_digest(path_resolved, signature)
+        store_file_status(path, {"signature": signature, "mtime": result["mtime"], "digest": result["digest"]})
+    except OSError as ex:
+        result["error"] = str(ex)
+        store_file_status(path, None)
+    return result
+
+class AssetScan:
+
+    def __init__(self, jobs, callback, max_workers = 8, timeout = 5.0, blend_filepath = ""):
+        _scan_state["generation"] += 1
+        self.generation = _scan_state["generation"]
+        self.callback = callback
+        self.timeout = timeout
+        self.max_workers = max(1, max_workers)
+        self.results = {}
+        self.started = {}
+        self.blend_filepath = blend_filepath
+        self.paths = dict(jobs)
+        self.executors = []
+        self.futures = {}
+        self.owners = {}
+        self.submit(self.paths)
+        _scan_state["scans"].add(self)
+
+    def submit(self, keys):
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        self.executors.append(executor)
+        for key in keys:
+            self.futures[key] = executor.submit(scan_path, self.paths[key], self.blend_filepath, self.started, key)
+            self.owners[key] = executor
+
+    def shutdown(self):
+        for future in self.futures.values():
+            future.cancel()
+        for executor in self.executors:
+            shutdown_executor(executor)
+        _scan_state["scans"].discard(self)
+
+    def cancelled(self):
+        return self.generation != _scan_state["generation"]
+
+    def poll(self):
+        if self.cancelled():
+            self.shutdown()
+            return None
+
+        now = time.monotonic()
+        for key, future in self.futures.items():
+            if key in self.results:
+                continue
+            if future.done():
+                self.results[key] = future.result()
+            elif self.started.get(key) is not None and now - self.started[key] > self.timeout:
+                self.results[key] = {"error": "timeout"}
+
+        #Every worker of the last executor is blocked on a dead path, queued jobs move to a new one
+        stuck = [key for key, future in self.futures.items() if self.owners[key] is self.executors[-1]
+            and future.running() and key in self.results and self.started.get(key) is not None]
+        if len(stuck) >= self.max_workers:
+            queued = [key for key, future in self.futures.items() if future.cancel()]
+            if queued:
+                self.submit(queued)
+
+        if len(self.results) < len(self.futures):
+            return SCAN_INTERVAL
+
+        self.shutdown()
+        self.callback(self.results)
+        return None
+
+    def start(self):
+        bpy.app.timers.register(self.poll, first_interval=SCAN_INTERVAL)
+        return self
+
+def run_scan(jobs, blend_filepath = ""):
+    #Synchronous version, for background mode and operators
+    started = {}
+    return {key: scan_path(path, blend_filepath, started, key) for key, path in jobs}
+
+def cancel_scans():
+    _scan_state["generation"] += 1
+    for scan in list(_scan_state["scans"]):
+        scan.shutdown()
+    _watch_state["interval"] = 0.0
+    _status_jobs["pending"].clear()
+    if _status_jobs["executor"] is not None:
+        shutdown_executor(_status_jobs["executor"])
+        _status_jobs["executor"] = None
+    if bpy.app.timers.is_registered(poll_status_jobs):
+        bpy.app.timers.unregister(poll_status_jobs)
+    if bpy.app.timers.is_registered(watch_directories):
+        bpy.app.timers.unregister(watch_directories)
+
+#FILE STATUS REFRESH
+#Panels and polls only read the status cache, missing or expired entries are refreshed here
+
+_status_jobs = {"executor": None, "pending": set(), "done": []}
+
+def tag_redraw():
+    for window in bpy.context.window_manager.windows:
+        for area in window.screen.areas:
+            if area.type in {'VIEW_3D', 'NODE_EDITOR'}:
+                area.tag_redraw()
+
+def refresh_status_worker(path, reader):
+    #Cancelled since it was queued
+    if path not in _status_jobs["pending"]:
+        return
+    store_file_status(path, reader(path))
+    _status_jobs["done"].append(path)
+
+def poll_status_jobs():
+    done = _status_jobs["done"]
+    redraw = bool(done)
+    while done:
+        _status_jobs["pending"].discard(done.pop())
+    if redraw:
+        tag_redraw()
+    if _status_jobs["pending"]:
+        return SCAN_INTERVAL
+    return None
+
+def request_file_status(path, reader = read_file_status):
+    #reader: worker side function whose result is cached for the path
+    if path in _status_jobs["pending"]:
+        return
+    if _status_jobs["executor"] is None:
+        _status_jobs["executor"] = ThreadPoolExecutor(max_workers=4)
+    _status_jobs["pending"].add(path)
+    _status_jobs["executor"].submit(refresh_status_worker, path, reader)
+    #Persistent, pending paths keep being collected after a file load
+    if not bpy.app.timers.is_registered(poll_status_jobs):
+        bpy.app.timers.register(poll_status_jobs, first_interval=SCAN_INTERVAL, persistent=True)
+
+#DIRECTORY WATCH
+#Poll the mtime of asset directories, a save or copy in a directory expires its cached files
+
+_watch_state = {"interval": 0.0, "mtimes": {}, "busy": False}
+
+def watch_worker(directories):
+    changed = []
+    for directory in directories:
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+        except OSError:
+            mtime = None
+        previous = _watch_state["mtimes"].get(directory)
+        _watch_state["mtimes"][directory] = mtime
+        if previous is not None and previous != mtime:
+            changed.append(directory)
+    for directory in changed:
+        invalidate_directory_status(directory)
+    _watch_state["busy"] = False
+
+def watch_directories():
+    interval = _watch_state["interval"]
+    if interval <= 0:
+        return None
+    if not _watch_state["busy"]:
+        if _status_jobs["executor"] is None:
+            _status_jobs["executor"] = ThreadPoolExecutor(max_workers=4)
+        _watch_state["busy"] = True
+        _status_jobs["executor"].submit(watch_worker, cached_status_directories())
+    return interval
+
+def set_watch_interval(interval):
+    _watch_state["interval"] = interval
+    if interval > 0 and not bpy.app.timers.is_registered(watch_directories):
+        bpy.app.timers.register(watch_directories, first_interval=interval, persistent=True)
@@ -0,0 +1,266 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTIBILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+#
+# type: ignore
+
+import os
+import ast
+import configparser
+
+#PRODUCTION SETTINGS
+#The INI file is parsed once per stat signature, values are read without eval
+#A value can use: literals, tuples, lists and dicts, +, indexing and slicing, the filename variable,
+#string methods such as filename.split('_') and the os.path functions listed below
+#Values written for the old eval reader that use anything else (bpy, other modules, other names)
+#are refused with the key and the expression, they have to be rewritten with the forms above
+
+SETTINGS_SECTION = 'SETTINGS'
+SETTINGS_TYPES = {
+    "render_output": str,
+    "publish_output": str,
+    "preview_output": str,
+    "render_material_path": str,
+    "audio_file": str,
+    }
+#Names an expression can use, given when the value is read
+SETTINGS_VARIABLES = ("filename",)
+SETTINGS_FUNCTIONS = {
+    "str": str,
+    "int": int,
+    "os.path.join": os.path.join,
+    "os.path.basename": os.path.basename,
+    "os.path.dirname": os.path.dirname,
+    "os.path.splitext": os.path.splitext,
+    "os.path.normpath": os.path.normpath,
+    }
+STRING_METHODS = {"split", "rsplit", "partition", "rpartition", "replace", "strip", "lstrip", "rstrip",
+    "upper", "lower", "capitalize", "title", "zfill", "format", "join", "startswith", "endswith"}
+#Python 3.7 parses literals as Str and Num
+LITERAL_NODES = tuple(getattr(ast, name) for name in ("Constant", "Str", "Num", "NameConstant") if hasattr(ast, name))
+
+SNAPSHOT_VERSION = 1
+
+_settings = {}
+
+class SettingsError(Exception):
+    pass
+
+def dotted_name(node):
+    #os.path.join -> "os.path.join", None for anything else than names and attributes
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        parent = dotted_name(node.value)
+        return parent + "." + node.attr if parent is not None else None
+    return None
+
+def subscript_index(node):
+    #Python 3.7 wraps the index in Index
+    index = node.slice
+    if hasattr(ast, "Index") and isinstance(index, ast.Index):
+        index = index.value
+    return index
+
+def check_node(node):
+    #True when the expression only uses the forms listed above
+    if isinstance(node, LITERAL_NODES):
+        return True
+    if isinstance(node, (ast.Tuple, ast.List)):
+        return all(check_node(element) for element in node.elts)
+    if isinstance(node, ast.Dict):
+        return all(key is not None and check_node(key) for key in node.keys) and all(check_node(value) for value in node.values)
+    if isinstance(node, ast.UnaryOp):
+        return isinstance(node.op, (ast.USub, ast.UAdd)) and check_node(node.operand)
+    if isinstance(node, ast.BinOp):
+        return isinstance(node.op, ast.Add) and check_node(node.left) and check_node(node.right)
+    if isinstance(node, ast.Name):
+        return node.id in SETTINGS_VARIABLES
+    if isinstance(node, ast.Subscript):
+        index = subscript_index(node)
+        if isinstance(index, ast.Slice):
+            parts = [part for part in (index.lower, index.upper, index.step) if part is not None]
+            return check_node(node.value) and all(check_node(part) for part in parts)
+        return check_node(node.value) and check_node(index)
+    if isinstance(node, ast.Call):
+        if any(isinstance(arg, ast.Starred) for arg in node.args) or any(keyword.arg is None for keyword in node.keywords):
+            return False
+        if dotted_name(node.func) in SETTINGS_FUNCTIONS:
+            pass
+        elif isinstance(node.func, ast.Attribute) and node.func.attr in STRING_METHODS:
+            if not check_node(node.func.value):
+                return False
+        else:
+            return False
+        return all(check_node(arg) for arg in node.args) and all(check_node(keyword.value) for keyword in node.keywords)
+    return False
+
+def compile_setting(name, text):
+    #Returns a validated expression tree
+    try:
+        tree = ast.parse(text.strip(), mode='eval')
+    except SyntaxError as ex:
+        raise SettingsError("{}: {}".format(name, ex))
+    if not check_node(tree.body):
+        raise SettingsError("{}: unsupported expression {}, see settings.py for the accepted forms".format(name, text))
+    return tree.body
+
+def evaluate_node(node, variables):
+    if isinstance(node, LITERAL_NODES):
+        return ast.literal_eval(node)
+    if isinstance(node, ast.Tuple):
+        return tuple(evaluate_node(element, variables) for element in node.elts)
+    if isinstance(node, ast.List):
+        return [evaluate_node(element, variables) for element in node.elts]
+    if isinstance(node, ast.Dict):
+        return {evaluate_node(key, variables): evaluate_node(value, variables) for key, value in zip(node.keys, node.values)}
+    if isinstance(node, ast.UnaryOp):
+        value = evaluate_node(node.operand, variables)
+        return -value if isinstance(node.op, ast.USub) else +value
+    if isinstance(node, ast.BinOp):
+        return evaluate_node(node.left, variables) + evaluate_node(node.right, variables)
+    if isinstance(node, ast.Name):
+        return variables[node.id]
+    if isinstance(node, ast.Subscript):
+        index = subscript_index(node)
+        if isinstance(index, ast.Slice):
+            parts = [evaluate_node(part, variables) if part is not None else None
+                for part in (index.lower, index.upper, index.step)]
+            return evaluate_node(node.value, variables)[slice(*parts)]
+        return evaluate_node(node.value, variables)[evaluate_node(index, variables)]
+    #Call
+    args = [evaluate_node(arg, variables) for arg in node.args]
+    kwargs = {keyword.arg: evaluate_node(keyword.value, variables) for keyword in node.keywords}
+    function = SETTINGS_FUNCTIONS.get(dotted_name(node.func))
+    if function is None:
+        value = evaluate_node(node.func.value, variables)
+        if not isinstance(value, str):
+            raise TypeError("{} called on {}".format(node.func.attr, type(value).__name__))
+        function = getattr(value, node.func.attr)
+    return function(*args, **kwargs)
+
+def evaluate_setting(name, node, variables, text = ""):
+    #Errors of the expression itself, e.g. a tuple added to a string, come back as SettingsError
+    try:
+        return evaluate_node(node, variables)
+    except (TypeError, ValueError, IndexError, KeyError) as ex:
+        raise SettingsError("{}: {} in {}".format(name, ex, text or ast.dump(node)))
+
+def constant_setting(node):
+    return not any(isinstance(child, ast.Name) and child.id in SETTINGS_VARIABLES for child in ast.walk(node))
+
+class ProductionSettings:
+
+    def __init__(self, filepath, signature, expressions, sources = None):
+        self.filepath = filepath
+        self.signature = signature
+        self.expressions = expressions
+        self.sources = sources or {}
+        self.constants = {}
+        for name, node in expressions.items():
+            if constant_setting(node):
+                self.constants[name] = self.check(name, evaluate_setting(name, node, {}, self.sources.get(name)))
+
+    def check(self, name, value):
+        expected = SETTINGS_TYPES.get(name)
+        if expected is not None and not isinstance(value, expected):
+            raise SettingsError("{}: expected {}, got {}".format(name, expected.__name__, type(value).__name__))
+        return value
+
+    def get(self, name, variables = None):
+        if name in self.constants:
+            return self.constants[name]
+        node = self.expressions.get(name)
+        if node is None:
+            raise SettingsError("{} missing in {}".format(name, self.filepath))
+        values = dict.fromkeys(SETTINGS_VARIABLES, "")
+        values.update(variables or {})
+        return self.check(name, evaluate_setting(name, node, values, self.sources.get(name)))
+
+    def bind(self, **variables):
+        return BoundSettings(self, variables)
+
+    def freeze(self, **variables):
+        #Resolved values and source expressions, stored in the .blend by freeze_settings
+        return {
+            "version": SNAPSHOT_VERSION,
+            "source": self.filepath,
+            "variables": variables,
+            "values": {name: self.get(name, variables) for name in self.expressions},
+            "expressions": self.sources,
+            }
+
+class BoundSettings:
+    #Attribute access with the variables of the current file
+
+    def __init__(self, settings, variables):
+        self._settings = settings
+        self._variables = variables
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self._settings.get(name, self._variables)
+
+def parse_settings(filepath, signature):
+    config = configparser.ConfigParser()
+    with open(filepath) as infile:
+        config.read_file(infile)
+    if not config.has_section(SETTINGS_SECTION):
+        raise SettingsError("No [{}] section in {}".format(SETTINGS_SECTION, filepath))
+    expressions = {}
+    sources = {}
+    for name, text in config.items(SETTINGS_SECTION):
+        expressions[name] = compile_setting(name, text)
+        sources[name] = text
+    return ProductionSettings(filepath, signature, expressions, sources)
+
+def load_production_settings(filepath):
+    #Cached until the file size or mtime changes
+    stat = os.stat(filepath)
+    signature = (stat.st_size, stat.st_mtime_ns)
+    key = os.path.normcase(os.path.abspath(filepath))
+    settings = _settings.get(key)
+    if settings is None or settings.signature != signature:
+        settings = parse_settings(filepath, signature)
+        _settings[key] = settings
+    return settings
+
+#EMBEDDED SNAPSHOT
+#Frozen settings read from the .blend, renders do not need the INI share
+
+class SnapshotSettings:
+
+    def __init__(self, values, source):
+        self._values = values
+        self._source = source
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        if name not in self._values:
+            raise SettingsError("{} missing in embedded settings from {}".format(name, self._source))
+        return self._values[name]
+
+def snapshot_settings(data, **variables):
+    #Resolved values are used as is while the variables match, the file may have been saved as another shot
+    if data.get("version") != SNAPSHOT_VERSION:
+        raise SettingsError("Unsupported embedded settings version")
+    missing = [key for key in ("source", "variables", "values", "expressions") if key not in data]
+    if missing:
+        raise SettingsError("Embedded settings without {}".format(", ".join(missing)))
+    if data["variables"] == variables:
+        return SnapshotSettings(data["values"], data["source"])
+    expressions = {name: compile_setting(name, text) for name, text in data["expressions"].items()}
+    return ProductionSettings(data["source"], None, expressions, data["expressions"]).bind(**variables)
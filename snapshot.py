@@ -0,0 +1,173 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTIBILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+#
+# type: ignore
+
+import bpy
+import os
+import json
+from re import sub
+
+#NODE SNAPSHOT
+#Overridden group inputs keyed by (material, node tree path, node name, socket identifier)
+
+SNAPSHOT_VERSION = 1
+OVERRIDE_NODES = ('ShaderNodeGroup', 'ILLU_2DShade')
+COLOR_INPUTS = ("Tons Clairs", "Tons Fonçés")
+PATH_SEPARATOR = "/"
+
+def material_key(name):
+    #Appended copies can get a .001 suffix
+    return sub(r"\.\d{3}$", "", name)
+
+def socket_value(node, input):
+    #Returns (kind, value) or None when the input is not kept
+    if input.bl_idname == "NodeSocketColor":
+        if node.override_colors or input.name in COLOR_INPUTS:
+            return "value", list(input.default_value)
+        return None
+    if input.bl_idname == "NodeSocketObject":
+        if input.default_value:
+            return "object", input.default_value.name
+        return None
+    if not hasattr(input, "default_value"):
+        return None
+    value = input.default_value
+    if hasattr(value, "__len__") and not isinstance(value, str):
+        value = list(value)
+    return "value", value
+
+class NodeSnapshot:
+
+    def __init__(self):
+        self.sockets = {}
+        self.actions = {}
+
+    def __len__(self):
+        return len(self.sockets)
+
+    def capture(self, materials):
+        for material in materials:
+            if material.node_tree is not None:
+                self.capture_tree(material.name, material.node_tree, "")
+        return self
+
+    def capture_tree(self, material, node_tree, path):
+        #Only the action of a tree with overrides is kept, the others come with the new version
+        overridden = any(node.bl_idname in OVERRIDE_NODES and node.override for node in node_tree.nodes)
+        if overridden and node_tree.animation_data is not None and node_tree.animation_data.action is not None:
+            self.actions[(material, path)] = node_tree.animation_data.action.name
+        for node in node_tree.nodes:
+            if node.bl_idname in OVERRIDE_NODES and node.override:
+                for input in node.inputs:
+                    value = socket_value(node, input)
+                    if value is not None:
+                        self.sockets[(material, path, node.name, input.identifier)] = value
+            if node.bl_idname == "ShaderNodeGroup" and node.node_tree is not None:
+                self.capture_tree(material, node.node_tree, path + PATH_SEPARATOR + node.name if path else node.name)
+
+    def grouped(self):
+        #{material: {(path, node name): {identifier: (kind, value)}}}
+        grouped = {}
+        for (material, path, node_name, identifier), value in self.sockets.items():
+            grouped.setdefault(material, {}).setdefault((path, node_name), {})[identifier] = value
+        return grouped
+
+    def restore(self, materials):
+        #Direct lookups, only the overridden sockets are visited. Returns the number of restored sockets
+        grouped = self.grouped()
+        actions = {}
+        for (material, path), action in self.actions.items():
+            actions.setdefault(material, {})[path] = action
+        restored = 0
+        for material in materials:
+            if material.node_tree is None:
+                continue
+            trees = {"": material.node_tree}
+
+            #Animated shader parameters of the overridden trees
+            tree_actions = actions.get(material.name) or actions.get(material_key(material.name)) or {}
+            for path, name in tree_actions.items():
+                node_tree = self.find_tree(trees, path)
+                action = bpy.data.actions.get(name)
+                if node_tree is None or action is None:
+                    continue
+                if node_tree.animation_data is None:
+                    node_tree.animation_data_create()
+                node_tree.animation_data.action = action
+
+            nodes = grouped.get(material.name) or grouped.get(material_key(material.name))
+            if not nodes:
+                continue
+            for (path, node_name), values in nodes.items():
+                node_tree = self.find_tree(trees, path)
+                if node_tree is None:
+                    continue
+                node = node_tree.nodes.get(node_name)
+                if node is None:
+                    continue
+                inputs = {input.identifier: input for input in node.inputs}
+                for identifier, (kind, value) in values.items():
+                    input = inputs.get(identifier)
+                    if input is None:
+                        continue
+                    if kind == "object":
+                        value = bpy.data.objects.get(value)
+                        if value is None:
+                            continue
+                    try:
+                        input.default_value = value
+                        restored += 1
+                    except (TypeError, ValueError):
+                        pass
+        return restored
+
+    def find_tree(self, trees, path):
+        if path in trees:
+            return trees[path]
+        parent_path, _, node_name = path.rpartition(PATH_SEPARATOR)
+        parent = self.find_tree(trees, parent_path)
+        node = parent.nodes.get(node_name) if parent is not None else None
+        trees[path] = node.node_tree if node is not None and node.bl_idname == "ShaderNodeGroup" else None
+        return trees[path]
+
+    def to_dict(self):
+        return {
+            "version": SNAPSHOT_VERSION,
+            "sockets": [list(key) + [kind, value] for key, (kind, value) in self.sockets.items()],
+            "actions": [list(key) + [action] for key, action in self.actions.items()],
+            }
+
+    @classmethod
+    def from_dict(cls, data):
+        snapshot = cls()
+        if data.get("version") != SNAPSHOT_VERSION:
+            return snapshot
+        for material, path, node_name, identifier, kind, value in data["sockets"]:
+            snapshot.sockets[(material, path, node_name, identifier)] = (kind, value)
+        for material, path, action in data["actions"]:
+            snapshot.actions[(material, path)] = action
+        return snapshot
+
+    def save(self, filepath):
+        tmp_path = "{}.{}.tmp".format(filepath, os.getpid())
+        with open(tmp_path, 'w') as outfile:
+            json.dump(self.to_dict(), outfile, indent=2)
+        os.replace(tmp_path, filepath)
+
+    @classmethod
+    def load(cls, filepath):
+        with open(filepath) as infile:
+            return cls.from_dict(json.load(infile))
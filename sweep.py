@@ -0,0 +1,193 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTIBILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+#
+# type: ignore
+
+#HEADLESS ASSET SWEEP
+#Update the assets of every shot in a folder:
+#   blender -b -P sweep.py -- <shot folder> [--workers 8] [--report sweep.json] [--force]
+#Each shot is opened in its own background Blender, files whose manifest is up to date are skipped
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import importlib
+import traceback
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+PACKAGE = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+SWEEP_ENV = "WORKFLOW_SWEEP"
+
+def addon_module(name):
+    #-P runs this file outside of the add-on package
+    addons_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if addons_dir not in sys.path:
+        sys.path.append(addons_dir)
+    return importlib.import_module(PACKAGE + "." + name)
+
+def enable_addon():
+    import bpy
+    import addon_utils
+    if PACKAGE not in bpy.context.preferences.addons:
+        addon_utils.enable(PACKAGE, default_set=False)
+
+def script_arguments():
+    if "--" in sys.argv:
+        return sys.argv[sys.argv.index("--") + 1:]
+    return []
+
+def find_blend_files(root):
+    files = []
+    for directory, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith('.'))
+        for filename in sorted(filenames):
+            if filename.endswith('.blend'):
+                files.append(os.path.join(directory, filename))
+    return files
+
+def manifest_changes(filepath, functions, cache):
+    #Returns None when every asset of the manifest is unchanged, otherwise the reason to open the file
+    try:
+        with open(functions.manifest_path(filepath)) as infile:
+            manifest = json.load(infile)
+    except (OSError, ValueError):
+        return "no manifest"
+    if manifest.get("version") != functions.MANIFEST_VERSION:
+        return "old manifest"
+
+    stat = os.stat(filepath)
+    if manifest["blend"] != [stat.st_size, stat.st_mtime_ns]:
+        return "saved without manifest"
+
+    for asset in manifest["assets"]:
+        try:
+            signature = list(cache.file_signature(asset["path"]))
+        except OSError:
+            continue
+        if signature == asset["signature"]:
+            continue
+        if not asset["digest"] or cache.file_digest(asset["path"], signature) != asset["digest"]:
+            return "{} changed".format(asset["name"])
+    return None
+
+def run_worker(blender, filepath, timeout):
+    fd, result_file = tempfile.mkstemp(suffix=".json")
+    os.close(fd)
+    env = dict(os.environ)
+    env[SWEEP_ENV] = "1"
+    command = [blender, "-b", filepath, "--python", os.path.abspath(__file__), "--", "--worker", "--result", result_file]
+    start = time.perf_counter()
+    try:
+        process = subprocess.run(command, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, timeout=timeout)
+        try:
+            with open(result_file) as infile:
+                report = json.load(infile)
+        except (OSError, ValueError):
+            output = process.stdout.decode('utf-8', 'replace').splitlines()
+            report = {"file": filepath, "status": "error", "message": "\n".join(output[-20:])}
+    except subprocess.TimeoutExpired:
+        report = {"file": filepath, "status": "error", "message": "timeout after {}s".format(timeout)}
+    finally:
+        if os.path.exists(result_file):
+            os.remove(result_file)
+    report["wall_time"] = time.perf_counter() - start
+    return report
+
+def sweep(root, workers, report_file, timeout, force = False):
+    import bpy
+    functions = addon_module("functions")
+    cache = addon_module("cache")
+    start = time.perf_counter()
+    files = find_blend_files(root)
+
+    reports = []
+    to_open = []
+    for filepath in files:
+        reason = "forced" if force else manifest_changes(filepath, functions, cache)
+        if reason is None:
+            reports.append({"file": filepath, "status": "skipped", "message": "manifest up to date"})
+        else:
+            to_open.append((filepath, reason))
+    cache.save_digest_cache()
+    print("Sweep: {} file(s), {} to open with {} worker(s)".format(len(files), len(to_open), workers))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(run_worker, bpy.app.binary_path, filepath, timeout): (filepath, reason)
+            for filepath, reason in to_open}
+        for future in as_completed(futures):
+            filepath, reason = futures[future]
+            report = future.result()
+            report["reason"] = reason
+            reports.append(report)
+            print("Sweep: {} {} ({:.1f}s)".format(report.get("status"), filepath, report["wall_time"]))
+
+    summary = {}
+    for report in reports:
+        summary[report.get("status")] = summary.get(report.get("status"), 0) + 1
+    result = {
+        "root": root,
+        "workers": workers,
+        "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "time": time.perf_counter() - start,
+        "summary": summary,
+        "files": sorted(reports, key = lambda report: report["file"]),
+        }
+    with open(report_file, 'w') as outfile:
+        json.dump(result, outfile, indent=2)
+    print("Sweep: report written to {}".format(report_file))
+    return result
+
+def worker(result_file):
+    import bpy
+    try:
+        enable_addon()
+        functions = addon_module("functions")
+        report = functions.sweep_current_file()
+        report["status"] = "updated" if report["updated"] else "unchanged"
+        functions.write_asset_manifest(bpy.data.filepath)
+        #The sweep is an explicit update, pinned versions follow it
+        if report["updated"] and functions.read_asset_lock(bpy.data.filepath) is not None:
+            functions.write_asset_lock(bpy.data.filepath)
+    except Exception:
+        report = {"file": bpy.data.filepath, "status": "error", "message": traceback.format_exc()}
+    with open(result_file, 'w') as outfile:
+        json.dump(report, outfile, indent=2)
+
+def main():
+    parser = argparse.ArgumentParser(prog="blender -b -P sweep.py --")
+    parser.add_argument("root", nargs="?", help="Shot folder")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Blender instances in parallel")
+    parser.add_argument("--report", help="JSON report, <root>/asset_sweep.json by default")
+    parser.add_argument("--timeout", type=float, default=3600.0, help="Seconds allowed per file")
+    parser.add_argument("--force", action="store_true", help="Open every file, ignore manifests")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args(script_arguments())
+
+    if args.worker:
+        worker(args.result)
+        return
+    if not args.root or not os.path.isdir(args.root):
+        parser.error("a shot folder is required")
+    enable_addon()
+    report_file = args.report or os.path.join(args.root, "asset_sweep.json")
+    sweep(os.path.abspath(args.root), max(1, args.workers), report_file, args.timeout, force = args.force)
+
+if __name__ == "__main__":
+    main()
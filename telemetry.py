@@ -0,0 +1,182 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTIBILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+#
+#
+# type: ignore
+
+import os
+import csv
+import glob
+import json
+import time
+import socket
+from . progress import peak_memory, current_memory
+
+#RENDER TELEMETRY
+#One CSV per render process in the output folder, one row per rendered frame
+#Chunk workers never write the same file, the report reads them all and keeps the last row of each frame
+
+TELEMETRY_PREFIX = "render_telemetry"
+TELEMETRY_REPORT = "render_telemetry.json"
+#counts: "render" or "viewport", viewport counts use the viewport levels of the modifiers
+TELEMETRY_FIELDS = ["frame", "date", "wall_time", "peak_memory", "memory", "objects", "triangles", "counts",
+    "engine", "samples", "resolution_x", "resolution_y", "host", "pid"]
+#Frames slower than the median by this factor are reported as outliers
+OUTLIER_FACTOR = 2.0
+
+class TelemetryWriter:
+
+    def __init__(self, directory):
+        self.filepath = os.path.join(directory, "{}_{}_{}.csv".format(TELEMETRY_PREFIX, socket.gethostname(), os.getpid()))
+        self.row = None
+        self.started = None
+
+    def start(self, frame, **stats):
+        self.started = time.perf_counter()
+        self.row = {"frame": frame, "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "host": socket.gethostname(), "pid": os.getpid()}
+        self.row.update(stats)
+
+    def end(self, frame):
+        #Returns the row, None when the frame was not started here
+        if self.row is None or self.row["frame"] != frame:
+            return None
+        row = self.row
+        self.row = None
+        row["wall_time"] = round(time.perf_counter() - self.started, 3)
+        row["peak_memory"] = peak_memory()
+        row["memory"] = current_memory()
+        new_file = not os.path.exists(self.filepath)
+        try:
+            with open(self.filepath, 'a', newline='') as outfile:
+                writer = csv.DictWriter(outfile, fieldnames=TELEMETRY_FIELDS, extrasaction='ignore')
+                if new_file:
+                    writer.writeheader()
+                writer.writerow(row)
+        except OSError:
+            pass
+        return row
+
+def read_telemetry(directory):
+    #Last row of each frame, in frame order
+    frames = {}
+    for filepath in glob.glob(os.path.join(glob.escape(directory), TELEMETRY_PREFIX + "_*.csv")):
+        try:
+            with open(filepath, newline='') as infile:
+                for row in csv.DictReader(infile):
+                    try:
+                        row["frame"] = int(row["frame"])
+                        row["wall_time"] = float(row["wall_time"])
+                    except (KeyError, TypeError, ValueError):
+                        continue
+                    for field in ("peak_memory", "memory", "objects", "triangles", "samples"):
+                        row[field] = int(row[field]) if row.get(field) else None
+                    previous = frames.get(row["frame"])
+                    if previous is None or row["date"] >= previous["date"]:
+                        frames[row["frame"]] = row
+        except OSError:
+            continue
+    return [frames[frame] for frame in sorted(frames)]
+
+def percentile(values, p):
+    #Linear interpolation between the closest ranks
+    values = sorted(values)
+    if not values:
+        return None
+    position = (len(values) - 1) * p / 100.0
+    low = int(position)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (position - low)
+
+def trend(points):
+    #Least squares slope of (x, y) points, None with less than two points
+    if len(points) < 2:
+        return None
+    mean_x = sum(x for x, y in points) / len(points)
+    mean_y = sum(y for x, y in points) / len(points)
+    variance = sum((x - mean_x) ** 2 for x, y in points)
+    if not variance:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / variance
+
+def summarize_telemetry(rows, slowest = 5):
+    times = [row["wall_time"] for row in rows]
+    if not times:
+        return None
+    median = percentile(times, 50)
+    memory = [(row["frame"], row["memory"]) for row in rows if row["memory"] is not None]
+    peaks = [row["peak_memory"] for row in rows if row["peak_memory"] is not None]
+    triangles = [row["triangles"] for row in rows if row["triangles"] is not None]
+    #Rows written before the counts field are viewport counts
+    counts = "render" if all(row.get("counts") == "render" for row in rows if row["triangles"] is not None) else "viewport"
+    slope = trend(memory)
+    return {
+        "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "frames": len(rows),
+        "first_frame": rows[0]["frame"],
+        "last_frame": rows[-1]["frame"],
+        "total": sum(times),
+        "mean": sum(times) / len(times),
+        "median": median,
+        "p95": percentile(times, 95),
+        "max": max(times),
+        "slowest": [{"frame": row["frame"], "wall_time": row["wall_time"], "triangles": row["triangles"]}
+            for row in sorted(rows, key = lambda row: row["wall_time"], reverse = True)[:slowest]],
+        "outliers": [row["frame"] for row in rows if median and row["wall_time"] > median * OUTLIER_FACTOR],
+        "memory": {
+            "peak": max(peaks) if peaks else None,
+            "first": memory[0][1] if memory else None,
+            "last": memory[-1][1] if memory else None,
+            #Bytes per frame, a steady growth points to a leak across frames
+            "trend": slope,
+            },
+        "triangles": {
+            "mean": sum(triangles) / len(triangles) if triangles else None,
+            "max": max(triangles) if triangles else None,
+            "counts": counts,
+            },
+        "hosts": sorted(set(row["host"] for row in rows)),
+        }
+
+def write_telemetry_report(directory, summary):
+    filepath = os.path.join(directory, TELEMETRY_REPORT)
+    tmp_path = "{}.{}.tmp".format(filepath, os.getpid())
+    try:
+        with open(tmp_path, 'w') as outfile:
+            json.dump(summary, outfile, indent=2)
+        os.replace(tmp_path, filepath)
+    except OSError:
+        return None
+    return filepath
+
+def format_telemetry_report(summary):
+    megabytes = lambda value: "{:.0f} MB".format(value / 1048576) if value is not None else "?"
+    lines = [
+        "{} frame(s) {}-{}, {:.1f} min of render".format(summary["frames"], summary["first_frame"],
+            summary["last_frame"], summary["total"] / 60),
+        "Mean {:.1f}s, median {:.1f}s, p95 {:.1f}s, max {:.1f}s".format(summary["mean"], summary["median"],
+            summary["p95"], summary["max"]),
+        "Slowest: " + ", ".join("{} ({:.1f}s)".format(row["frame"], row["wall_time"]) for row in summary["slowest"]),
+        "Memory: peak {}, {} to {}".format(megabytes(summary["memory"]["peak"]),
+            megabytes(summary["memory"]["first"]), megabytes(summary["memory"]["last"])),
+        ]
+    if summary["memory"]["trend"] is not None:
+        lines[-1] += ", {:+.1f} MB per frame".format(summary["memory"]["trend"] / 1048576)
+    triangles = summary["triangles"]
+    if triangles["max"] is not None:
+        lines.append("Triangles: mean {:.0f}, max {} ({} counts)".format(triangles["mean"], triangles["max"],
+            triangles.get("counts", "viewport")))
+    if summary["outliers"]:
+        lines.append("Outliers: " + ", ".join(str(frame) for frame in summary["outliers"]))
+    return lines
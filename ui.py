@@ -80,20 +80,57 @@ class WORKFLOW_PT_view3d_asset(bpy.types.Panel):
         layout.operator("workflow.update_animation")
         layout.row().separator()
         layout.prop(context.scene, "auto_update_assets")   
-
-        for item in context.scene.relink:
-            if hasattr (obj, "relink"):        
-                if item.uid == obj.relink.uid:
-                    layout.label(text = item.data_name )
-                    layout.label(text = item.uid ) 
-                    layout.prop(item, "path", text="Path")   
-                    layout.label(text = "VERSION: " + item.version)                    
-                    if check_asset(item.path, item.version):                    
-                        layout.label(text = "NEW VERSION AVAILABLE", icon ="ERROR")
-                    layout.operator("workflow.update_asset")
-                    layout.operator("workflow.delete_link")
-                    layout.row().separator()
-        layout.operator("workflow.update_all_assets")
+        layout.prop(context.scene, "differential_relink")
+
+        if hasattr (obj, "relink") and obj.relink.uid != "":
+            item = find_relink_item(obj.relink.uid)
+            if item is not None:
+                layout.label(text = item.data_name )
+                layout.label(text = item.uid ) 
+                layout.prop(item, "path", text="Path")   
+                layout.label(text = "VERSION: " + item.version)                    
+                update = check_asset_cached(item)
+                if update:                    
+                    layout.label(text = "NEW VERSION AVAILABLE", icon ="ERROR")
+                elif update is None:
+                    layout.label(text = "Checking version...", icon ="TIME")
+                row = layout.row(align=True)
+                row.operator("workflow.update_asset")
+                row.operator("workflow.update_asset", text="", icon="VIEWZOOM").dry_run = True
+                layout.operator("workflow.delete_link")
+                layout.row().separator()
+        row = layout.row(align=True)
+        row.operator("workflow.update_all_assets")
+        row.operator("workflow.refresh_asset_status", text="", icon="FILE_REFRESH")
+
+        #Pinned versions
+        state = asset_lock_state()
+        row = layout.row(align=True)
+        if state == "locked":
+            row.label(text = "Versions locked", icon="LOCKED")
+        elif state == "outdated":
+            row.label(text = "Lock outdated", icon="ERROR")
+        else:
+            row.label(text = "Versions not locked", icon="UNLOCKED")
+        row.operator("workflow.update_lock", text="", icon="FILE_TICK")
+        row.operator("workflow.update_lock", text="", icon="IMPORT").update_assets = True
+
+        #Prefetch of new versions
+        done, total, left = prefetch_progress()
+        if left:
+            layout.label(text = "Prefetching {} asset(s): {:.0%} of {:.0f} MB".format(
+                left, done / total if total else 0, total / 1048576), icon="IMPORT")
+
+        #Last relink profile
+        report = last_profile_report()
+        if report is not None:
+            box = layout.box()
+            title = "Dry run" if report["dry_run"] else "Last relink"
+            box.label(text = "{}: {:.2f}s".format(title, report["total"]), icon="TIME")
+            for phase in slowest_phases(report):
+                box.label(text = "{}: {:.2f}s, {} datablock(s)".format(phase["name"], phase["time"], phase["count"]))
+            for asset in slowest_assets(report, 3):
+                box.label(text = "{}: {:.2f}s".format(asset.get("name", asset["uid"]), asset["time"]), icon="OUTLINER_COLLECTION")
 
 
 class WORKFLOW_PT_view3d_layout_tools(bpy.types.Panel):
@@ -107,6 +144,10 @@ class WORKFLOW_PT_view3d_layout_tools(bpy.types.Panel):
         layout = self.layout
         layout.use_property_split = True
         layout.operator("workflow.load_asset")
+        row = layout.row(align=True)
+        #The type is picked first, the search only lists assets of that type
+        row.operator_menu_enum("workflow.search_asset", "data_type", text="Search Asset", icon="VIEWZOOM")
+        row.operator("workflow.rescan_catalog", text="", icon="FILE_REFRESH")
         layout.operator("workflow.import_audio")
         layout.row().separator()
         layout.operator("workflow.render_material")
@@ -134,6 +175,12 @@ class WORKFLOW_PT_view3d_animation_tools(bpy.types.Panel):
 
         layout.operator("workflow.custom_preview")
         layout.operator("workflow.publish_preview")
+        row = layout.row(align=True)
+        if bpy.data.texts.get(SETTINGS_TEXT) is not None:
+            row.operator("workflow.freeze_settings", text="Settings Embedded", icon="CHECKMARK")
+            row.operator("workflow.freeze_settings", text="", icon="X").remove = True
+        else:
+            row.operator("workflow.freeze_settings")
         layout.row().separator()
         layout.operator("workflow.export_dummy", text="Export Keyframes")
         layout.operator("workflow.import_keyframes")
@@ -158,6 +205,7 @@ class WORKFLOW_PT_view3d_rendering_tools(bpy.types.Panel):
             layout.label(text = "New addon version available", icon="INFO")
 
         layout.operator("workflow.render")
+        layout.operator("workflow.render_report", icon="TIME")
 
 
 class WORKFLOW_PT_view3d_production(bpy.types.Panel):